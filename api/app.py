@@ -2,9 +2,9 @@
 LP文字起こしウェブアプリ - FastAPI Backend
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, HttpUrl
 from typing import Optional, Dict, Any
 import sys
@@ -12,9 +12,11 @@ import os
 from pathlib import Path
 import uuid
 import json
+import copy
 import shutil
 from datetime import datetime
 import asyncio
+import threading
 from concurrent.futures import ThreadPoolExecutor
 import logging
 
@@ -24,6 +26,10 @@ logger = logging.getLogger(__name__)
 
 # transcribe_websiteモジュールをインポート
 import transcribe_website
+import blob_store
+import downloads
+import image_pyramid
+import retention
 
 app = FastAPI(title="LP Transcriber API", version="1.0.0")
 
@@ -44,16 +50,43 @@ app.add_middleware(
 
 # 処理状態を管理するグローバル辞書
 processing_status: Dict[str, Dict[str, Any]] = {}
+# ワーカースレッドからの更新と get_status のコピーを排他するロック
+status_lock = threading.Lock()
 
 def add_log(job_id: str, message: str):
     """ログメッセージを追加"""
-    if job_id in processing_status:
-        if "logs" not in processing_status[job_id]:
-            processing_status[job_id]["logs"] = []
-        processing_status[job_id]["logs"].append({
-            "timestamp": datetime.now().isoformat(),
-            "message": message
-        })
+    with status_lock:
+        if job_id in processing_status:
+            if "logs" not in processing_status[job_id]:
+                processing_status[job_id]["logs"] = []
+            processing_status[job_id]["logs"].append({
+                "timestamp": datetime.now().isoformat(),
+                "message": message
+            })
+
+def append_partial_text(job_id: str, segment: Dict[str, Any], chunk: str):
+    """ストリーミングOCRの部分テキストをジョブの進捗に追加"""
+    with status_lock:
+        status = processing_status.get(job_id)
+        if status is None:
+            return
+        partial_segments = status.setdefault("partial_segments", [])
+        for entry in partial_segments:
+            if entry["index"] == segment["index"]:
+                break
+        else:
+            entry = {
+                "index": segment["index"],
+                "text": "",
+                "top": segment.get("top", 0),
+                "bottom": segment.get("bottom", 0),
+            }
+            partial_segments.append(entry)
+            partial_segments.sort(key=lambda item: item["index"])
+            if len(partial_segments) == 1:
+                status["message"] = "OCR処理中..."
+        entry["text"] += chunk
+
 
 # 一時ファイル保存ディレクトリ
 TEMP_DIR = Path(__file__).parent / "temp"
@@ -65,6 +98,7 @@ executor = ThreadPoolExecutor(max_workers=3)
 
 class TranscribeURLRequest(BaseModel):
     url: HttpUrl
+    incremental: bool = False
 
 
 class StatusResponse(BaseModel):
@@ -76,6 +110,56 @@ class StatusResponse(BaseModel):
     error: Optional[str] = None
 
 
+def run_retention() -> Dict[str, Any]:
+    """出力・一時ファイルに保持ポリシーを適用し、古いジョブ状態も破棄する"""
+    active_uploads = [
+        path for path in TEMP_DIR.iterdir()
+        if processing_status.get(path.name.split("_", 1)[0], {}).get("status") == "processing"
+    ]
+    removed_temp = retention.sweep_temp(TEMP_DIR, keep=active_uploads)
+    stats = retention.enforce_retention(
+        transcribe_website.BASE_OUTPUT_DIR,
+        index_path=transcribe_website.RUN_INDEX_PATH,
+    )
+    stats["reclaimed_bytes"] += blob_store.remove_orphan_blobs(transcribe_website.ARTIFACT_STORE_DIR)
+
+    cutoff = datetime.now().timestamp() - retention.OUTPUT_MAX_AGE_SECONDS
+    with status_lock:
+        for job_id in list(processing_status):
+            status = processing_status[job_id]
+            if status.get("status") == "processing":
+                continue
+            if datetime.fromisoformat(status["created_at"]).timestamp() < cutoff:
+                processing_status.pop(job_id, None)
+
+    if stats["evicted"] or stats["compacted"] or removed_temp:
+        logger.info(
+            "Retention: evicted %d runs, compacted %d runs, removed %d temp files, reclaimed %.1f MB (total %.1f MB)",
+            len(stats["evicted"]),
+            stats["compacted"],
+            removed_temp,
+            stats["reclaimed_bytes"] / 1024 / 1024,
+            stats["total_bytes"] / 1024 / 1024,
+        )
+    return stats
+
+
+async def retention_loop():
+    """保持ポリシーを定期的にバックグラウンドで実行"""
+    loop = asyncio.get_event_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, run_retention)
+        except Exception as e:
+            logger.error(f"Retention error: {str(e)}", exc_info=True)
+        await asyncio.sleep(retention.RETENTION_INTERVAL_SECONDS)
+
+
+@app.on_event("startup")
+async def start_retention():
+    asyncio.ensure_future(retention_loop())
+
+
 @app.get("/")
 async def root():
     """API情報を返す"""
@@ -87,7 +171,8 @@ async def root():
             "transcribe_url": "/api/transcribe/url",
             "transcribe_upload": "/api/transcribe/upload",
             "status": "/api/status/{job_id}",
-            "download": "/api/download/{job_id}/{file_type}"
+            "download": "/api/download/{job_id}/{file_type}",
+            "archive": "/api/archive/{job_id}?format=zip|tar"
         }
     }
 
@@ -116,7 +201,9 @@ async def transcribe_url(request: TranscribeURLRequest):
 
     # バックグラウンドで処理を実行（ThreadPoolExecutorで同期関数を実行）
     loop = asyncio.get_event_loop()
-    asyncio.ensure_future(loop.run_in_executor(executor, process_url_transcription, job_id, str(request.url)))
+    asyncio.ensure_future(
+        loop.run_in_executor(executor, process_url_transcription, job_id, str(request.url), request.incremental)
+    )
 
     return {
         "job_id": job_id,
@@ -139,6 +226,8 @@ async def transcribe_upload(file: UploadFile = File(...)):
         with temp_file_path.open("wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
     except Exception as e:
+        if temp_file_path.exists():
+            temp_file_path.unlink()
         raise HTTPException(status_code=500, detail=f"ファイル保存エラー: {str(e)}")
 
     processing_status[job_id] = {
@@ -162,15 +251,17 @@ async def transcribe_upload(file: UploadFile = File(...)):
 @app.get("/api/status/{job_id}")
 async def get_status(job_id: str):
     """処理状態を取得"""
-    if job_id not in processing_status:
+    # ワーカースレッドが更新中の辞書をそのまま直列化しないよう、ロック内でコピーして返す
+    with status_lock:
+        status = processing_status.get(job_id)
+        snapshot = copy.deepcopy(status) if status is not None else None
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="Job ID が見つかりません")
 
-    return processing_status[job_id]
+    return snapshot
 
 
-@app.get("/api/download/{job_id}/{file_type}")
-async def download_file(job_id: str, file_type: str):
-    """結果ファイルをダウンロード"""
+def get_completed_result(job_id: str) -> Dict[str, Any]:
     if job_id not in processing_status:
         raise HTTPException(status_code=404, detail="Job ID が見つかりません")
 
@@ -181,6 +272,13 @@ async def download_file(job_id: str, file_type: str):
     result = status.get("result")
     if not result:
         raise HTTPException(status_code=500, detail="結果が見つかりません")
+    return result
+
+
+@app.get("/api/download/{job_id}/{file_type}")
+async def download_file(job_id: str, file_type: str, request: Request):
+    """結果ファイルをダウンロード（条件付きGET・Range・テキストの圧縮に対応）"""
+    result = get_completed_result(job_id)
 
     # ファイルタイプに応じてパスを取得
     if file_type == "markdown":
@@ -189,20 +287,141 @@ async def download_file(job_id: str, file_type: str):
         file_path = Path(result["text_path"])
     elif file_type == "screenshot":
         file_path = Path(result["screenshot_path"])
+    elif file_type == "thumbnail" and result.get("thumbnail_path"):
+        file_path = Path(result["thumbnail_path"])
     else:
         raise HTTPException(status_code=400, detail="無効なファイルタイプです")
 
+    if file_type == "screenshot" and not file_path.exists():
+        # 保持ポリシーでWebP化された場合はマニフェスト側のパスを参照
+        manifest = transcribe_website.load_run_manifest(Path(result["run_dir"])) or {}
+        manifest_screenshot = (manifest.get("screenshot") or {}).get("path")
+        if manifest_screenshot:
+            file_path = Path(manifest_screenshot)
+
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="ファイルが見つかりません")
 
-    return FileResponse(
-        path=file_path,
-        filename=file_path.name,
-        media_type="application/octet-stream"
-    )
+    retention.touch_run(Path(result["run_dir"]))
+
+    stat = file_path.stat()
+    etag = downloads.file_etag(stat)
+    headers = downloads.cache_headers(etag, stat.st_mtime)
+    headers["Accept-Ranges"] = "bytes"
+    if downloads.is_not_modified(request.headers, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = downloads.content_disposition(file_path.name)
+    media_type = downloads.media_type_for(file_path)
 
+    try:
+        byte_range = downloads.parse_range(request.headers.get("range"), stat.st_size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{stat.st_size}"})
+
+    if byte_range is not None and request.headers.get("if-range", etag) == etag:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            downloads.iter_file(file_path, start, end),
+            status_code=206,
+            media_type=media_type,
+            headers=headers,
+        )
 
-def process_url_transcription(job_id: str, url: str):
+    encoding = downloads.choose_encoding(file_path, request.headers.get("accept-encoding", ""), stat.st_size)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        headers["Vary"] = "Accept-Encoding"
+        # 圧縮後の表現は別物なので弱いETagにする
+        headers["ETag"] = f"W/{etag}"
+        return Response(
+            content=downloads.compress(file_path.read_bytes(), encoding),
+            media_type=media_type,
+            headers=headers,
+        )
+
+    headers["Content-Length"] = str(stat.st_size)
+    return StreamingResponse(downloads.iter_file(file_path), media_type=media_type, headers=headers)
+
+
+def get_pyramid_info(job_id: str) -> Dict[str, Any]:
+    result = get_completed_result(job_id)
+    info = image_pyramid.load_pyramid(Path(result["pyramid_path"])) if result.get("pyramid_path") else None
+    if info is None:
+        raise HTTPException(status_code=404, detail="プレビュー用タイルがありません")
+    return info
+
+
+@app.get("/api/tiles/{job_id}/info")
+async def get_tiles_info(job_id: str):
+    """タイルビューア用の画像サイズ・レベル情報"""
+    info = get_pyramid_info(job_id)
+    return {
+        "width": info["width"],
+        "height": info["height"],
+        "tile_size": info["tile_size"],
+        "format": info["format"],
+        "max_level": info["max_level"],
+        "thumbnail_url": f"/api/download/{job_id}/thumbnail",
+    }
+
+
+@app.get("/api/tiles/{job_id}/{level}/{tile_name}")
+async def get_tile(job_id: str, level: int, tile_name: str, request: Request):
+    """DeepZoomタイルを1枚返す（run内で内容は不変のため長期キャッシュ可）"""
+    info = get_pyramid_info(job_id)
+    stem, _, suffix = tile_name.partition(".")
+    col_text, _, row_text = stem.partition("_")
+    if suffix != info["format"] or not col_text.isdigit() or not row_text.isdigit():
+        raise HTTPException(status_code=400, detail="無効なタイル名です")
+    if not 0 <= level <= info["max_level"]:
+        raise HTTPException(status_code=404, detail="タイルが見つかりません")
+
+    file_path = image_pyramid.tile_path(info, level, int(col_text), int(row_text))
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="タイルが見つかりません")
+
+    stat = file_path.stat()
+    etag = downloads.file_etag(stat)
+    headers = downloads.cache_headers(etag, stat.st_mtime)
+    headers["Cache-Control"] = "private, max-age=86400, immutable"
+    if downloads.is_not_modified(request.headers, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path=file_path, media_type="image/jpeg", headers=headers)
+
+
+@app.get("/api/archive/{job_id}")
+async def download_archive(job_id: str, request: Request, format: str = "zip"):
+    """run ディレクトリ一式を zip / tar でストリーミング配信"""
+    if format not in ("zip", "tar"):
+        raise HTTPException(status_code=400, detail="format は zip か tar を指定してください")
+
+    result = get_completed_result(job_id)
+    run_dir = Path(result["run_dir"])
+    if not run_dir.exists():
+        raise HTTPException(status_code=404, detail="出力フォルダが見つかりません")
+
+    files = downloads.archive_members(run_dir)
+    if not files:
+        raise HTTPException(status_code=404, detail="ファイルが見つかりません")
+
+    retention.touch_run(run_dir)
+
+    mtime = max(path.stat().st_mtime for path in files)
+    etag = downloads.archive_etag(files, format)
+    headers = downloads.cache_headers(etag, mtime)
+    if downloads.is_not_modified(request.headers, etag, mtime):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = downloads.content_disposition(f"{run_dir.name}.{format}")
+    if format == "zip":
+        return StreamingResponse(downloads.iter_zip(files, run_dir.name), media_type="application/zip", headers=headers)
+    return StreamingResponse(downloads.iter_tar(files, run_dir.name), media_type="application/x-tar", headers=headers)
+
+
+def process_url_transcription(job_id: str, url: str, incremental: bool = False):
     """URLの文字起こし処理（バックグラウンド）- 同期関数"""
     try:
         logger.info(f"[{job_id}] Starting URL transcription: {url}")
@@ -217,26 +436,44 @@ def process_url_transcription(job_id: str, url: str):
             url=url,
             slice_height=transcribe_website.SLICE_HEIGHT_DEFAULT,
             overlap=transcribe_website.SLICE_OVERLAP_DEFAULT,
-            keyword_slug=None
+            keyword_slug=None,
+            stream=True,
+            on_ocr_chunk=lambda segment, chunk: append_partial_text(job_id, segment, chunk),
+            incremental=incremental,
         )
 
         logger.info(f"[{job_id}] transcribe_website completed, got {len(result.get('segments', []))} segments")
 
         add_log(job_id, f"スクリーンショット取得完了: {len(result['segments'])} セグメント")
+        capture = result["capture"]
+        if capture["fallbacks"]:
+            add_log(job_id, f"ページ取得方式: {capture['strategy']}（フォールバック {capture['fallbacks']} 回）")
         processing_status[job_id]["message"] = "スクリーンショット取得完了"
         processing_status[job_id]["progress"] = 50
+        if result.get("changes"):
+            changes = result["changes"]
+            add_log(
+                job_id,
+                f"差分再OCR: 再利用 {len(changes['reused'])} / 再OCR {len(changes['ocr'])} セグメント",
+            )
 
         # Markdownとテキストファイルを保存
         add_log(job_id, "Markdownファイルを保存中...")
         md_path = transcribe_website.save_markdown(result)
         add_log(job_id, "テキストファイルを保存中...")
         txt_path = transcribe_website.save_plain_text(result)
+        metrics_path = transcribe_website.save_metrics(result)
+        totals = result["metrics"]["totals"]
+        add_log(
+            job_id,
+            f"Gemini利用量: {totals['calls']}回 / 入力 {totals['prompt_tokens']} tokens / 出力 {totals['output_tokens']} tokens",
+        )
 
         processing_status[job_id]["message"] = "結果を保存中..."
         processing_status[job_id]["progress"] = 80
 
-        # 分割画像をクリーンアップ（無効化）
-        # transcribe_website.cleanup_segment_images(result)
+        # 分割画像をクリーンアップ（OCR結果とハッシュはマニフェストに保存済み）
+        transcribe_website.cleanup_segment_images(result)
 
         # 最新リンクを更新
         transcribe_website.update_latest_symlink(
@@ -255,26 +492,35 @@ def process_url_transcription(job_id: str, url: str):
             })
 
         add_log(job_id, "処理完了")
-        processing_status[job_id]["status"] = "completed"
-        processing_status[job_id]["message"] = "処理完了！"
-        processing_status[job_id]["progress"] = 100
-        processing_status[job_id]["result"] = {
-            "transcript": result.get("combined_text") or result.get("visible_text") or "",
-            "segments": segments_data,  # セグメントごとの文字起こし
-            "markdown_path": str(md_path),
-            "text_path": str(txt_path),
-            "screenshot_path": str(result["screenshot"]),
-            "run_dir": str(result["run_dir"]),
-            "segments_count": len(result["segments"]),
-            "source_url": url
-        }
+        with status_lock:
+            processing_status[job_id].pop("partial_segments", None)
+            processing_status[job_id]["status"] = "completed"
+            processing_status[job_id]["message"] = "処理完了！"
+            processing_status[job_id]["progress"] = 100
+            processing_status[job_id]["result"] = {
+                "transcript": result.get("combined_text") or result.get("visible_text") or "",
+                "segments": segments_data,  # セグメントごとの文字起こし
+                "markdown_path": str(md_path),
+                "text_path": str(txt_path),
+                "screenshot_path": str(result["screenshot"]),
+                "run_dir": str(result["run_dir"]),
+                "segments_count": len(result["segments"]),
+                "metrics": result["metrics"],
+                "metrics_path": str(metrics_path),
+                "manifest_path": str(result["manifest_path"]),
+                "pyramid_path": result["outputs"].get("pyramid"),
+                "thumbnail_path": result["outputs"].get("thumbnail"),
+                "changes": result.get("changes"),
+                "source_url": url
+            }
 
     except Exception as e:
         logger.error(f"[{job_id}] Error in transcription: {str(e)}", exc_info=True)
         add_log(job_id, f"エラー発生: {str(e)}")
-        processing_status[job_id]["status"] = "error"
-        processing_status[job_id]["message"] = "エラーが発生しました"
-        processing_status[job_id]["error"] = str(e)
+        with status_lock:
+            processing_status[job_id]["status"] = "error"
+            processing_status[job_id]["message"] = "エラーが発生しました"
+            processing_status[job_id]["error"] = str(e)
 
 
 def process_local_transcription(job_id: str, html_path: Path):
@@ -289,10 +535,15 @@ def process_local_transcription(job_id: str, html_path: Path):
             html_path=html_path,
             slice_height=transcribe_website.SLICE_HEIGHT_DEFAULT,
             overlap=transcribe_website.SLICE_OVERLAP_DEFAULT,
-            keyword_slug=None
+            keyword_slug=None,
+            stream=True,
+            on_ocr_chunk=lambda segment, chunk: append_partial_text(job_id, segment, chunk),
         )
 
         add_log(job_id, f"スクリーンショット取得完了: {len(result['segments'])} セグメント")
+        capture = result["capture"]
+        if capture["fallbacks"]:
+            add_log(job_id, f"ページ取得方式: {capture['strategy']}（フォールバック {capture['fallbacks']} 回）")
         processing_status[job_id]["message"] = "スクリーンショット取得完了"
         processing_status[job_id]["progress"] = 50
 
@@ -301,12 +552,18 @@ def process_local_transcription(job_id: str, html_path: Path):
         md_path = transcribe_website.save_markdown(result)
         add_log(job_id, "テキストファイルを保存中...")
         txt_path = transcribe_website.save_plain_text(result)
+        metrics_path = transcribe_website.save_metrics(result)
+        totals = result["metrics"]["totals"]
+        add_log(
+            job_id,
+            f"Gemini利用量: {totals['calls']}回 / 入力 {totals['prompt_tokens']} tokens / 出力 {totals['output_tokens']} tokens",
+        )
 
         processing_status[job_id]["message"] = "結果を保存中..."
         processing_status[job_id]["progress"] = 80
 
-        # 分割画像をクリーンアップ（無効化）
-        # transcribe_website.cleanup_segment_images(result)
+        # 分割画像をクリーンアップ（OCR結果とハッシュはマニフェストに保存済み）
+        transcribe_website.cleanup_segment_images(result)
 
         # 最新リンクを更新
         transcribe_website.update_latest_symlink(
@@ -325,32 +582,37 @@ def process_local_transcription(job_id: str, html_path: Path):
             })
 
         add_log(job_id, "処理完了")
-        processing_status[job_id]["status"] = "completed"
-        processing_status[job_id]["message"] = "処理完了！"
-        processing_status[job_id]["progress"] = 100
-        processing_status[job_id]["result"] = {
-            "transcript": result.get("combined_text") or result.get("visible_text") or "",
-            "segments": segments_data,  # セグメントごとの文字起こし
-            "markdown_path": str(md_path),
-            "text_path": str(txt_path),
-            "screenshot_path": str(result["screenshot"]),
-            "run_dir": str(result["run_dir"]),
-            "segments_count": len(result["segments"]),
-            "source_path": str(html_path)
-        }
-
-        # 一時ファイルを削除
-        if html_path.exists():
-            html_path.unlink()
+        with status_lock:
+            processing_status[job_id].pop("partial_segments", None)
+            processing_status[job_id]["status"] = "completed"
+            processing_status[job_id]["message"] = "処理完了！"
+            processing_status[job_id]["progress"] = 100
+            processing_status[job_id]["result"] = {
+                "transcript": result.get("combined_text") or result.get("visible_text") or "",
+                "segments": segments_data,  # セグメントごとの文字起こし
+                "markdown_path": str(md_path),
+                "text_path": str(txt_path),
+                "screenshot_path": str(result["screenshot"]),
+                "run_dir": str(result["run_dir"]),
+                "segments_count": len(result["segments"]),
+                "metrics": result["metrics"],
+                "metrics_path": str(metrics_path),
+                "manifest_path": str(result["manifest_path"]),
+                "pyramid_path": result["outputs"].get("pyramid"),
+                "thumbnail_path": result["outputs"].get("thumbnail"),
+                "source_path": str(html_path)
+            }
 
     except Exception as e:
         logger.error(f"[{job_id}] Error in transcription: {str(e)}", exc_info=True)
         add_log(job_id, f"エラー発生: {str(e)}")
-        processing_status[job_id]["status"] = "error"
-        processing_status[job_id]["message"] = "エラーが発生しました"
-        processing_status[job_id]["error"] = str(e)
+        with status_lock:
+            processing_status[job_id]["status"] = "error"
+            processing_status[job_id]["message"] = "エラーが発生しました"
+            processing_status[job_id]["error"] = str(e)
 
-        # エラー時も一時ファイルを削除
+    finally:
+        # 成功・失敗にかかわらず一時ファイルを削除
         if html_path.exists():
             html_path.unlink()
 
@@ -0,0 +1,168 @@
+"""
+ページ取得方式の選択（ドメインごとの学習）
+
+transcribe_website はページを次のいずれかの方式で取得する。
+- browser : 通常のブラウザ表示
+- no_js   : JavaScriptを無効化したブラウザ表示
+- static  : HTMLをダウンロードし、スクリプトを除いて描画する（capture_static_render）
+
+ドメインごとに方式別の成功・失敗回数と1回あたりの所要時間を記録し、
+成功の記録がある方式を「所要時間 ÷ 成功率」が小さい順に試す（失敗する方式で毎回待たされないようにする）。
+未試行の方式はその後、失敗しか記録が無い方式は最後に回す。
+古い記録ほど重みを下げ（半減期 CAPTURE_PLANNER_HALF_LIFE_DAYS）、サイトの変化に追従する。
+記録は出力フォルダの capture_strategies.json に保存する。
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+STRATEGIES = ("browser", "no_js", "static")
+STRATEGY_LABELS = {
+    "browser": "通常のブラウザ表示",
+    "no_js": "JavaScript無効のブラウザ表示",
+    "static": "HTMLダウンロード方式",
+}
+STATS_FILENAME = "capture_strategies.json"
+STATS_VERSION = 1
+
+PLANNER_ENABLED = os.getenv("CAPTURE_PLANNER", "1") != "0"
+# 記録の重みが半分になるまでの日数
+HALF_LIFE_SECONDS = float(os.getenv("CAPTURE_PLANNER_HALF_LIFE_DAYS", "14")) * 86400
+# 記録を残すドメイン数の上限（更新が古いものから削除）
+MAX_DOMAINS = int(os.getenv("CAPTURE_PLANNER_MAX_DOMAINS", "2000"))
+# 成功率の事前分布（成功・失敗をそれぞれこの回数ずつ見たものとして扱う）
+PRIOR_WEIGHT = 1.0
+# 所要時間が未記録の方式に仮定する秒数
+DEFAULT_ATTEMPT_SECONDS = 30.0
+# 所要時間の移動平均で最新の計測に置く重み
+SECONDS_SMOOTHING = 0.3
+
+_lock = threading.Lock()
+
+
+def domain_for(url: str) -> Optional[str]:
+    """学習の単位となるドメイン（http/https 以外は None）"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return None
+    host = parsed.hostname.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def load_stats(stats_path: Path) -> Dict[str, Any]:
+    try:
+        stats = json.loads(Path(stats_path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        stats = None
+    if not isinstance(stats, dict) or stats.get("version") != STATS_VERSION:
+        return {"version": STATS_VERSION, "domains": {}}
+    return stats
+
+
+def _write_stats(stats_path: Path, stats: Dict[str, Any]) -> None:
+    stats_path = Path(stats_path)
+    stats_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = stats_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, stats_path)
+
+
+def _decay_factor(updated_at: float, now: float) -> float:
+    if HALF_LIFE_SECONDS <= 0:
+        return 1.0
+    return 0.5 ** (max(0.0, now - updated_at) / HALF_LIFE_SECONDS)
+
+
+def _strategy_stats(entry: Optional[Dict[str, Any]], strategy: str, now: float) -> Dict[str, float]:
+    """記録時からの経過時間で重みを下げた成功・失敗回数と平均所要時間"""
+    record = ((entry or {}).get("strategies") or {}).get(strategy)
+    if not record:
+        return {"successes": 0.0, "failures": 0.0, "seconds": DEFAULT_ATTEMPT_SECONDS}
+    factor = _decay_factor(float(entry.get("updated_at", now)), now)
+    seconds = record.get("seconds")
+    return {
+        "successes": float(record.get("successes", 0.0)) * factor,
+        "failures": float(record.get("failures", 0.0)) * factor,
+        "seconds": DEFAULT_ATTEMPT_SECONDS if seconds is None else float(seconds),
+    }
+
+
+def expected_cost(stats: Dict[str, float]) -> float:
+    """成功するまでに見込まれる所要時間（1回あたりの秒数 ÷ 成功率）"""
+    success_rate = (stats["successes"] + PRIOR_WEIGHT) / (stats["successes"] + stats["failures"] + 2 * PRIOR_WEIGHT)
+    return stats["seconds"] / success_rate
+
+
+def plan(url: str, stats_path: Path) -> List[str]:
+    """試す順番に並べた取得方式。記録が無ければ既定の順番（browser → no_js → static）"""
+    domain = domain_for(url)
+    if not PLANNER_ENABLED or domain is None:
+        return list(STRATEGIES)
+    entry = load_stats(stats_path)["domains"].get(domain)
+    if not entry:
+        return list(STRATEGIES)
+    now = time.time()
+    return sorted(STRATEGIES, key=lambda strategy: _plan_key(_strategy_stats(entry, strategy, now), strategy))
+
+
+def _plan_key(stats: Dict[str, float], strategy: str) -> tuple:
+    """成功の記録がある方式 → 未試行の方式（既定の順番のまま）→ 失敗しか記録が無い方式 の順に並べる
+
+    未試行の方式は所要時間も成功率も仮定の値でしかないため、成功の記録がある方式より先には試さない。
+    既定の順番が入れ替わるのは、前の方式で失敗が記録されている場合だけになる。
+    """
+    if stats["successes"] > 0:
+        return (0, expected_cost(stats), STRATEGIES.index(strategy))
+    if stats["failures"] <= 0:
+        return (1, 0.0, STRATEGIES.index(strategy))
+    return (2, expected_cost(stats), STRATEGIES.index(strategy))
+
+
+def record(url: str, attempts: List[Dict[str, Any]], stats_path: Path) -> None:
+    """今回の試行結果（strategy / success / seconds）をドメインの記録に反映する"""
+    domain = domain_for(url)
+    if not PLANNER_ENABLED or domain is None or not attempts:
+        return
+    with _lock:
+        stats = load_stats(stats_path)
+        domains = stats["domains"]
+        now = time.time()
+        previous = domains.get(domain)
+        strategies: Dict[str, Dict[str, float]] = {}
+        for strategy in STRATEGIES:
+            if ((previous or {}).get("strategies") or {}).get(strategy):
+                current = _strategy_stats(previous, strategy, now)
+                strategies[strategy] = {
+                    "successes": round(current["successes"], 4),
+                    "failures": round(current["failures"], 4),
+                    "seconds": current["seconds"],
+                }
+
+        for attempt in attempts:
+            current = strategies.get(attempt["strategy"])
+            if current is None:
+                current = {"successes": 0.0, "failures": 0.0, "seconds": attempt["seconds"]}
+                strategies[attempt["strategy"]] = current
+            else:
+                current["seconds"] += SECONDS_SMOOTHING * (attempt["seconds"] - current["seconds"])
+            current["seconds"] = round(current["seconds"], 3)
+            current["successes" if attempt["success"] else "failures"] += 1
+
+        domains[domain] = {
+            "updated_at": now,
+            "last_strategy": next((a["strategy"] for a in attempts if a["success"]), None),
+            "strategies": strategies,
+        }
+        if len(domains) > MAX_DOMAINS:
+            for stale in sorted(domains, key=lambda name: domains[name].get("updated_at", 0))[: len(domains) - MAX_DOMAINS]:
+                domains.pop(stale, None)
+        try:
+            _write_stats(stats_path, stats)
+        except OSError as error:
+            print(f"⚠️ ページ取得方式の記録を保存できませんでした: {error}")
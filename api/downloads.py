@@ -0,0 +1,201 @@
+"""
+結果ファイル配信まわりのヘルパー
+
+- ETag / Last-Modified による条件付きGET（304）
+- Range リクエスト（206）
+- テキスト系ファイルの gzip / brotli 圧縮
+- 一時ファイルを作らずに run ディレクトリを zip / tar でストリーミング
+"""
+
+import gzip
+import hashlib
+import io
+import mimetypes
+import os
+import tarfile
+import zipfile
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+CHUNK_SIZE = 256 * 1024
+TEXT_SUFFIXES = {".md", ".txt", ".json"}
+COMPRESS_MIN_BYTES = 1024
+# 既に圧縮済みの形式は zip でも無圧縮で格納する
+STORED_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp", ".gif"}
+ARCHIVE_EXCLUDE_SUFFIXES = {".tmp", ".link", ".sqlite3"}
+
+
+def media_type_for(path: Path) -> str:
+    if path.suffix == ".md":
+        return "text/markdown; charset=utf-8"
+    media_type, _ = mimetypes.guess_type(path.name)
+    if media_type and media_type.startswith("text/"):
+        return f"{media_type}; charset=utf-8"
+    return media_type or "application/octet-stream"
+
+
+def content_disposition(filename: str) -> str:
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
+
+
+def file_etag(stat: os.stat_result) -> str:
+    return '"' + hashlib.sha1(f"{stat.st_size}-{stat.st_mtime_ns}".encode()).hexdigest() + '"'
+
+
+def archive_etag(files: List[Path], archive_format: str) -> str:
+    digest = hashlib.sha1(archive_format.encode())
+    for path in files:
+        stat = path.stat()
+        digest.update(f"{path.name}-{stat.st_size}-{stat.st_mtime_ns}".encode())
+    return '"' + digest.hexdigest() + '"'
+
+
+def last_modified(mtime: float) -> str:
+    return formatdate(mtime, usegmt=True)
+
+
+def is_not_modified(headers, etag: str, mtime: float) -> bool:
+    """If-None-Match / If-Modified-Since を評価する"""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """単一範囲の "bytes=start-end" を (start, end) に変換する。満たせない場合は ValueError"""
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        # 複数範囲は非対応のため全体を返す
+        return None
+    start_text, _, end_text = spec.partition("-")
+    if start_text:
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    else:
+        suffix_length = int(end_text)
+        start = max(0, size - suffix_length)
+        end = size - 1
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+def iter_file(path: Path, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def choose_encoding(path: Path, accept_encoding: str, size: int) -> Optional[str]:
+    if path.suffix not in TEXT_SUFFIXES or size < COMPRESS_MIN_BYTES:
+        return None
+    accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def archive_members(run_dir: Path) -> List[Path]:
+    """アーカイブに含める run ディレクトリ直下のファイル（分割画像などのサブフォルダ・隠しファイルは除く）"""
+    return sorted(
+        path
+        for path in run_dir.iterdir()
+        if path.is_file() and not path.name.startswith(".") and path.suffix not in ARCHIVE_EXCLUDE_SUFFIXES
+    )
+
+
+class _StreamBuffer(io.RawIOBase):
+    """zipfile / tarfile の書き込みを受け取り、チャンク単位で取り出すための非シーク型バッファ"""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(files: List[Path], root_name: str) -> Iterator[bytes]:
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for path in files:
+            info = zipfile.ZipInfo.from_file(path, arcname=f"{root_name}/{path.name}")
+            info.compress_type = (
+                zipfile.ZIP_STORED if path.suffix.lower() in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+            )
+            with archive.open(info, mode="w", force_zip64=True) as dest:
+                for chunk in iter_file(path):
+                    dest.write(chunk)
+                    data = buffer.pop()
+                    if data:
+                        yield data
+            data = buffer.pop()
+            if data:
+                yield data
+    yield buffer.pop()
+
+
+def iter_tar(files: List[Path], root_name: str) -> Iterator[bytes]:
+    """tar はヘッダ＋本体＋512バイト境界のパディングを順に書き出すだけで作れる"""
+    for path in files:
+        stat = path.stat()
+        info = tarfile.TarInfo(name=f"{root_name}/{path.name}")
+        info.size = stat.st_size
+        info.mtime = int(stat.st_mtime)
+        info.mode = 0o644
+        yield info.tobuf(format=tarfile.PAX_FORMAT, encoding="utf-8")
+        yield from iter_file(path)
+        padding = (-stat.st_size) % tarfile.BLOCKSIZE
+        if padding:
+            yield b"\0" * padding
+    yield b"\0" * (tarfile.BLOCKSIZE * 2)
+
+
+def cache_headers(etag: str, mtime: float) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Last-Modified": last_modified(mtime),
+        "Cache-Control": "private, max-age=0, must-revalidate",
+    }
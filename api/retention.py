@@ -0,0 +1,232 @@
+"""
+api/output と api/temp の保持ポリシー
+
+Cloud Run のようにディスクがメモリ上にある環境で、長時間動くインスタンスが
+自分の出力で容量を使い切らないように、以下を定期的に行う。
+
+- 合計サイズ・経過時間の上限を超えた run_* ディレクトリを最終アクセスが古い順に削除（LRU）
+- 残す run の分割画像を削除し、PNGを可逆圧縮（またはWebP化）して縮小
+- 取り残された api/temp のアップロードファイルを削除
+"""
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from PIL import Image
+
+import run_index
+
+OUTPUT_MAX_BYTES = int(os.getenv("OUTPUT_MAX_BYTES", str(512 * 1024 * 1024)))
+OUTPUT_MAX_AGE_SECONDS = float(os.getenv("OUTPUT_MAX_AGE_HOURS", "24")) * 3600
+TEMP_MAX_AGE_SECONDS = float(os.getenv("TEMP_MAX_AGE_MINUTES", "30")) * 60
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "300"))
+IN_PROGRESS_GRACE_SECONDS = 3600
+# none / png（可逆最適化） / webp（可逆WebPに変換）
+RECOMPRESS_MODE = os.getenv("OUTPUT_RECOMPRESS", "png").lower()
+
+MANIFEST_FILENAME = "run_manifest.json"
+# 最終アクセス時刻を記録する目印ファイル（更新時刻だけを使う）
+ACCESS_MARKER_FILENAME = ".last_access"
+
+
+def dir_size(path: Path) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def last_access(run_dir: Path) -> float:
+    """最終アクセス時刻。touch_run の目印ファイルを優先し、無ければ作成時に近いフォルダの更新時刻を使う
+
+    フォルダの更新時刻は圧縮やマニフェスト・メトリクスの書き込みでも変わるため、アクセスの記録には使わない。
+    """
+    for path in (run_dir / ACCESS_MARKER_FILENAME, run_dir):
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            continue
+    return 0.0
+
+
+def touch_run(run_dir: Path) -> None:
+    """ダウンロード等で参照された run を LRU の末尾（最新）に回す"""
+    try:
+        (run_dir / ACCESS_MARKER_FILENAME).touch()
+    except OSError:
+        pass
+
+
+def list_run_dirs(output_dir: Path) -> List[Path]:
+    """output 直下とキーワード別フォルダ直下の run_* を列挙する（latest リンクは除外）"""
+    run_dirs: List[Path] = []
+    if not output_dir.exists():
+        return run_dirs
+    for entry in output_dir.iterdir():
+        if entry.is_symlink() or not entry.is_dir():
+            continue
+        if entry.name.startswith("run_"):
+            run_dirs.append(entry)
+            continue
+        for child in entry.iterdir():
+            if child.name.startswith("run_") and child.is_dir() and not child.is_symlink():
+                run_dirs.append(child)
+    return run_dirs
+
+
+def _load_manifest(run_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads((run_dir / MANIFEST_FILENAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(run_dir: Path, manifest: Dict[str, Any]) -> None:
+    manifest_path = run_dir / MANIFEST_FILENAME
+    tmp_path = manifest_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def compact_run(run_dir: Path, mode: str = RECOMPRESS_MODE) -> int:
+    """分割画像を削除し、残すPNGを再圧縮する。削減できたバイト数を返す"""
+    manifest = _load_manifest(run_dir)
+    if manifest is not None and manifest.get("compacted"):
+        return 0
+
+    before = dir_size(run_dir)
+    shutil.rmtree(run_dir / "segments", ignore_errors=True)
+
+    if mode in ("png", "webp"):
+        for png_path in run_dir.glob("*.png"):
+            try:
+                with Image.open(png_path) as img:
+                    img.load()
+                    if mode == "webp":
+                        webp_path = png_path.with_suffix(".webp")
+                        img.save(webp_path, "WEBP", lossless=True, method=4)
+                    else:
+                        tmp_path = png_path.with_name(png_path.stem + ".tmp.png")
+                        img.save(tmp_path, "PNG", optimize=True)
+            except Exception as error:
+                print(f"⚠️ 画像の再圧縮に失敗しました ({png_path}): {error}")
+                continue
+
+            if mode == "webp":
+                png_path.unlink()
+                if manifest and (manifest.get("screenshot") or {}).get("path") == str(png_path):
+                    manifest["screenshot"]["path"] = str(webp_path)
+            elif tmp_path.stat().st_size < png_path.stat().st_size:
+                os.replace(tmp_path, png_path)
+            else:
+                tmp_path.unlink()
+
+    if manifest is not None:
+        manifest["compacted"] = mode
+        _write_manifest(run_dir, manifest)
+
+    return max(0, before - dir_size(run_dir))
+
+
+def sweep_temp(temp_dir: Path, max_age_seconds: float = TEMP_MAX_AGE_SECONDS, keep: Iterable[Path] = ()) -> int:
+    """処理中でない古い一時ファイルを削除し、削除件数を返す"""
+    if not temp_dir.exists():
+        return 0
+    keep_paths = {Path(path).resolve() for path in keep}
+    now = time.time()
+    removed = 0
+    for entry in temp_dir.iterdir():
+        if entry.resolve() in keep_paths:
+            continue
+        try:
+            if now - entry.stat().st_mtime < max_age_seconds:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry)
+            else:
+                entry.unlink()
+            removed += 1
+        except OSError as error:
+            print(f"⚠️ 一時ファイルの削除に失敗しました ({entry}): {error}")
+    return removed
+
+
+def enforce_retention(
+    output_dir: Path,
+    *,
+    max_bytes: int = OUTPUT_MAX_BYTES,
+    max_age_seconds: float = OUTPUT_MAX_AGE_SECONDS,
+    recompress: str = RECOMPRESS_MODE,
+    keep: Iterable[Path] = (),
+    index_path: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """保持ポリシーを適用し、削除・圧縮の結果を返す
+
+    keep に含まれる run_dir（処理中・直近に返却したジョブなど）は削除しない。
+    """
+    keep_dirs: Set[Path] = {Path(path).resolve() for path in keep}
+    now = time.time()
+
+    runs = []
+    for run_dir in list_run_dirs(output_dir):
+        runs.append(
+            {
+                "path": run_dir,
+                "accessed": last_access(run_dir),
+                "size": dir_size(run_dir),
+                # metrics.json はジョブの最後に登録されるため、未登録のものは処理中とみなす
+                "finished": "metrics" in ((_load_manifest(run_dir) or {}).get("outputs") or {}),
+            }
+        )
+    runs.sort(key=lambda run: run["accessed"])
+
+    total_bytes = sum(run["size"] for run in runs)
+    evicted: List[Path] = []
+    reclaimed = 0
+
+    for run in runs:
+        protected = run["path"].resolve() in keep_dirs or (
+            not run["finished"] and now - run["accessed"] < IN_PROGRESS_GRACE_SECONDS
+        )
+        expired = now - run["accessed"] > max_age_seconds
+        over_budget = total_bytes > max_bytes
+        if protected or not (expired or over_budget):
+            continue
+        try:
+            shutil.rmtree(run["path"])
+        except OSError as error:
+            print(f"⚠️ 出力フォルダの削除に失敗しました ({run['path']}): {error}")
+            continue
+        evicted.append(run["path"])
+        total_bytes -= run["size"]
+        reclaimed += run["size"]
+
+    if evicted and index_path is not None:
+        run_index.delete_runs(index_path, evicted)
+
+    compacted = 0
+    for run in runs:
+        if run["path"] in evicted or run["path"].resolve() in keep_dirs or not run["finished"]:
+            continue
+        saved = compact_run(run["path"], recompress)
+        if saved:
+            compacted += 1
+            total_bytes -= saved
+            reclaimed += saved
+
+    return {
+        "runs": len(runs),
+        "evicted": [str(path) for path in evicted],
+        "compacted": compacted,
+        "reclaimed_bytes": reclaimed,
+        "total_bytes": max(0, total_bytes),
+    }
@@ -0,0 +1,229 @@
+"""
+文字起こし実行(run_*)のSQLiteインデックス
+
+run_manifest.json の要約（URL・キーワード・日時・状態・成果物パス・ハッシュ・トークン使用量）を
+1行ずつ保持し、「キーワードXの最新N件の分析」「URL Yの全実行」をディレクトリ走査なしで引けるようにする。
+"""
+
+import argparse
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+INDEX_FILENAME = "run_index.sqlite3"
+MANIFEST_FILENAME = "run_manifest.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_dir TEXT PRIMARY KEY,
+    output_root TEXT NOT NULL,
+    url TEXT,
+    keyword_slug TEXT,
+    timestamp TEXT,
+    status TEXT NOT NULL,
+    manifest_path TEXT,
+    markdown_path TEXT,
+    text_path TEXT,
+    metrics_path TEXT,
+    screenshot_path TEXT,
+    analysis_request_path TEXT,
+    analysis_result_path TEXT,
+    screenshot_sha256 TEXT,
+    combined_text_sha256 TEXT,
+    calls INTEGER DEFAULT 0,
+    prompt_tokens INTEGER DEFAULT 0,
+    output_tokens INTEGER DEFAULT 0,
+    total_tokens INTEGER DEFAULT 0,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_root_time ON runs (output_root, timestamp);
+CREATE INDEX IF NOT EXISTS idx_runs_keyword_time ON runs (keyword_slug, timestamp);
+CREATE INDEX IF NOT EXISTS idx_runs_url_time ON runs (url, timestamp);
+"""
+
+COLUMNS = (
+    "run_dir",
+    "output_root",
+    "url",
+    "keyword_slug",
+    "timestamp",
+    "status",
+    "manifest_path",
+    "markdown_path",
+    "text_path",
+    "metrics_path",
+    "screenshot_path",
+    "analysis_request_path",
+    "analysis_result_path",
+    "screenshot_sha256",
+    "combined_text_sha256",
+    "calls",
+    "prompt_tokens",
+    "output_tokens",
+    "total_tokens",
+    "updated_at",
+)
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def manifest_to_row(manifest: Dict[str, Any], status: Optional[str] = None) -> Dict[str, Any]:
+    run_dir = Path(manifest["run_dir"]).resolve()
+    outputs = manifest.get("outputs") or {}
+    usage = manifest.get("usage") or {}
+    if status is None:
+        status = "analyzed" if outputs.get("analysis_result") else "transcribed"
+
+    return {
+        "run_dir": str(run_dir),
+        "output_root": str(run_dir.parent),
+        "url": manifest.get("url"),
+        "keyword_slug": manifest.get("keyword_slug"),
+        "timestamp": manifest.get("timestamp"),
+        "status": status,
+        "manifest_path": str(run_dir / MANIFEST_FILENAME),
+        "markdown_path": outputs.get("markdown"),
+        "text_path": outputs.get("text"),
+        "metrics_path": outputs.get("metrics"),
+        "screenshot_path": (manifest.get("screenshot") or {}).get("path"),
+        "analysis_request_path": outputs.get("analysis_request"),
+        "analysis_result_path": outputs.get("analysis_result"),
+        "screenshot_sha256": (manifest.get("screenshot") or {}).get("sha256"),
+        "combined_text_sha256": manifest.get("combined_text_sha256"),
+        "calls": usage.get("calls", 0),
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0),
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def upsert_runs(db_path: Path, manifests: List[Dict[str, Any]], status: Optional[str] = None) -> None:
+    """マニフェストを1トランザクションでインデックスへ反映する"""
+    rows = [manifest_to_row(manifest, status) for manifest in manifests if manifest.get("run_dir")]
+    if not rows:
+        return
+    placeholders = ", ".join(f":{column}" for column in COLUMNS)
+    with closing(connect(db_path)) as conn, conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO runs ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+            rows,
+        )
+
+
+def upsert_run(db_path: Path, manifest: Dict[str, Any], status: Optional[str] = None) -> None:
+    upsert_runs(db_path, [manifest], status)
+
+
+def delete_runs(db_path: Path, run_dirs: List[Path]) -> None:
+    """削除済みの run_dir をインデックスから取り除く"""
+    if not run_dirs or not db_path.exists():
+        return
+    with closing(connect(db_path)) as conn, conn:
+        conn.executemany(
+            "DELETE FROM runs WHERE run_dir = ?",
+            [(str(Path(run_dir).resolve()),) for run_dir in run_dirs],
+        )
+
+
+def query_runs(
+    db_path: Path,
+    *,
+    output_root: Optional[Path] = None,
+    keyword_slug: Optional[str] = None,
+    url: Optional[str] = None,
+    with_analysis: bool = False,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """条件に合う実行を新しい順に返す"""
+    if not db_path.exists():
+        return []
+
+    conditions = []
+    params: List[Any] = []
+    if output_root is not None:
+        conditions.append("output_root = ?")
+        params.append(str(Path(output_root).resolve()))
+    if keyword_slug is not None:
+        conditions.append("keyword_slug = ?")
+        params.append(keyword_slug)
+    if url is not None:
+        conditions.append("url = ?")
+        params.append(url)
+    if with_analysis:
+        conditions.append("analysis_result_path IS NOT NULL")
+
+    sql = "SELECT * FROM runs"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY timestamp DESC, run_dir DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    with closing(connect(db_path)) as conn:
+        return [dict(row) for row in conn.execute(sql, params)]
+
+
+def latest_run(db_path: Path, **filters) -> Optional[Dict[str, Any]]:
+    rows = query_runs(db_path, limit=1, **filters)
+    return rows[0] if rows else None
+
+
+def rebuild_index(db_path: Path, output_dir: Path) -> int:
+    """既存の run_manifest.json を走査してインデックスを作り直す（初回移行用）"""
+    manifests = []
+    for manifest_path in output_dir.rglob(MANIFEST_FILENAME):
+        if manifest_path.parent.is_symlink():
+            continue
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as error:
+            print(f"⚠️ マニフェストを読み込めませんでした ({manifest_path}): {error}")
+            continue
+        manifest["run_dir"] = str(manifest_path.parent)
+        manifests.append(manifest)
+
+    upsert_runs(db_path, manifests)
+    return len(manifests)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="文字起こし実行インデックスの再構築・検索")
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=Path(__file__).resolve().parent / "output",
+        help="run_* ディレクトリを含む出力ルート",
+    )
+    parser.add_argument("--rebuild", action="store_true", help="run_manifest.json からインデックスを再構築します")
+    parser.add_argument("--keyword", help="キーワードスラッグで絞り込み")
+    parser.add_argument("--url", help="URLで絞り込み")
+    parser.add_argument("--limit", type=int, default=20, help="表示件数")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    db_path = args.output_dir / INDEX_FILENAME
+
+    if args.rebuild:
+        count = rebuild_index(db_path, args.output_dir)
+        print(f"✅ {count} 件の実行をインデックスに登録しました: {db_path}")
+
+    for row in query_runs(db_path, keyword_slug=args.keyword, url=args.url, limit=args.limit):
+        print(f"{row['timestamp']}  [{row['status']}]  {row['url']}  ({row['run_dir']})")
+
+
+if __name__ == "__main__":
+    main()
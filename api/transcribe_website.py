@@ -4,15 +4,19 @@ Playwrightでページを取得し、スマートフォン表示のフルスク
 """
 
 import argparse
+import hashlib
+import json
 import sys
 import time
 import re
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 import os
 import subprocess
 import shutil
+import unicodedata
+from difflib import SequenceMatcher
 
 import math
 
@@ -43,6 +47,11 @@ from playwright.sync_api import (
     Error as PlaywrightError,
 )
 
+import blob_store
+import capture_planner
+import image_pyramid
+import run_index
+
 # .envファイルから環境変数を読み込む
 ENV_PATH = Path(__file__).resolve().parent / ".env"
 if load_dotenv is not None:
@@ -51,6 +60,9 @@ if load_dotenv is not None:
 SCRIPT_DIR = Path(__file__).resolve().parent
 BASE_OUTPUT_DIR = SCRIPT_DIR / "output"
 BASE_OUTPUT_DIR.mkdir(exist_ok=True)
+RUN_INDEX_PATH = BASE_OUTPUT_DIR / run_index.INDEX_FILENAME
+ARTIFACT_STORE_DIR = blob_store.get_store_dir(BASE_OUTPUT_DIR / "blobs")
+CAPTURE_STRATEGY_PATH = BASE_OUTPUT_DIR / capture_planner.STATS_FILENAME
 
 
 def get_output_root(keyword_slug: Optional[str] = None) -> Path:
@@ -82,6 +94,25 @@ if GENAI_LIB_AVAILABLE and GOOGLE_API_KEY:
 
 SLICE_HEIGHT_DEFAULT = 1400
 SLICE_OVERLAP_DEFAULT = 120
+# スクロール後の遅延読み込み待ち（秒）・スライス撮影前の待ち（秒）・OCR並列数
+SCROLL_SETTLE_SECONDS = 1.5
+SEGMENT_SETTLE_SECONDS = 0.3
+OCR_MAX_WORKERS = 3
+OCR_MODEL_NAME = "gemini-2.0-flash-exp"
+METRICS_FILENAME = "metrics.json"
+MANIFEST_FILENAME = "run_manifest.json"
+MANIFEST_VERSION = 1
+
+# 隣接セグメントの重なり帯で重複した行を検出するための設定
+SEAM_WINDOW_LINES = 8
+SEAM_SIMILARITY_THRESHOLD = 0.85
+SEAM_MIN_CONTAINED_CHARS = 6
+ALIGNMENT_STRIP_PATTERN = re.compile(r"[\s#*>\-\[\]`_|・、。，,.．!！?？:：;；「」『』()（）【】]+")
+ALIGNMENT_DIGITS_PATTERN = re.compile(r"\d+")
+
+# 100万トークンあたりの単価(USD)。設定されている場合のみ推定コストを算出する
+GEMINI_INPUT_PRICE_PER_1M = float(os.getenv("GEMINI_INPUT_PRICE_PER_1M", "0") or 0)
+GEMINI_OUTPUT_PRICE_PER_1M = float(os.getenv("GEMINI_OUTPUT_PRICE_PER_1M", "0") or 0)
 DESKTOP_VIEWPORT = {"width": 1400, "height": 900}
 DESKTOP_USER_AGENT = (
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_0) "
@@ -207,6 +238,11 @@ def parse_args() -> argparse.Namespace:
         type=Path,
         help="ローカルのHTMLファイルまたはディレクトリを文字起こし対象に指定します",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="前回の実行結果（latest）と画像ハッシュを比較し、変化したセグメントだけOCRします",
+    )
     parser.add_argument(
         "--slice-height",
         dest="slice_height",
@@ -221,6 +257,11 @@ def parse_args() -> argparse.Namespace:
         default=SLICE_OVERLAP_DEFAULT,
         help="分割画像同士の重なり(px)。小さすぎると行が欠けやすくなります",
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Gemini OCRをストリーミングで実行し、得られたテキストを逐次表示します",
+    )
     args = parser.parse_args()
 
     if args.url and args.html_path:
@@ -288,7 +329,7 @@ def scroll_page(page) -> None:
     for ratio in checkpoints:
         target = int(body_height * ratio)
         page.evaluate("(y) => window.scrollTo({top: y, behavior: 'smooth'})", target)
-        time.sleep(1.5)
+        time.sleep(SCROLL_SETTLE_SECONDS)
 
     page.evaluate("() => window.scrollTo(0, 0)")
     time.sleep(1.0)
@@ -354,7 +395,7 @@ def capture_page_screenshots(page, run_dir: Path, slice_height: int = 1400, over
         while current_top < total_height:
             # スクロール位置を設定
             page.evaluate(f"() => window.scrollTo(0, {current_top})")
-            time.sleep(0.3)  # 画像読み込み待機
+            time.sleep(SEGMENT_SETTLE_SECONDS)  # 画像読み込み待機
 
             # 現在のビューポートをスクリーンショット
             segment_path = segments_dir / f"segment_{index:04d}.png"
@@ -561,6 +602,102 @@ def capture_static_render(
     return meta, visible_text, screenshot_path, segments_meta
 
 
+def capture_with_browser(
+    playwright,
+    url: str,
+    run_dir: Path,
+    context_options: dict,
+    slice_height: int = 1400,
+    overlap: int = 120,
+    javascript_enabled: bool = True,
+) -> tuple[Dict[str, str], str, Path, List[Dict[str, Any]]]:
+    if not javascript_enabled:
+        context_options = {**context_options, "java_script_enabled": False}
+    browser = launch_browser(playwright)
+    context = browser.new_context(**context_options)
+    try:
+        context.add_init_script("""
+            (function() {
+                const noop = function noop() {};
+                try {
+                    Object.defineProperty(window, 'close', { value: noop, configurable: true });
+                } catch (_) {
+                    window.close = noop;
+                }
+                try {
+                    window.open = function() { return window; };
+                } catch (_) {}
+                try {
+                    Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
+                } catch (_) {}
+                try {
+                    delete window.__nightmare;
+                    delete window.__selenium_unwrapped;
+                    delete window._Selenium_IDE_Recorder;
+                } catch (_) {}
+            })();
+        """)
+    except PlaywrightError:
+        pass
+    page = None
+    try:
+        page, meta, visible_text, screenshot_path, segments_meta = load_and_capture(
+            context=context,
+            url=url,
+            run_dir=run_dir,
+            slice_height=slice_height,
+            overlap=overlap,
+        )
+    finally:
+        if page and not page.is_closed():
+            try:
+                page.close()
+            except PlaywrightError:
+                pass
+        try:
+            context.close()
+        except PlaywrightError:
+            pass
+        try:
+            browser.close()
+        except PlaywrightError:
+            pass
+
+    if not screenshot_path:
+        raise RuntimeError("スクリーンショットを取得できませんでした。")
+    return meta, visible_text, screenshot_path, segments_meta
+
+
+def run_capture_strategy(
+    strategy: str,
+    playwright,
+    url: str,
+    run_dir: Path,
+    context_options: dict,
+    slice_height: int = 1400,
+    overlap: int = 120,
+) -> tuple[Dict[str, str], str, Path, List[Dict[str, Any]]]:
+    """capture_planner.STRATEGIES の1方式でページを取得する"""
+    if strategy == "static":
+        return capture_static_render(
+            playwright=playwright,
+            url=url,
+            run_dir=run_dir,
+            context_options=context_options,
+            slice_height=slice_height,
+            overlap=overlap,
+        )
+    return capture_with_browser(
+        playwright=playwright,
+        url=url,
+        run_dir=run_dir,
+        context_options=context_options,
+        slice_height=slice_height,
+        overlap=overlap,
+        javascript_enabled=strategy != "no_js",
+    )
+
+
 def merge_segment_images(segment_paths: List[Path], output_path: Path) -> None:
     images = [Image.open(p).convert("RGB") for p in segment_paths]
     try:
@@ -598,16 +735,144 @@ def extract_text_from_genai_response(response) -> str:
     return "\n".join(texts)
 
 
-def run_gemini_ocr(image_path: str) -> str:
+def extract_usage_from_genai_response(response) -> Dict[str, int]:
+    """usage_metadata からトークン数を取り出す（取得できない項目は0）"""
+    usage = getattr(response, "usage_metadata", None) if response is not None else None
+
+    def _count(field: str) -> int:
+        if usage is None:
+            return 0
+        try:
+            return int(getattr(usage, field, 0) or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    return {
+        "prompt_tokens": _count("prompt_token_count"),
+        "output_tokens": _count("candidates_token_count"),
+        "total_tokens": _count("total_token_count"),
+    }
+
+
+def estimate_cost_usd(prompt_tokens: int, output_tokens: int) -> Optional[float]:
+    if not GEMINI_INPUT_PRICE_PER_1M and not GEMINI_OUTPUT_PRICE_PER_1M:
+        return None
+    cost = (
+        prompt_tokens * GEMINI_INPUT_PRICE_PER_1M
+        + output_tokens * GEMINI_OUTPUT_PRICE_PER_1M
+    ) / 1_000_000
+    return round(cost, 6)
+
+
+def build_gemini_call_record(
+    label: str,
+    model_name: str,
+    response,
+    started_at: float,
+    retries: int = 0,
+    error: Optional[Exception] = None,
+) -> Dict[str, Any]:
+    """Gemini呼び出し1回分のトークン数・レイテンシ・リトライ回数を記録する"""
+    try:
+        usage = extract_usage_from_genai_response(response)
+    except Exception:
+        usage = extract_usage_from_genai_response(None)
+
+    record: Dict[str, Any] = {
+        "label": label,
+        "model": model_name,
+        **usage,
+        "latency_seconds": round(time.perf_counter() - started_at, 3),
+        "retries": retries,
+    }
+    cost = estimate_cost_usd(usage["prompt_tokens"], usage["output_tokens"])
+    if cost is not None:
+        record["estimated_cost_usd"] = cost
+    if error is not None:
+        record["error"] = str(error)
+    return record
+
+
+def summarize_gemini_calls(calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """呼び出し記録を合計し、モデル別の内訳も付けて返す"""
+    totals: Dict[str, Any] = {
+        "calls": 0,
+        "errors": 0,
+        "prompt_tokens": 0,
+        "output_tokens": 0,
+        "total_tokens": 0,
+        "latency_seconds": 0.0,
+        "retries": 0,
+        "by_model": {},
+    }
+    cost_total: Optional[float] = None
+
+    for call in calls:
+        if not call:
+            continue
+        totals["calls"] += 1
+        if call.get("error"):
+            totals["errors"] += 1
+        for key in ("prompt_tokens", "output_tokens", "total_tokens", "retries"):
+            totals[key] += int(call.get(key, 0) or 0)
+        totals["latency_seconds"] += float(call.get("latency_seconds", 0.0) or 0.0)
+        if call.get("estimated_cost_usd") is not None:
+            cost_total = (cost_total or 0.0) + float(call["estimated_cost_usd"])
+
+        model_totals = totals["by_model"].setdefault(
+            call.get("model", "unknown"),
+            {"calls": 0, "prompt_tokens": 0, "output_tokens": 0},
+        )
+        model_totals["calls"] += 1
+        model_totals["prompt_tokens"] += int(call.get("prompt_tokens", 0) or 0)
+        model_totals["output_tokens"] += int(call.get("output_tokens", 0) or 0)
+
+    totals["latency_seconds"] = round(totals["latency_seconds"], 3)
+    if cost_total is not None:
+        totals["estimated_cost_usd"] = round(cost_total, 6)
+    return totals
+
+
+def collect_streamed_text(response, on_chunk: Optional[Callable[[str], None]] = None) -> str:
+    """ストリーミング応答をチャンクごとに受け取り、コールバックへ渡しつつ全文を組み立てる"""
+    chunks: List[str] = []
+    for chunk in response:
+        try:
+            chunk_text = extract_text_from_genai_response(chunk)
+        except ValueError:
+            # 終了通知などテキストを持たないチャンクは読み飛ばす
+            continue
+        if not chunk_text:
+            continue
+        chunks.append(chunk_text)
+        if on_chunk is not None:
+            try:
+                on_chunk(chunk_text)
+            except Exception as callback_error:
+                print(f"⚠️ ストリーミングチャンクの通知に失敗しました: {callback_error}")
+    return "".join(chunks)
+
+
+def run_gemini_ocr(
+    image_path: str,
+    stream: bool = False,
+    on_chunk: Optional[Callable[[str], None]] = None,
+    call_log: Optional[List[Dict[str, Any]]] = None,
+) -> str:
     """
     Gemini APIを呼び出して画像からテキストを抽出する
+
+    stream=True の場合は応答をストリーミングで受け取り、部分的なMarkdownを on_chunk に逐次渡す。
+    call_log を渡すと、呼び出しごとのトークン数・レイテンシを追記する。
     """
     if not GEMINI_AVAILABLE:
         return ""
 
+    started_at = time.perf_counter()
+    response = None
     try:
         print(f"    - Gemini APIでOCR処理中: {Path(image_path).name}")
-        model = genai.GenerativeModel("gemini-2.0-flash-exp")
+        model = genai.GenerativeModel(OCR_MODEL_NAME)
         
         # 画像を直接読み込んで送信（upload_fileを使わない方法）
         from PIL import Image
@@ -657,21 +922,41 @@ def run_gemini_ocr(image_path: str) -> str:
                     image_file,
                 ],
                 generation_config={"temperature": 0.0},
+                stream=stream,
             )
+
+            if stream:
+                text = collect_streamed_text(response, on_chunk).strip()
+            else:
+                text = extract_text_from_genai_response(response).strip()
         finally:
             # 画像を直接渡しているので削除不要
             pass
 
-        text = extract_text_from_genai_response(response).strip()
+        if call_log is not None:
+            call_log.append(
+                build_gemini_call_record(Path(image_path).name, OCR_MODEL_NAME, response, started_at)
+            )
         return text
 
     except Exception as e:
         print(f"❌ Gemini APIの呼び出し中にエラーが発生しました: {e}")
+        if call_log is not None:
+            call_log.append(
+                build_gemini_call_record(Path(image_path).name, OCR_MODEL_NAME, response, started_at, error=e)
+            )
         return ""
 
 
-def run_ocr_on_segments(segments: List[Dict[str, any]]) -> List[Dict[str, any]]:
-    """セグメントのOCRを並列処理（最適化版）"""
+def run_ocr_on_segments(
+    segments: List[Dict[str, any]],
+    stream: bool = False,
+    on_chunk: Optional[Callable[[Dict[str, Any], str], None]] = None,
+) -> List[Dict[str, any]]:
+    """セグメントのOCRを並列処理（最適化版）
+
+    stream=True の場合、各セグメントの部分テキストを on_chunk(segment, chunk) で通知する。
+    """
     if not GEMINI_AVAILABLE:
         print("⚠️ Gemini OCRが利用できないため、OCRセグメント処理をスキップします。")
         results = []
@@ -693,10 +978,39 @@ def run_ocr_on_segments(segments: List[Dict[str, any]]) -> List[Dict[str, any]]:
     def process_single_segment(segment):
         """単一セグメントのOCR処理"""
         try:
+            image_sha256 = segment.get("image_sha256") or blob_store.file_sha256(segment["path"])
+            cached = blob_store.load_ocr_cache(ARTIFACT_STORE_DIR, image_sha256, OCR_MODEL_NAME)
+            if cached is not None:
+                print(f"  ♻️ セグメント {segment['index']} はOCRキャッシュを使用します")
+                raw_text = cached.get("raw_text", "")
+                if on_chunk is not None and raw_text:
+                    on_chunk(segment, raw_text)
+                return {
+                    "index": segment["index"],
+                    "path": Path(segment["path"]),
+                    "top": segment["top"],
+                    "bottom": segment["bottom"],
+                    "raw_text": raw_text,
+                    "clean_text": clean_ocr_text(raw_text),
+                    "usage": None,
+                    "image_sha256": image_sha256,
+                    "ocr_cache_hit": True,
+                }
+
             print(f"  🔍 セグメント {segment['index']} 処理中...")
-            ocr_raw = run_gemini_ocr(segment["path"])
+            segment_on_chunk = None
+            if on_chunk is not None:
+                segment_on_chunk = lambda chunk_text: on_chunk(segment, chunk_text)
+            calls: List[Dict[str, Any]] = []
+            ocr_raw = run_gemini_ocr(
+                segment["path"],
+                stream=stream,
+                on_chunk=segment_on_chunk,
+                call_log=calls,
+            )
             raw_text = ocr_raw.strip()
             clean_text = clean_ocr_text(raw_text)
+            blob_store.save_ocr_cache(ARTIFACT_STORE_DIR, image_sha256, OCR_MODEL_NAME, raw_text)
 
             return {
                 "index": segment["index"],
@@ -705,6 +1019,8 @@ def run_ocr_on_segments(segments: List[Dict[str, any]]) -> List[Dict[str, any]]:
                 "bottom": segment["bottom"],
                 "raw_text": raw_text,
                 "clean_text": clean_text,
+                "usage": calls[-1] if calls else None,
+                "image_sha256": image_sha256,
             }
         except Exception as e:
             print(f"  ❌ セグメント {segment['index']} のOCRエラー: {e}")
@@ -717,11 +1033,11 @@ def run_ocr_on_segments(segments: List[Dict[str, any]]) -> List[Dict[str, any]]:
                 "clean_text": "",
             }
 
-    # ThreadPoolExecutorで並列処理（最大3スレッド）
+    # ThreadPoolExecutorで並列処理（最大 OCR_MAX_WORKERS スレッド）
     from concurrent.futures import ThreadPoolExecutor, as_completed
 
     results = []
-    with ThreadPoolExecutor(max_workers=3) as executor:
+    with ThreadPoolExecutor(max_workers=OCR_MAX_WORKERS) as executor:
         future_to_segment = {executor.submit(process_single_segment, seg): seg for seg in segments}
 
         for future in as_completed(future_to_segment):
@@ -763,101 +1079,510 @@ def clean_ocr_text(raw_text: str) -> str:
     if buffer:
         paragraphs.append("".join(buffer))
 
+    # OCRが同じ段落を続けて出力した場合のみ除去する（離れた位置の同一文言はLPの構成として残す）
     deduped: List[str] = []
-    seen = set()
+    previous_key: Optional[str] = None
 
     for paragraph in paragraphs:
-        key = paragraph.replace(" ", "")
-        if key in seen:
+        key = normalize_for_alignment(paragraph)
+        if key == previous_key:
             continue
-        seen.add(key)
+        previous_key = key
         deduped.append(paragraph)
 
     return "\n".join(deduped)
 
 
-def combine_clean_segments(segments: List[Dict[str, str]]) -> str:
-    combined: List[str] = []
-    seen = set()
+def normalize_for_alignment(text: str) -> str:
+    """OCR揺れを吸収するため、空白・記号・Markdown装飾を除いた比較用キーを作る"""
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    return ALIGNMENT_STRIP_PATTERN.sub("", normalized)
+
+
+def _splits_digit_run(text: str, start: int, end: int) -> bool:
+    """text[start:end] の両端が数字の途中で切れているか（「1000」が「11000」の一部に見えるのを防ぐ）"""
+    if 0 < start < len(text) and text[start - 1].isdigit() and text[start].isdigit():
+        return True
+    return 0 < end < len(text) and text[end - 1].isdigit() and text[end].isdigit()
+
+
+def _alignment_keys_match(previous_key: str, next_key: str) -> bool:
+    if previous_key == next_key:
+        return True
+    if not previous_key or not next_key:
+        return False
+
+    shorter, longer = sorted((previous_key, next_key), key=len)
+    # 重なり帯の境目で行が途中から/途中までしか写っていないケース
+    if len(shorter) >= max(SEAM_MIN_CONTAINED_CHARS, len(longer) // 2):
+        position = longer.find(shorter)
+        if position >= 0 and not _splits_digit_run(longer, position, position + len(shorter)):
+            return True
+
+    # 金額・数量だけが違う行（「料金 1000円」と「料金 1500円」など）は別の行として扱う
+    if ALIGNMENT_DIGITS_PATTERN.findall(previous_key) != ALIGNMENT_DIGITS_PATTERN.findall(next_key):
+        return False
+
+    matcher = SequenceMatcher(None, previous_key, next_key, autojunk=False)
+    if matcher.quick_ratio() < SEAM_SIMILARITY_THRESHOLD:
+        return False
+    return matcher.ratio() >= SEAM_SIMILARITY_THRESHOLD
+
+
+def find_seam_overlap(previous_keys: List[str], next_keys: List[str]) -> int:
+    """前セグメント末尾と次セグメント先頭が一致する最長の行数を返す
+
+    比較は末尾/先頭の SEAM_WINDOW_LINES 行に限定するため、継ぎ目あたりの処理量は一定で
+    全体としてテキスト長に対して線形になる。
+    """
+    max_lines = min(len(previous_keys), len(next_keys), SEAM_WINDOW_LINES)
+    for size in range(max_lines, 0, -1):
+        tail = previous_keys[-size:]
+        head = next_keys[:size]
+        if all(_alignment_keys_match(a, b) for a, b in zip(tail, head)):
+            return size
+    return 0
+
+
+def merge_segments_at_seams(segments: List[Dict[str, Any]]) -> tuple[str, List[Dict[str, Any]]]:
+    """隣接セグメントの重なり部分を継ぎ目で揃えて結合し、継ぎ目ごとの除去結果も返す
+
+    数字だけが違う行は重なりとみなさない（料金表が継ぎ目をまたいでも行を失わない）:
+
+    >>> text, seams = merge_segments_at_seams([
+    ...     {"index": 1, "clean_text": "## 月額料金\\nライト 1000円\\nスタンダード 2000円"},
+    ...     {"index": 2, "clean_text": "ライト 1500円\\nスタンダード 2500円\\n## 年額料金"},
+    ... ])
+    >>> seams[0]["removed_lines"], text.count("円")
+    (0, 4)
+    >>> text, seams = merge_segments_at_seams([
+    ...     {"index": 1, "clean_text": "ライト 1000円\\nスタンダード 2000円"},
+    ...     {"index": 2, "clean_text": "スタンダード 2,000円\\nプレミアム 3000円"},
+    ... ])
+    >>> seams[0]["removed"], text.count("円")
+    (['スタンダード 2,000円'], 3)
+    """
+    merged_lines: List[str] = []
+    merged_keys: List[str] = []
+    seams: List[Dict[str, Any]] = []
+    previous_index: Optional[int] = None
 
     for segment in segments:
         text = segment.get("clean_text", "").strip()
         if not text:
             continue
 
-        for paragraph in [p.strip() for p in text.split("\n") if p.strip()]:
-            if paragraph in seen:
-                continue
-            seen.add(paragraph)
-            combined.append(paragraph)
+        paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
+        keys = [normalize_for_alignment(p) for p in paragraphs]
+
+        overlap = 0
+        if merged_lines:
+            overlap = find_seam_overlap(merged_keys, keys)
+            for offset in range(overlap):
+                position = len(merged_lines) - overlap + offset
+                # 継ぎ目で切れていた側より完全な行が写っている方を残す
+                if len(keys[offset]) > len(merged_keys[position]):
+                    merged_lines[position] = paragraphs[offset]
+                    merged_keys[position] = keys[offset]
+            seams.append(
+                {
+                    "previous_index": previous_index,
+                    "index": segment.get("index"),
+                    "removed_lines": overlap,
+                    "removed": paragraphs[:overlap],
+                }
+            )
 
-    return "\n\n".join(combined)
+        merged_lines.extend(paragraphs[overlap:])
+        merged_keys.extend(keys[overlap:])
+        previous_index = segment.get("index")
 
+    return "\n\n".join(merged_lines), seams
 
-def save_markdown(result: Dict) -> Path:
-    md_path = result["run_dir"] / "website_transcription.md"
 
-    with open(md_path, "w", encoding="utf-8") as f:
-        f.write("# WebサイトOCR文字起こし結果\n\n")
-        f.write(f"**URL:** {result['url']}\n\n")
-        f.write(f"**抽出日時:** {result['timestamp']}\n\n")
-        f.write(f"**スクリーンショット:** {result['screenshot'].name}\n\n")
-
-        if result.get("source_type") == "local_html" and result.get("source_path"):
-            f.write(f"**ローカルHTML:** {result['source_path']}\n\n")
-        f.write(f"**分割数:** {len(result['segments'])} 枚\n\n")
-
-        if result.get("meta"):
-            f.write("## メタ情報\n\n")
-            f.write(f"- タイトル: {result['meta'].get('title', '')}\n")
-            if result['meta'].get('description'):
-                f.write(
-                    f"- 説明: {result['meta'].get('description', '').strip()}\n"
-                )
-            if result['meta'].get('keywords'):
-                f.write(f"- キーワード: {result['meta'].get('keywords', '').strip()}\n")
-            f.write("\n")
-
-        if result.get("combined_text"):
-            f.write("## 整理済みテキスト\n\n")
-            f.write(result["combined_text"] + "\n\n")
-
-        # Playwright抽出テキストセクションを削除（OCRのみ使用）
-
-        f.write("## OCRセグメント詳細\n\n")
-        for segment in result["segments"]:
-            f.write(f"### セグメント {segment['index']:02d}\n\n")
-            f.write(f"- ファイル: {segment['path'].name}\n")
-            f.write(
-                f"- 位置: {segment['top']}px 〜 {segment['bottom']}px\n\n"
+def combine_clean_segments(segments: List[Dict[str, str]]) -> str:
+    combined_text, _ = merge_segments_at_seams(segments)
+    return combined_text
+
+
+def store_capture_artifacts(screenshot_path: Path, segments: List[Dict[str, Any]]) -> None:
+    """スクリーンショットと分割画像をコンテンツアドレス型ストアへ移し、ハッシュを記録する"""
+    for segment in segments:
+        try:
+            segment["image_sha256"] = blob_store.store_file(
+                ARTIFACT_STORE_DIR, segment["path"], segment.get("image_sha256")
             )
+        except OSError as error:
+            print(f"⚠️ 分割画像をストアへ保存できませんでした ({segment['path']}): {error}")
+            segment["image_sha256"] = file_sha256(segment["path"])
+    try:
+        blob_store.store_file(ARTIFACT_STORE_DIR, screenshot_path)
+    except OSError as error:
+        print(f"⚠️ スクリーンショットをストアへ保存できませんでした: {error}")
+
 
-            if segment.get("clean_text"):
-                f.write("**整形テキスト**\n\n")
-                f.write("```\n")
-                f.write(segment["clean_text"])
-                f.write("\n```\n\n")
+def file_sha256(path) -> Optional[str]:
+    try:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except OSError:
+        return None
 
-            if segment.get("raw_text") and segment.get("raw_text") != segment.get("clean_text"):
-                f.write("**OCR生テキスト**\n\n")
-                f.write("```\n")
-                f.write(segment["raw_text"])
-                f.write("\n```\n\n")
 
+def text_sha256(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def build_run_manifest(result: Dict) -> Dict[str, Any]:
+    """文字起こし結果を機械可読なマニフェスト(JSON)に変換する"""
+    screenshot = result.get("screenshot")
+    segments = []
+    calls: List[Dict[str, Any]] = []
+    for segment in result.get("segments", []):
+        if segment.get("usage"):
+            calls.append(segment["usage"])
+        segments.append(
+            {
+                "index": segment.get("index"),
+                "top": segment.get("top"),
+                "bottom": segment.get("bottom"),
+                "path": str(segment.get("path", "")),
+                "image_sha256": segment.get("image_sha256"),
+                "text_sha256": text_sha256(segment.get("clean_text", "")),
+                "raw_text": segment.get("raw_text", ""),
+                "clean_text": segment.get("clean_text", ""),
+                "usage": segment.get("usage"),
+                "reused_from": segment.get("reused_from"),
+                "ocr_cache_hit": bool(segment.get("ocr_cache_hit")),
+            }
+        )
+
+    return {
+        "version": MANIFEST_VERSION,
+        "url": result.get("url"),
+        "timestamp": result.get("timestamp"),
+        "source_type": result.get("source_type", "url"),
+        "source_path": result.get("source_path"),
+        "keyword_slug": result.get("keyword_slug"),
+        "run_dir": str(result.get("run_dir", "")),
+        "slice_height": result.get("slice_height"),
+        "overlap": result.get("overlap"),
+        "meta": result.get("meta") or {},
+        "artifact_store": str(ARTIFACT_STORE_DIR),
+        "screenshot": {
+            "path": str(screenshot) if screenshot else None,
+            "sha256": file_sha256(screenshot) if screenshot else None,
+        },
+        "segments": segments,
+        "seams": [
+            {key: seam[key] for key in ("previous_index", "index", "removed_lines")}
+            for seam in result.get("seams", [])
+        ],
+        "combined_text": result.get("combined_text", ""),
+        "combined_text_sha256": text_sha256(result.get("combined_text", "")),
+        "timings": result.get("timings", {}),
+        "changes": result.get("changes"),
+        "pyramid": {
+            key: value
+            for key, value in (result.get("pyramid") or {}).items()
+            if key in ("width", "height", "tile_size", "format", "max_level")
+        },
+        "usage": summarize_gemini_calls(calls),
+        "outputs": dict(result.get("outputs", {})),
+    }
+
+
+def save_run_manifest(result: Dict) -> Path:
+    manifest = build_run_manifest(result)
+    result["manifest"] = manifest
+    return write_run_manifest(result["run_dir"], manifest)
+
+
+def write_run_manifest(run_dir: Path, manifest: Dict[str, Any]) -> Path:
+    manifest_path = Path(run_dir) / MANIFEST_FILENAME
+    tmp_path = manifest_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+    try:
+        run_index.upsert_run(RUN_INDEX_PATH, manifest)
+    except Exception as index_error:
+        print(f"⚠️ 実行インデックスの更新に失敗しました: {index_error}")
+    return manifest_path
+
+
+def load_run_manifest(run_dir: Path) -> Optional[Dict[str, Any]]:
+    manifest_path = Path(run_dir) / MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as error:
+        print(f"⚠️ マニフェストの読み込みに失敗しました ({manifest_path}): {error}")
+        return None
+
+
+def register_output(result: Dict, key: str, path: Path) -> None:
+    """生成したファイルのパスをマニフェストの outputs に記録する"""
+    result.setdefault("outputs", {})[key] = str(path)
+    manifest = result.get("manifest")
+    if manifest is None:
+        return
+    manifest.setdefault("outputs", {})[key] = str(path)
+    write_run_manifest(result["run_dir"], manifest)
+
+
+def record_run_output(run_dir: Path, key: str, path: Path) -> None:
+    """既存の run_dir のマニフェストに後段ツールの出力パスを追記する"""
+    manifest = load_run_manifest(run_dir)
+    if manifest is None:
+        return
+    manifest.setdefault("outputs", {})[key] = str(path)
+    write_run_manifest(run_dir, manifest)
+
+
+def find_previous_run_manifest(output_root: Path, url: str) -> Optional[Dict[str, Any]]:
+    """同じURLの直近の実行マニフェストを探す（インデックス → latest → run_* 走査の順）"""
+    try:
+        indexed = run_index.latest_run(RUN_INDEX_PATH, output_root=output_root, url=url)
+    except Exception as index_error:
+        print(f"⚠️ 実行インデックスの検索に失敗しました: {index_error}")
+        indexed = None
+    if indexed:
+        manifest = load_run_manifest(Path(indexed["run_dir"]))
+        if manifest:
+            return manifest
+
+    latest_manifest = load_run_manifest(output_root / "latest")
+    if latest_manifest and latest_manifest.get("url") == url:
+        return latest_manifest
+
+    if not output_root.exists():
+        return None
+    run_dirs = sorted(
+        (p for p in output_root.iterdir() if p.is_dir() and p.name.startswith("run_")),
+        key=lambda p: p.name,
+        reverse=True,
+    )
+    for run_dir in run_dirs:
+        manifest = load_run_manifest(run_dir)
+        if manifest and manifest.get("url") == url:
+            return manifest
+    return None
+
+
+def match_previous_segments(
+    segments: List[Dict[str, Any]],
+    previous_manifest: Dict[str, Any],
+) -> Dict[int, Dict[str, Any]]:
+    """画像ハッシュが一致する前回セグメントを、縦位置が最も近いものから対応付ける"""
+    previous_by_hash: Dict[str, List[Dict[str, Any]]] = {}
+    for previous in previous_manifest.get("segments", []):
+        if previous.get("image_sha256"):
+            previous_by_hash.setdefault(previous["image_sha256"], []).append(previous)
+
+    matches: Dict[int, Dict[str, Any]] = {}
+    for segment in segments:
+        candidates = previous_by_hash.get(segment.get("image_sha256") or "")
+        if candidates:
+            matches[segment["index"]] = min(
+                candidates, key=lambda previous: abs((previous.get("top") or 0) - segment["top"])
+            )
+    return matches
+
+
+def run_incremental_ocr(
+    segments_meta: List[Dict[str, Any]],
+    previous_manifest: Dict[str, Any],
+    **ocr_kwargs,
+) -> tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """前回から変化したセグメントだけOCRし、残りは保存済みテキストを再利用する"""
+    for segment in segments_meta:
+        segment["image_sha256"] = file_sha256(segment["path"])
+
+    matches = match_previous_segments(segments_meta, previous_manifest)
+    changed = [segment for segment in segments_meta if segment["index"] not in matches]
+    print(f"♻️ 前回の実行から {len(matches)} セグメントを再利用し、{len(changed)} セグメントをOCRします")
+
+    ocr_by_index = {
+        segment["index"]: segment
+        for segment in (run_ocr_on_segments(changed, **ocr_kwargs) if changed else [])
+    }
+
+    results: List[Dict[str, Any]] = []
+    moved: List[Dict[str, int]] = []
+    for segment in segments_meta:
+        previous = matches.get(segment["index"])
+        if previous is None:
+            results.append(ocr_by_index[segment["index"]])
+            continue
+        results.append(
+            {
+                "index": segment["index"],
+                "path": Path(segment["path"]),
+                "top": segment["top"],
+                "bottom": segment["bottom"],
+                "raw_text": previous.get("raw_text", ""),
+                "clean_text": previous.get("clean_text", ""),
+                "usage": None,
+                "reused_from": previous.get("index"),
+            }
+        )
+        if previous.get("top") != segment["top"]:
+            moved.append(
+                {
+                    "index": segment["index"],
+                    "previous_index": previous.get("index"),
+                    "top": segment["top"],
+                    "previous_top": previous.get("top"),
+                }
+            )
+
+    matched_previous = {previous.get("index") for previous in matches.values()}
+    changes = {
+        "previous_run_dir": previous_manifest.get("run_dir"),
+        "previous_timestamp": previous_manifest.get("timestamp"),
+        "reused": sorted(matches),
+        "ocr": [segment["index"] for segment in changed],
+        "moved": moved,
+        "removed": [
+            previous.get("index")
+            for previous in previous_manifest.get("segments", [])
+            if previous.get("index") not in matched_previous
+        ],
+        "text_changed": text_sha256(previous_manifest.get("combined_text", ""))
+        != text_sha256(combine_clean_segments(results)),
+    }
+    return results, changes
+
+
+def render_markdown(manifest: Dict[str, Any]) -> str:
+    lines: List[str] = []
+    write = lines.append
+
+    write("# WebサイトOCR文字起こし結果\n\n")
+    write(f"**URL:** {manifest['url']}\n\n")
+    write(f"**抽出日時:** {manifest['timestamp']}\n\n")
+    screenshot_path = manifest.get("screenshot", {}).get("path")
+    write(f"**スクリーンショット:** {Path(screenshot_path).name if screenshot_path else ''}\n\n")
+
+    if manifest.get("source_type") == "local_html" and manifest.get("source_path"):
+        write(f"**ローカルHTML:** {manifest['source_path']}\n\n")
+    write(f"**分割数:** {len(manifest['segments'])} 枚\n\n")
+
+    meta = manifest.get("meta")
+    if meta:
+        write("## メタ情報\n\n")
+        write(f"- タイトル: {meta.get('title', '')}\n")
+        if meta.get('description'):
+            write(f"- 説明: {meta.get('description', '').strip()}\n")
+        if meta.get('keywords'):
+            write(f"- キーワード: {meta.get('keywords', '').strip()}\n")
+        write("\n")
+
+    if manifest.get("combined_text"):
+        write("## 整理済みテキスト\n\n")
+        write(manifest["combined_text"] + "\n\n")
+
+    # Playwright抽出テキストセクションを削除（OCRのみ使用）
+
+    write("## OCRセグメント詳細\n\n")
+    for segment in manifest["segments"]:
+        write(f"### セグメント {segment['index']:02d}\n\n")
+        write(f"- ファイル: {Path(segment['path']).name}\n")
+        write(f"- 位置: {segment['top']}px 〜 {segment['bottom']}px\n\n")
+
+        if segment.get("clean_text"):
+            write("**整形テキスト**\n\n")
+            write("```\n")
+            write(segment["clean_text"])
+            write("\n```\n\n")
+
+        if segment.get("raw_text") and segment.get("raw_text") != segment.get("clean_text"):
+            write("**OCR生テキスト**\n\n")
+            write("```\n")
+            write(segment["raw_text"])
+            write("\n```\n\n")
+
+    return "".join(lines)
+
+
+def render_plain_text(manifest: Dict[str, Any]) -> str:
+    # visible_textのフォールバックを削除（OCRのみ使用）
+    return manifest.get("combined_text") or ""
+
+
+def save_markdown(result: Dict) -> Path:
+    manifest = result.get("manifest") or build_run_manifest(result)
+    md_path = result["run_dir"] / "website_transcription.md"
+
+    with open(md_path, "w", encoding="utf-8") as f:
+        f.write(render_markdown(manifest))
+
+    register_output(result, "markdown", md_path)
     return md_path
 
 
 def save_plain_text(result: Dict) -> Path:
+    manifest = result.get("manifest") or build_run_manifest(result)
     txt_path = result["run_dir"] / "website_transcription.txt"
 
     with open(txt_path, "w", encoding="utf-8") as f:
-        if result.get("combined_text"):
-            f.write(result["combined_text"])
-        # visible_textのフォールバックを削除（OCRのみ使用）
+        f.write(render_plain_text(manifest))
 
+    register_output(result, "text", txt_path)
     return txt_path
 
 
+def build_transcription_metrics(result: Dict) -> Dict[str, Any]:
+    """セグメント単位・ジョブ単位のGemini利用量を集計する"""
+    segment_metrics = []
+    calls: List[Dict[str, Any]] = []
+    for segment in result.get("segments", []):
+        usage = segment.get("usage")
+        if usage:
+            calls.append(usage)
+        segment_metrics.append(
+            {
+                "index": segment.get("index"),
+                "top": segment.get("top"),
+                "bottom": segment.get("bottom"),
+                "usage": usage,
+            }
+        )
+
+    return {
+        "url": result.get("url"),
+        "timestamp": result.get("timestamp"),
+        "slice_height": result.get("slice_height"),
+        "overlap": result.get("overlap"),
+        "segments_count": len(segment_metrics),
+        "segments": segment_metrics,
+        "seams": [
+            {key: seam[key] for key in ("previous_index", "index", "removed_lines")}
+            for seam in result.get("seams", [])
+        ],
+        "capture": result.get("capture"),
+        "totals": summarize_gemini_calls(calls),
+    }
+
+
+def save_metrics(result: Dict) -> Path:
+    metrics = build_transcription_metrics(result)
+    result["metrics"] = metrics
+
+    metrics_path = result["run_dir"] / METRICS_FILENAME
+    with open(metrics_path, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+
+    register_output(result, "metrics", metrics_path)
+    return metrics_path
+
+
 def cleanup_segment_images(result: Dict) -> None:
     segments_dir = result["run_dir"] / "segments"
     if segments_dir.exists():
@@ -885,6 +1610,21 @@ def update_latest_symlink(run_dir: Path, output_root: Optional[Path] = None) ->
         print(f"⚠️ 最新出力リンクの更新に失敗しました: {link_error}")
 
 
+def create_run_dir(output_root: Path) -> Path:
+    """run_<日時> フォルダを作成する。並列実行で同じ秒に重なった場合は連番を付ける"""
+    output_root.mkdir(parents=True, exist_ok=True)
+    base_name = f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    run_dir = output_root / base_name
+    suffix = 1
+    while True:
+        try:
+            run_dir.mkdir()
+            return run_dir
+        except FileExistsError:
+            suffix += 1
+            run_dir = output_root / f"{base_name}_{suffix}"
+
+
 def transcribe_website(
     url: str,
     slice_height: int,
@@ -893,13 +1633,16 @@ def transcribe_website(
     *,
     source_type: str = "url",
     source_path: Optional[Path] = None,
+    stream: bool = False,
+    on_ocr_chunk: Optional[Callable[[Dict[str, Any], str], None]] = None,
+    incremental: bool = False,
 ) -> Dict:
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     output_root = get_output_root(keyword_slug)
-    run_dir = output_root / f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    run_dir.mkdir(parents=True, exist_ok=True)
+    run_dir = create_run_dir(output_root)
 
     screenshot_path: Optional[Path] = None
+    capture_started_at = time.perf_counter()
 
     with sync_playwright() as playwright:
         clear_playwright_quarantine()
@@ -923,77 +1666,23 @@ def transcribe_website(
         segments_meta: List[Dict[str, int]] = []
         screenshot_path: Optional[Path] = None
 
-        capture_success = False
-        capture_error: Optional[Exception] = None
+        # 過去にこのドメインで成功した方式から試す（記録が無ければ browser → no_js → static）
+        planned_order = capture_planner.plan(url, CAPTURE_STRATEGY_PATH)
+        if planned_order != list(capture_planner.STRATEGIES):
+            print(
+                f"🧭 {capture_planner.domain_for(url)} の過去の結果から "
+                f"{' → '.join(planned_order)} の順で取得します。"
+            )
 
-        for attempt in range(2):
-            local_context_options = dict(context_options)
-            if attempt == 1:
-                print("⚠️ JavaScriptを無効化して再試行します。")
-                local_context_options["java_script_enabled"] = False
-            browser = launch_browser(playwright)
-            context = browser.new_context(**local_context_options)
-            try:
-                context.add_init_script("""
-                    (function() {
-                        const noop = function noop() {};
-                        try {
-                            Object.defineProperty(window, 'close', { value: noop, configurable: true });
-                        } catch (_) {
-                            window.close = noop;
-                        }
-                        try {
-                            window.open = function() { return window; };
-                        } catch (_) {}
-                        try {
-                            Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
-                        } catch (_) {}
-                        try {
-                            delete window.__nightmare;
-                            delete window.__selenium_unwrapped;
-                            delete window._Selenium_IDE_Recorder;
-                        } catch (_) {}
-                    })();
-                """)
-            except PlaywrightError:
-                pass
-            page = None
+        attempts: List[Dict[str, Any]] = []
+        for strategy in planned_order:
+            label = capture_planner.STRATEGY_LABELS[strategy]
+            if attempts:
+                print(f"🔁 {label}でキャプチャを再試行します。")
+            attempt_started_at = time.perf_counter()
             try:
-                if attempt > 0:
-                    print("🔁 ページを再読み込みしてキャプチャを再試行します。")
-                page, meta, visible_text, screenshot_path, segments_meta = load_and_capture(
-                    context=context,
-                    url=url,
-                    run_dir=run_dir,
-                    slice_height=slice_height,
-                    overlap=overlap,
-                )
-            except Exception as error:
-                capture_error = error
-                attempt_no = attempt + 1
-                print(f"⚠️ ページキャプチャに失敗しました (試行{attempt_no}): {error}")
-            else:
-                capture_success = True
-                break
-            finally:
-                if page and not page.is_closed():
-                    try:
-                        page.close()
-                    except PlaywrightError:
-                        pass
-                try:
-                    context.close()
-                except PlaywrightError:
-                    pass
-                try:
-                    browser.close()
-                except PlaywrightError:
-                    pass
-
-        if not capture_success or not screenshot_path:
-            print("⚠️ 通常のブラウザ操作でページを保持できなかったため、HTMLダウンロード方式で再試行します。")
-            try:
-                meta, visible_text, screenshot_path, segments_meta = capture_static_render(
+                meta, visible_text, screenshot_path, segments_meta = run_capture_strategy(
+                    strategy,
                     playwright=playwright,
                     url=url,
                     run_dir=run_dir,
@@ -1001,13 +1690,35 @@ def transcribe_website(
                     slice_height=slice_height,
                     overlap=overlap,
                 )
-                capture_success = True
-            except Exception as fallback_error:
-                raise RuntimeError(
-                    "スクリーンショットの取得に失敗しました。"
-                    + (f" 原因: {capture_error}" if capture_error else "")
-                    + f" / HTMLダウンロード方式も失敗しました: {fallback_error}"
-                ) from fallback_error
+            except Exception as error:
+                attempts.append(
+                    {
+                        "strategy": strategy,
+                        "success": False,
+                        "seconds": round(time.perf_counter() - attempt_started_at, 3),
+                        "error": str(error),
+                    }
+                )
+                print(f"⚠️ ページキャプチャに失敗しました ({label}): {error}")
+                continue
+            attempts.append(
+                {
+                    "strategy": strategy,
+                    "success": True,
+                    "seconds": round(time.perf_counter() - attempt_started_at, 3),
+                }
+            )
+            break
+
+        capture_planner.record(url, attempts, CAPTURE_STRATEGY_PATH)
+        if not attempts[-1]["success"]:
+            raise RuntimeError(
+                "スクリーンショットの取得に失敗しました。 "
+                + " / ".join(
+                    f"{capture_planner.STRATEGY_LABELS[attempt['strategy']]}: {attempt['error']}"
+                    for attempt in attempts
+                )
+            )
 
     if not segments_meta:
         segments_meta = [
@@ -1022,8 +1733,35 @@ def transcribe_website(
     if not screenshot_path:
         raise RuntimeError("スクリーンショットの取得に失敗しました。")
 
-    ocr_segments = run_ocr_on_segments(segments_meta)
-    combined_text = combine_clean_segments(ocr_segments)
+    capture_seconds = time.perf_counter() - capture_started_at
+    pyramid_future = image_pyramid.submit_pyramid(screenshot_path)
+
+    previous_manifest = find_previous_run_manifest(output_root, url) if incremental else None
+    if incremental and previous_manifest is None:
+        print("ℹ️ 同じURLの前回実行が見つからないため、全セグメントをOCRします")
+
+    changes: Optional[Dict[str, Any]] = None
+    ocr_started_at = time.perf_counter()
+    if previous_manifest is not None:
+        ocr_segments, changes = run_incremental_ocr(
+            segments_meta, previous_manifest, stream=stream, on_chunk=on_ocr_chunk
+        )
+    else:
+        ocr_segments = run_ocr_on_segments(segments_meta, stream=stream, on_chunk=on_ocr_chunk)
+    ocr_seconds = time.perf_counter() - ocr_started_at
+    store_capture_artifacts(screenshot_path, ocr_segments)
+    outputs: Dict[str, str] = {}
+    pyramid_info: Optional[Dict[str, Any]] = None
+    try:
+        pyramid_info = pyramid_future.result()
+        outputs["pyramid"] = pyramid_info["dzi"]
+        outputs["thumbnail"] = pyramid_info["thumbnail"]
+    except Exception as pyramid_error:
+        print(f"⚠️ プレビュー用タイルの生成に失敗しました: {pyramid_error}")
+    combined_text, seams = merge_segments_at_seams(ocr_segments)
+    removed_lines = sum(seam["removed_lines"] for seam in seams)
+    if removed_lines:
+        print(f"🧩 セグメントの重なり部分から重複行を {removed_lines} 行除去しました")
 
     if not combined_text:
         combined_text = visible_text
@@ -1039,14 +1777,30 @@ def transcribe_website(
         "meta": meta,
         "slice_height": slice_height,
         "overlap": overlap,
+        "seams": seams,
+        "timings": {
+            "capture_seconds": round(capture_seconds, 3),
+            "ocr_seconds": round(ocr_seconds, 3),
+        },
+        "changes": changes,
+        "pyramid": pyramid_info,
+        "outputs": outputs,
         "keyword_slug": keyword_slug,
         "output_root": output_root,
         "source_type": source_type,
+        "capture": {
+            "strategy": attempts[-1]["strategy"],
+            "planned_order": planned_order,
+            "attempts": attempts,
+            "fallbacks": len(attempts) - 1,
+        },
     }
 
     if source_path is not None:
         result["source_path"] = str(source_path)
 
+    result["manifest_path"] = save_run_manifest(result)
+
     return result
 
 
@@ -1055,6 +1809,10 @@ def transcribe_local_html(
     slice_height: int,
     overlap: int,
     keyword_slug: Optional[str] = None,
+    *,
+    stream: bool = False,
+    on_ocr_chunk: Optional[Callable[[Dict[str, Any], str], None]] = None,
+    incremental: bool = False,
 ) -> Dict:
     """ローカルに保存されたLPをスクリーンショット＆文字起こしする。"""
 
@@ -1068,6 +1826,9 @@ def transcribe_local_html(
         keyword_slug=keyword_slug,
         source_type="local_html",
         source_path=resolved_html,
+        stream=stream,
+        on_ocr_chunk=on_ocr_chunk,
+        incremental=incremental,
     )
 
 
@@ -1099,12 +1860,20 @@ def main() -> None:
     print("🌐 WebサイトOCR文字起こしツール (Gemini版)")
     print("=" * 70)
 
+    on_ocr_chunk = None
+    if args.stream:
+        def on_ocr_chunk(segment: Dict[str, Any], chunk_text: str) -> None:
+            print(f"  ✏️ [セグメント {segment['index']}] {chunk_text}", flush=True)
+
     if target_mode == "local_html":
         assert target_html is not None
         result = transcribe_local_html(
             html_path=target_html,
             slice_height=args.slice_height,
             overlap=args.overlap,
+            stream=args.stream,
+            on_ocr_chunk=on_ocr_chunk,
+            incremental=args.incremental,
         )
     else:
         assert target_url is not None
@@ -1112,10 +1881,14 @@ def main() -> None:
             url=target_url,
             slice_height=args.slice_height,
             overlap=args.overlap,
+            stream=args.stream,
+            on_ocr_chunk=on_ocr_chunk,
+            incremental=args.incremental,
         )
 
     md_path = save_markdown(result)
     txt_path = save_plain_text(result)
+    metrics_path = save_metrics(result)
     cleanup_segment_images(result)
     update_latest_symlink(result["run_dir"], output_root=result.get("output_root"))
 
@@ -1125,8 +1898,23 @@ def main() -> None:
     print(f"📁 出力フォルダ: {result['run_dir']}")
     print(f"- Markdown: {md_path.name}")
     print(f"- テキスト : {txt_path.name}")
+    print(f"- マニフェスト: {result['manifest_path'].name}")
     print(f"- スクリーンショット: {result['screenshot'].name}")
     print(f"- セグメント数: {len(result['segments'])}")
+    capture = result["capture"]
+    print(f"- 取得方式: {capture['strategy']} (フォールバック {capture['fallbacks']} 回)")
+    changes = result.get("changes")
+    if changes:
+        print(
+            f"- 差分: 再利用 {len(changes['reused'])} / 再OCR {len(changes['ocr'])}"
+            f" / 位置移動 {len(changes['moved'])} / 削除 {len(changes['removed'])}"
+            f" (本文{'変更あり' if changes['text_changed'] else '変更なし'})"
+        )
+    totals = result["metrics"]["totals"]
+    print(
+        f"- Gemini利用量: {totals['calls']} 回 / 入力 {totals['prompt_tokens']} tokens"
+        f" / 出力 {totals['output_tokens']} tokens ({metrics_path.name})"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,224 @@
+"""
+CLI・GUI の起動（モジュール読み込み）時間のベンチマーク
+
+各モジュールを `python -X importtime -c "import <module>"` で別プロセスとして読み込み、
+累積の読み込み時間（中央値）と、読み込み時点で重いライブラリ（Playwright / Pillow /
+google-generativeai）が読み込まれていないかを確認する。
+しきい値（絶対値・基準結果からの増加率）を超えた場合や重いライブラリが読み込まれた場合は終了コード1を返す。
+
+使い方:
+    python benchmark_import_time.py --output bench_results/import_base.json
+    python benchmark_import_time.py --baseline bench_results/import_base.json --max-regression 0.2
+    python benchmark_import_time.py --target run_full_pipeline --repeat 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmark_transcribe import DEFAULT_OUTPUT_DIR, REPO_ROOT, git_revision
+
+# 起動時間を計測するモジュールと、読み込むときのカレントディレクトリ
+IMPORT_TARGETS = {
+    "transcribe_website": REPO_ROOT / "search_man",
+    "run_full_pipeline": REPO_ROOT / "search_man",
+    "summarize_analyses": REPO_ROOT / "search_man",
+    "extract_seo": REPO_ROOT / "search_man",
+    "extract_ads": REPO_ROOT / "search_man",
+    "collect_serps": REPO_ROOT / "search_man",
+    "gui_app": REPO_ROOT,
+    "lp_transcriber": REPO_ROOT,
+}
+# 最初に使うときまで読み込まないはずのライブラリ
+HEAVY_MODULES = ("playwright", "PIL", "google.generativeai")
+# 1モジュールあたりの読み込み時間の上限(ms)
+MAX_IMPORT_MS_DEFAULT = float(os.getenv("IMPORT_TIME_MAX_MS", "300"))
+# 基準結果からの増加率の上限と、計測の揺らぎとして無視する増加量(ms)
+MAX_REGRESSION_DEFAULT = 0.2
+MIN_REGRESSION_MS = 5.0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="CLI・GUI のモジュール読み込み時間のベンチマーク")
+    parser.add_argument(
+        "--target",
+        action="append",
+        choices=sorted(IMPORT_TARGETS),
+        help="計測するモジュール（複数指定可。未指定ならすべて）",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="各モジュールの計測回数（中央値を使用）")
+    parser.add_argument("--label", default="", help="結果に付けるラベル")
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=MAX_IMPORT_MS_DEFAULT,
+        help=f"1モジュールあたりの読み込み時間の上限(ms) (既定: {MAX_IMPORT_MS_DEFAULT:g})",
+    )
+    parser.add_argument("--baseline", type=Path, help="比較する基準の結果JSON")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=MAX_REGRESSION_DEFAULT,
+        help=f"基準結果からの増加率の上限 (既定: {MAX_REGRESSION_DEFAULT:g} = +{MAX_REGRESSION_DEFAULT * 100:.0f}%%)",
+    )
+    parser.add_argument("--output", type=Path, help="結果JSONの保存先")
+    return parser.parse_args()
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """-X importtime の出力（self [us] | cumulative | imported package）を読み取る"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        rows.append(
+            {
+                "module": name.strip(),
+                # 依存の深さ（出力では1段ごとに2文字字下げされる）
+                "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                "self_us": int(fields[0]),
+                "cumulative_us": int(fields[1]),
+            }
+        )
+    return rows
+
+
+def measure_once(module: str, cwd: Path) -> Dict[str, Any]:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    rows = parse_importtime(completed.stderr)
+    if completed.returncode != 0:
+        errors = [line for line in completed.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(errors[-1] if errors else f"exit code {completed.returncode}")
+    target_index = next((i for i in range(len(rows) - 1, -1, -1) if rows[i]["module"] == module), None)
+    if target_index is None:
+        raise RuntimeError(f"{module} の読み込み時間を取得できませんでした")
+    target = rows[target_index]
+    # 対象モジュールが直接読み込んだもの（対象の行の直前に1段深く並ぶ）
+    children = []
+    for row in reversed(rows[:target_index]):
+        if row["depth"] <= target["depth"]:
+            break
+        if row["depth"] == target["depth"] + 1:
+            children.append(row)
+    heavy = sorted(
+        {
+            row["module"]
+            for row in rows
+            if any(row["module"] == name or row["module"].startswith(name + ".") for name in HEAVY_MODULES)
+        }
+    )
+    return {"cumulative_us": target["cumulative_us"], "heavy_modules": heavy, "children": children}
+
+
+def measure_target(module: str, cwd: Path, repeat: int) -> Dict[str, Any]:
+    try:
+        runs = [measure_once(module, cwd) for _ in range(max(1, repeat))]
+    except Exception as error:
+        return {"module": module, "error": str(error)}
+    # 最後の計測で時間のかかった直接の依存モジュール
+    slowest = sorted(runs[-1]["children"], key=lambda row: row["cumulative_us"], reverse=True)[:5]
+    return {
+        "module": module,
+        "import_ms": round(statistics.median(run["cumulative_us"] for run in runs) / 1000, 2),
+        "min_ms": round(min(run["cumulative_us"] for run in runs) / 1000, 2),
+        "heavy_modules": runs[-1]["heavy_modules"],
+        "slowest": [{"module": row["module"], "ms": round(row["cumulative_us"] / 1000, 2)} for row in slowest],
+    }
+
+
+def check_thresholds(
+    results: List[Dict[str, Any]],
+    max_ms: float,
+    baseline: Optional[Dict[str, Any]],
+    max_regression: float,
+) -> List[str]:
+    baseline_ms = {
+        entry["module"]: entry["import_ms"]
+        for entry in (baseline or {}).get("targets", [])
+        if "import_ms" in entry
+    }
+    failures = []
+    for result in results:
+        module = result["module"]
+        if "error" in result:
+            failures.append(f"{module}: 読み込みに失敗しました ({result['error']})")
+            continue
+        if result["heavy_modules"]:
+            failures.append(f"{module}: 読み込み時に {', '.join(result['heavy_modules'])} を読み込んでいます")
+        if result["import_ms"] > max_ms:
+            failures.append(f"{module}: {result['import_ms']:.1f}ms が上限 {max_ms:g}ms を超えています")
+        before = baseline_ms.get(module)
+        if before and result["import_ms"] - before > MIN_REGRESSION_MS and result["import_ms"] > before * (1 + max_regression):
+            failures.append(
+                f"{module}: {before:.1f}ms → {result['import_ms']:.1f}ms"
+                f" (+{(result['import_ms'] - before) / before:.0%}) 基準から悪化しています"
+            )
+    return failures
+
+
+def print_table(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]]) -> None:
+    baseline_ms = {entry["module"]: entry.get("import_ms") for entry in (baseline or {}).get("targets", [])}
+    print(f"\n{'module':<22} {'import ms':>10} {'baseline':>10}  heavy / slowest")
+    for result in results:
+        if "error" in result:
+            print(f"{result['module']:<22} ❌ {result['error']}")
+            continue
+        before = baseline_ms.get(result["module"])
+        before_label = f"{before:.1f}" if before else "-"
+        detail = ", ".join(result["heavy_modules"]) or ", ".join(
+            f"{row['module']} {row['ms']:.0f}ms" for row in result["slowest"][:3]
+        )
+        print(f"{result['module']:<22} {result['import_ms']:>10.1f} {before_label:>10}  {detail}")
+
+
+def main() -> None:
+    args = parse_args()
+    targets = args.target or list(IMPORT_TARGETS)
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline else None
+
+    results = []
+    for module in targets:
+        print(f"⏱️ {module} ({args.repeat} 回)", flush=True)
+        results.append(measure_target(module, IMPORT_TARGETS[module], args.repeat))
+
+    report = {
+        "label": args.label,
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "params": {"repeat": args.repeat, "max_ms": args.max_ms, "max_regression": args.max_regression},
+        "targets": results,
+    }
+    output_path = args.output or DEFAULT_OUTPUT_DIR / f"import_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print_table(results, baseline)
+    print(f"\n💾 結果を保存しました: {output_path}")
+
+    failures = check_thresholds(results, args.max_ms, baseline, args.max_regression)
+    if failures:
+        print("\n❌ 起動時間のしきい値を満たしていません:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✅ すべてのモジュールがしきい値内です")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+文字起こしパイプラインのオフラインベンチマーク
+
+リポジトリ内のHTMLフィクスチャ（SearchSEO / SearchAds の page_source）と合成した縦長LPを
+ローカルHTTPサーバーから配信し、遅延を指定できる疑似OCRで transcribe_website を最後まで実行する。
+ケースごとに別プロセスで計測し、工程別の所要時間・スライス数・ピークRSS・書き込みバイト数をJSONで出力する。
+
+使い方:
+    python benchmark_transcribe.py --ocr-latency 0.8 --output bench_results/base.json
+    python benchmark_transcribe.py --slice-height 2000 --ocr-workers 6 --label tuned
+    python benchmark_transcribe.py --compare bench_results/base.json bench_results/tuned.json
+"""
+
+import argparse
+import functools
+import hashlib
+import http.server
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent
+TARGET_DIRS = {
+    "api": REPO_ROOT / "api",
+    "search_man": REPO_ROOT / "search_man",
+}
+FIXTURE_GLOBS = [
+    "search_man/SearchSEO/**/page_source_seo.html",
+    "search_man/SearchAds/page_source.html",
+]
+DEFAULT_SYNTHETIC_HEIGHTS = "6000,20000"
+DEFAULT_OUTPUT_DIR = REPO_ROOT / "bench_results"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="transcribe_website のオフラインベンチマーク")
+    parser.add_argument("--target", choices=sorted(TARGET_DIRS), default="api", help="計測する transcribe_website")
+    parser.add_argument("--label", default="", help="結果に付けるラベル（比較時の表示名）")
+    parser.add_argument("--fixtures", nargs="*", help="計測するHTMLファイル（未指定ならリポジトリ内の既定フィクスチャ）")
+    parser.add_argument(
+        "--synthetic-heights",
+        default=DEFAULT_SYNTHETIC_HEIGHTS,
+        help="合成LPの高さ(px)をカンマ区切りで指定（空文字で無効）",
+    )
+    parser.add_argument("--ocr-latency", type=float, default=0.8, help="疑似OCR 1回あたりの待ち時間（秒）")
+    parser.add_argument("--ocr-jitter", type=float, default=0.2, help="疑似OCRの待ち時間に加える揺らぎ（秒）")
+    parser.add_argument("--slice-height", type=int, help="スライスの高さ（未指定なら対象モジュールの既定値）")
+    parser.add_argument("--overlap", type=int, help="スライスの重なり（未指定なら既定値）")
+    parser.add_argument("--ocr-workers", type=int, help="OCR並列数（api のみ）")
+    parser.add_argument("--scroll-wait", type=float, help="スクロール後の待ち時間（秒, api のみ）")
+    parser.add_argument("--segment-wait", type=float, help="スライス撮影前の待ち時間（秒, api のみ）")
+    parser.add_argument("--repeat", type=int, default=1, help="各ケースの繰り返し回数")
+    parser.add_argument("--output", type=Path, help="結果JSONの保存先")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("BASE", "NEW"), help="2つの結果JSONを比較して終了")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+# --- フィクスチャとローカルサーバー --------------------------------------------
+
+
+def collect_fixtures(explicit: Optional[List[str]]) -> List[Path]:
+    if explicit:
+        return [Path(path).resolve() for path in explicit]
+    fixtures: List[Path] = []
+    for pattern in FIXTURE_GLOBS:
+        fixtures.extend(sorted(REPO_ROOT.glob(pattern)))
+    return fixtures
+
+
+def write_synthetic_lp(site_dir: Path, height: int) -> Path:
+    """外部リソースを使わない縦長LP（見出し・本文・色ブロックの繰り返し）を生成する"""
+    rng = random.Random(height)
+    sections = []
+    section_height = 800
+    for index in range(max(1, height // section_height)):
+        color = f"#{rng.randrange(0x404040, 0xFFFFFF):06x}"
+        paragraphs = "".join(
+            f"<p>セクション{index + 1}の説明文 {line + 1}: 料金・実績・よくある質問などの本文テキストです。</p>"
+            for line in range(6)
+        )
+        sections.append(
+            f'<section style="min-height:{section_height}px;padding:40px;background:{color}">'
+            f"<h2>見出し {index + 1}</h2>{paragraphs}</section>"
+        )
+    html = (
+        "<!DOCTYPE html><html lang=\"ja\"><head><meta charset=\"utf-8\">"
+        f"<title>合成LP {height}px</title>"
+        "<meta name=\"description\" content=\"ベンチマーク用の合成ランディングページ\"></head>"
+        f"<body style=\"margin:0;font-family:sans-serif\">{''.join(sections)}</body></html>"
+    )
+    path = site_dir / "synthetic" / f"lp_{height}.html"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(html, encoding="utf-8")
+    return path
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args) -> None:  # noqa: A002
+        pass
+
+
+def start_server(site_dir: Path) -> http.server.ThreadingHTTPServer:
+    handler = functools.partial(_QuietHandler, directory=str(site_dir))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def build_cases(args: argparse.Namespace, site_dir: Path, port: int) -> List[Dict[str, Any]]:
+    cases = []
+    for index, fixture in enumerate(collect_fixtures(args.fixtures), start=1):
+        link = site_dir / "fixtures" / f"{index:02d}_{fixture.name}"
+        link.parent.mkdir(parents=True, exist_ok=True)
+        link.symlink_to(fixture)
+        name = str(fixture.relative_to(REPO_ROOT)) if fixture.is_relative_to(REPO_ROOT) else str(fixture)
+        cases.append({"name": name, "url": f"http://127.0.0.1:{port}/fixtures/{link.name}"})
+
+    for height_text in filter(None, (part.strip() for part in args.synthetic_heights.split(","))):
+        path = write_synthetic_lp(site_dir, int(height_text))
+        cases.append(
+            {"name": f"synthetic/{path.name}", "url": f"http://127.0.0.1:{port}/synthetic/{path.name}"}
+        )
+    return cases
+
+
+# --- 1ケースの計測（子プロセス側） ---------------------------------------------
+
+
+def make_fake_ocr(module, latency: float, jitter: float):
+    """run_gemini_ocr の代わりに、待ち時間の後で画像ハッシュ由来のテキストを返す"""
+
+    def fake_run_gemini_ocr(image_path, stream=False, on_chunk=None, call_log=None, **_kwargs) -> str:
+        started_at = time.perf_counter()
+        time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+        digest = hashlib.sha256(Path(image_path).read_bytes()).hexdigest()
+        text = "\n".join(f"ベンチマーク行 {digest[i:i + 8]}" for i in range(0, 64, 8))
+        if stream and on_chunk is not None:
+            on_chunk(text)
+        if call_log is not None:
+            response = SimpleNamespace(
+                usage_metadata=SimpleNamespace(
+                    prompt_token_count=258,
+                    candidates_token_count=len(text) // 2,
+                    total_token_count=258 + len(text) // 2,
+                )
+            )
+            call_log.append(module.build_gemini_call_record("ocr", "fake-ocr", response, started_at))
+        return text
+
+    return fake_run_gemini_ocr
+
+
+def dir_bytes(path: Path) -> int:
+    total = 0
+    seen = set()
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            stat = os.lstat(os.path.join(root, name))
+            # ハードリンクされたブロブは1回だけ数える
+            if (stat.st_dev, stat.st_ino) in seen:
+                continue
+            seen.add((stat.st_dev, stat.st_ino))
+            total += stat.st_size
+    return total
+
+
+def io_write_bytes() -> Optional[int]:
+    try:
+        for line in Path("/proc/self/io").read_text().splitlines():
+            if line.startswith("write_bytes:"):
+                return int(line.split(":", 1)[1])
+    except OSError:
+        return None
+    return None
+
+
+def maxrss_bytes(who: int) -> int:
+    value = resource.getrusage(who).ru_maxrss
+    # Linux は KB、macOS は bytes
+    return value if sys.platform == "darwin" else value * 1024
+
+
+def run_one(spec: Dict[str, Any]) -> Dict[str, Any]:
+    work_dir = Path(spec["work_dir"])
+    os.environ["OCR_CACHE"] = "0"
+    os.environ["ARTIFACT_STORE_DIR"] = str(work_dir / "blobs")
+    sys.path.insert(0, str(TARGET_DIRS[spec["target"]]))
+
+    import transcribe_website as module  # noqa: E402
+
+    output_dir = work_dir / "output"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    module.BASE_OUTPUT_DIR = output_dir
+    module.RUN_INDEX_PATH = output_dir / "run_index.sqlite3"
+    module.ARTIFACT_STORE_DIR = work_dir / "blobs"
+    if hasattr(module, "CAPTURE_STRATEGY_PATH"):
+        module.CAPTURE_STRATEGY_PATH = output_dir / "capture_strategies.json"
+    module.GEMINI_AVAILABLE = True
+    module.run_gemini_ocr = make_fake_ocr(module, spec["ocr_latency"], spec["ocr_jitter"])
+    for attr, key in (
+        ("OCR_MAX_WORKERS", "ocr_workers"),
+        ("SCROLL_SETTLE_SECONDS", "scroll_wait"),
+        ("SEGMENT_SETTLE_SECONDS", "segment_wait"),
+    ):
+        if spec.get(key) is not None and hasattr(module, attr):
+            setattr(module, attr, spec[key])
+
+    slice_height = spec.get("slice_height") or module.SLICE_HEIGHT_DEFAULT
+    overlap = spec.get("overlap") if spec.get("overlap") is not None else module.SLICE_OVERLAP_DEFAULT
+    io_before = io_write_bytes()
+
+    stages: Dict[str, float] = {}
+    started_at = time.perf_counter()
+    result = module.transcribe_website(url=spec["url"], slice_height=slice_height, overlap=overlap)
+    stages["transcribe_total"] = time.perf_counter() - started_at
+
+    render_started_at = time.perf_counter()
+    module.save_markdown(result)
+    module.save_plain_text(result)
+    module.save_metrics(result)
+    stages["render"] = time.perf_counter() - render_started_at
+
+    cleanup_started_at = time.perf_counter()
+    module.cleanup_segment_images(result)
+    stages["cleanup"] = time.perf_counter() - cleanup_started_at
+
+    timings = result.get("timings", {})
+    stages["capture"] = timings.get("capture_seconds", 0.0)
+    stages["ocr"] = timings.get("ocr_seconds", 0.0)
+    stages["total"] = time.perf_counter() - started_at
+
+    io_after = io_write_bytes()
+    return {
+        "name": spec["name"],
+        "url": spec["url"],
+        "stages": {key: round(value, 3) for key, value in stages.items()},
+        "slices": len(result.get("segments", [])),
+        "page_height": max((segment.get("bottom") or 0 for segment in result.get("segments", [])), default=0),
+        "ocr_calls": result["metrics"]["totals"]["calls"],
+        "capture_fallbacks": (result.get("capture") or {}).get("fallbacks"),
+        "peak_rss_bytes": maxrss_bytes(resource.RUSAGE_SELF),
+        "peak_child_rss_bytes": maxrss_bytes(resource.RUSAGE_CHILDREN),
+        "output_bytes": dir_bytes(work_dir),
+        "io_write_bytes": (io_after - io_before) if io_before is not None and io_after is not None else None,
+    }
+
+
+# --- 親プロセス側 ---------------------------------------------------------------
+
+
+def run_case_subprocess(spec: Dict[str, Any]) -> Dict[str, Any]:
+    completed = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--run-one", json.dumps(spec, ensure_ascii=False)],
+        capture_output=True,
+        text=True,
+    )
+    lines = [line for line in completed.stdout.splitlines() if line.strip()]
+    if completed.returncode != 0 or not lines:
+        return {
+            "name": spec["name"],
+            "url": spec["url"],
+            "error": (completed.stderr or completed.stdout).strip().splitlines()[-1:] or ["unknown error"],
+        }
+    return json.loads(lines[-1])
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(cases: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [case for case in cases if "error" not in case]
+    stage_totals: Dict[str, float] = {}
+    for case in ok:
+        for key, value in case["stages"].items():
+            stage_totals[key] = round(stage_totals.get(key, 0.0) + value, 3)
+    return {
+        "cases": len(cases),
+        "errors": len(cases) - len(ok),
+        "stages": stage_totals,
+        "slices": sum(case["slices"] for case in ok),
+        "max_peak_rss_bytes": max((case["peak_rss_bytes"] for case in ok), default=0),
+        "output_bytes": sum(case["output_bytes"] for case in ok),
+    }
+
+
+def print_table(report: Dict[str, Any]) -> None:
+    print(f"\n📊 {report['label'] or report['target']} ({report.get('revision') or 'unknown'})")
+    print(f"{'case':<60} {'slices':>6} {'capture':>8} {'ocr':>8} {'total':>8} {'rss MB':>8} {'out MB':>8}")
+    for case in report["cases"]:
+        if "error" in case:
+            print(f"{case['name'][:60]:<60} ❌ {' '.join(case['error'])}")
+            continue
+        stages = case["stages"]
+        print(
+            f"{case['name'][:60]:<60} {case['slices']:>6} {stages['capture']:>8.2f} {stages['ocr']:>8.2f}"
+            f" {stages['total']:>8.2f} {case['peak_rss_bytes'] / 1024 / 1024:>8.1f}"
+            f" {case['output_bytes'] / 1024 / 1024:>8.1f}"
+        )
+
+
+def compare_reports(base_path: Path, new_path: Path) -> None:
+    base = json.loads(base_path.read_text(encoding="utf-8"))
+    new = json.loads(new_path.read_text(encoding="utf-8"))
+    print(f"比較: {base.get('label') or base_path.name} → {new.get('label') or new_path.name}")
+    for key in sorted(set(base["summary"]["stages"]) | set(new["summary"]["stages"])):
+        before = base["summary"]["stages"].get(key, 0.0)
+        after = new["summary"]["stages"].get(key, 0.0)
+        ratio = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"  {key:<18} {before:>9.2f}s → {after:>9.2f}s ({ratio})")
+    for key in ("slices", "max_peak_rss_bytes", "output_bytes"):
+        print(f"  {key:<18} {base['summary'][key]:>10} → {new['summary'][key]:>10}")
+
+
+def main() -> None:
+    args = parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(json.loads(args.run_one)), ensure_ascii=False))
+        return
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="transcribe_bench_") as temp_dir:
+        temp_root = Path(temp_dir)
+        site_dir = temp_root / "site"
+        site_dir.mkdir()
+        server = start_server(site_dir)
+        try:
+            cases = build_cases(args, site_dir, server.server_address[1])
+            results = []
+            for case in cases:
+                for attempt in range(args.repeat):
+                    print(f"⏱️ {case['name']} ({attempt + 1}/{args.repeat})", flush=True)
+                    spec = {
+                        **case,
+                        "target": args.target,
+                        "work_dir": str(temp_root / "runs" / f"{len(results):03d}"),
+                        "ocr_latency": args.ocr_latency,
+                        "ocr_jitter": args.ocr_jitter,
+                        "slice_height": args.slice_height,
+                        "overlap": args.overlap,
+                        "ocr_workers": args.ocr_workers,
+                        "scroll_wait": args.scroll_wait,
+                        "segment_wait": args.segment_wait,
+                    }
+                    results.append({**run_case_subprocess(spec), "attempt": attempt + 1})
+        finally:
+            server.shutdown()
+
+    report = {
+        "label": args.label,
+        "target": args.target,
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "params": {
+            "ocr_latency": args.ocr_latency,
+            "ocr_jitter": args.ocr_jitter,
+            "slice_height": args.slice_height,
+            "overlap": args.overlap,
+            "ocr_workers": args.ocr_workers,
+            "scroll_wait": args.scroll_wait,
+            "segment_wait": args.segment_wait,
+            "repeat": args.repeat,
+        },
+        "cases": results,
+        "summary": summarize(results),
+    }
+
+    output_path = args.output or DEFAULT_OUTPUT_DIR / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print_table(report)
+    print(f"\n💾 結果を保存しました: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,15 @@
 from __future__ import annotations
 
-import subprocess
 import sys
-import tempfile
 import threading
 import tkinter as tk
 from contextlib import redirect_stderr, redirect_stdout
-import os
 from pathlib import Path
 from tkinter import filedialog, messagebox, ttk
 import re
 import unicodedata
 import traceback
 
-from PIL import Image, ImageTk
 
 
 CURRENT_DIR = Path(__file__).resolve().parent
@@ -30,14 +26,21 @@ for candidate in MODULE_CANDIDATES:
 
 import extract_ads  # type: ignore
 import extract_seo  # type: ignore
+import run_full_pipeline  # type: ignore
 import transcribe_website  # type: ignore
+from tile_viewer import TiledImageViewer
 
 
 APP_TITLE = "SearchMan Desktop"
 DEFAULT_MODE = "ads"
 DEFAULT_GEMINI_MODEL = "models/gemini-2.5-flash"
-PIPELINE_SCRIPT_PATH = MODULE_BASE / "run_full_pipeline.py"
 PROGRESS_INTERVAL_SECONDS = 5
+PIPELINE_STAGE_LABELS = {
+    "capture": "ページ取得",
+    "transcription": "OCR文字起こし",
+    "analysis_request": "分析プロンプト生成",
+    "analysis": "Gemini分析",
+}
 
 
 def slugify(text: str) -> str:
@@ -92,6 +95,8 @@ class SearchManApp(tk.Tk):
 
         self._running = False
         self._worker: threading.Thread | None = None
+        self._cancel_event: threading.Event | None = None
+        self._pipeline_total = 0
         self._progress_after_id: str | None = None
         self._progress_elapsed_seconds = 0
         self._progress_label = ""
@@ -99,7 +104,6 @@ class SearchManApp(tk.Tk):
             "transcripts": [],
             "analysis_results": [],
         }
-        self._result_image: ImageTk.PhotoImage | None = None
         self._last_pipeline_config: dict[str, object] | None = None
 
         self._build_ui()
@@ -277,10 +281,10 @@ class SearchManApp(tk.Tk):
         self.analysis_text.configure(yscrollcommand=analysis_scrollbar.set)
         analysis_scrollbar.pack(side="right", fill="y")
 
-        screenshot_frame = ttk.LabelFrame(self.result_tab, text="スクリーンショット (縮小表示)")
+        screenshot_frame = ttk.LabelFrame(self.result_tab, text="スクリーンショット (スクロールで全体を表示)")
         screenshot_frame.pack(fill="both", expand=False, padx=8, pady=(0, 8))
-        self.image_label = ttk.Label(screenshot_frame, text="スクリーンショットはまだありません。", anchor="center")
-        self.image_label.pack(fill="both", expand=True)
+        self.screenshot_viewer = TiledImageViewer(screenshot_frame, width=560, height=560)
+        self.screenshot_viewer.pack(fill="both", expand=True)
 
         container.columnconfigure(1, weight=1)
         container.rowconfigure(13, weight=1)
@@ -343,9 +347,8 @@ class SearchManApp(tk.Tk):
             self.analysis_text.delete("1.0", "end")
             self.analysis_text.insert("1.0", "結果はまだありません。")
             self.analysis_text.configure(state="disabled")
-        if hasattr(self, "image_label"):
-            self.image_label.configure(image="", text="スクリーンショットはまだありません。")
-        self._result_image = None
+        if hasattr(self, "screenshot_viewer"):
+            self.screenshot_viewer.show_message("スクリーンショットはまだありません。")
 
     def start_task(self) -> None:
         if self._running:
@@ -411,12 +414,19 @@ class SearchManApp(tk.Tk):
 
         self._append_log("処理を開始します...\n\n")
 
+        self._cancel_event = threading.Event() if mode == "pipeline" else None
         self._worker = threading.Thread(target=self._execute_task, args=(task_config,), daemon=True)
         self._worker.start()
 
     def cancel_task(self) -> None:
         if not self._running:
             return
+        if self._cancel_event is not None:
+            if not self._cancel_event.is_set():
+                self._cancel_event.set()
+                self._append_log("\n⏹ キャンセルを受け付けました。実行中のページ取得・分析が終わり次第停止します。\n")
+                self._update_status("キャンセルしています…")
+            return
         messagebox.showinfo(
             APP_TITLE,
             "現在の処理はPlaywright実行中のため強制停止できません。\nブラウザを閉じて処理終了をお待ちください。",
@@ -432,17 +442,21 @@ class SearchManApp(tk.Tk):
                 if success:
                     self.after(0, lambda: messagebox.showinfo(APP_TITLE, "処理が完了しました。"))
                     self.after(0, lambda: self._update_status("完了しました。"))
+                elif self._cancel_event is not None and self._cancel_event.is_set():
+                    self.after(0, lambda: self._update_status("キャンセルしました。"))
                 else:
                     self.after(0, lambda: messagebox.showerror(APP_TITLE, "エラーが発生しました。ログを確認してください。"))
                     self.after(0, lambda: self._update_status("エラーが発生しました。"))
             else:
                 with redirect_stdout(logger), redirect_stderr(logger):
+                    # ブラウザの場所などの環境変数は起動時ではなく最初の処理で設定する
+                    transcribe_website.init_playwright_environment()
                     keyword = config["keyword"]
                     keyword_slug = slugify(keyword)
                     if mode == "ads":
                         print("▶ スポンサー広告抽出を開始します。")
-                        ads_results = extract_ads.extract_sponsored_ads(keyword=keyword)
-                        markdown_path = extract_ads.save_to_markdown(ads_results, keyword)
+                        ads_results = extract_ads.extract_sponsored_ads(keyword=keyword, keyword_slug=keyword_slug)
+                        markdown_path = extract_ads.save_to_markdown(ads_results, keyword, keyword_slug=keyword_slug)
                         print("\n📁 出力ファイル:")
                         print(f"  - {markdown_path}")
                     else:
@@ -477,73 +491,11 @@ class SearchManApp(tk.Tk):
             self.after(0, lambda: self._set_running(False))
 
     def _run_full_pipeline_task(self, config: dict[str, object], logger: TextRedirector) -> bool:
-        if not PIPELINE_SCRIPT_PATH.exists():
-            logger.write("❌ run_full_pipeline.py が見つかりません。\n")
-            return False
-
         self._last_pipeline_config = dict(config)
         self._pipeline_result_paths = {"transcripts": [], "analysis_results": []}
-        temp_url_file_path: Path | None = None
+        self._pipeline_total = 0
 
-        manual_text = ""
-        if config["input_mode"] == "single":
-            url_value = config.get("url")
-            if url_value:
-                manual_text = f"{url_value}\n"
-        else:
-            url_list_value = config.get("url_list")
-            if url_list_value:
-                try:
-                    manual_text = Path(str(url_list_value)).read_text(encoding="utf-8")
-                except Exception as error:
-                    logger.write(f"⚠️ URL一覧ファイルの読み込みに失敗しました: {error}\n")
-                    manual_text = ""
-
-        ads_url_count = 0
-        if config["use_ads"]:
-            self.after(0, lambda: self._update_status("スポンサー広告を抽出しています…"))
-            logger.write("▶ スポンサー広告からURLを抽出します。\n")
-            ads_results = []
-            markdown_path: Path | None = None
-            try:
-                with redirect_stdout(logger), redirect_stderr(logger):
-                    ads_results = extract_ads.extract_sponsored_ads(keyword=config["keyword"])
-                    markdown_path = extract_ads.save_to_markdown(ads_results, config["keyword"])
-            except Exception as error:
-                logger.write(f"⚠️ 広告抽出に失敗しました: {error}\n")
-            else:
-                if markdown_path:
-                    logger.write(f"  - 広告レポート: {markdown_path}\n")
-                seen_urls: set[str] = set()
-                ad_urls: list[str] = []
-                for ad in ads_results:
-                    url = (ad.get("url") or "").strip()
-                    if url and url not in seen_urls:
-                        seen_urls.add(url)
-                        ad_urls.append(url)
-                ads_url_count = len(ad_urls)
-                logger.write(f"  - 追加URL数: {ads_url_count}\n")
-                if ad_urls:
-                    combined_text = manual_text
-                    if combined_text and not combined_text.endswith("\n"):
-                        combined_text += "\n"
-                    combined_text += "\n".join(ad_urls) + "\n"
-                    try:
-                        temp_file = tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".txt", encoding="utf-8")
-                        temp_file.write(combined_text)
-                        temp_file.flush()
-                        temp_file.close()
-                        temp_url_file_path = Path(temp_file.name)
-                        config["temp_url_file"] = temp_url_file_path
-                        logger.write(f"  - URL追加用一時ファイル: {temp_url_file_path}\n")
-                    except Exception as error:
-                        logger.write(f"⚠️ 広告URLの一時ファイル作成に失敗しました: {error}\n")
-                else:
-                    logger.write("  - 追加可能な広告URLはありませんでした。\n")
-
-        config["ads_url_count"] = ads_url_count
-
-        url_list_for_command = config.get("temp_url_file") or config.get("url_list")
+        url_list_for_command = config.get("url_list")
         url_single_for_command = None
         if config["input_mode"] == "single":
             url_single_for_command = config.get("url")
@@ -555,19 +507,12 @@ class SearchManApp(tk.Tk):
         else:
             url_arg = []
 
-        if not url_arg and not config["use_seo"]:
-            logger.write("❌ 処理対象となるURLがありません。広告抽出でもURLが見つかりませんでした。\n")
-            if temp_url_file_path and temp_url_file_path.exists():
-                try:
-                    temp_url_file_path.unlink()
-                except OSError:
-                    pass
+        if not url_arg and not config["use_seo"] and not config["use_ads"]:
+            logger.write("❌ 処理対象となるURLがありません。\n")
             self.after(0, lambda: self.result_summary_var.set("処理対象URLがありませんでした。"))
             return False
 
-        command: list[str] = [
-            sys.executable,
-            str(PIPELINE_SCRIPT_PATH),
+        argv: list[str] = [
             "--keyword",
             str(config["keyword"]),
             "--conversion-goal",
@@ -581,110 +526,89 @@ class SearchManApp(tk.Tk):
         ]
 
         if url_arg:
-            command.extend(url_arg)
+            argv.extend(url_arg)
 
         if config["use_seo"]:
-            command.append("--use-seo")
-            command.extend(["--seo-limit", str(config["seo_limit"])])
+            argv.append("--use-seo")
+            argv.extend(["--seo-limit", str(config["seo_limit"])])
+
+        # 広告抽出もパイプライン内で行い、SEO抽出・文字起こしとブラウザを共有する
+        if config["use_ads"]:
+            argv.append("--use-ads")
 
         if config["skip_gemini"]:
-            command.append("--skip-gemini")
+            argv.append("--skip-gemini")
 
         if config["skip_summary"]:
-            command.append("--skip-summary")
+            argv.append("--skip-summary")
 
         summary_output = str(config.get("summary_output") or "").strip()
         if summary_output:
-            command.extend(["--summary-output", summary_output])
+            argv.extend(["--summary-output", summary_output])
 
         logger.write("▶ フルパイプライン処理を開始します。\n")
-        logger.write(f"  - 実行ディレクトリ: {MODULE_BASE}\n")
-        logger.write("  - 実行コマンド: " + " ".join(command) + "\n\n")
-
-        env = os.environ.copy()
-        env.setdefault("PYTHONUNBUFFERED", "1")
-
-        self.after(0, lambda: self._update_status("URLを解析中…"))
+        logger.write("  - 引数: " + " ".join(argv) + "\n\n")
 
         try:
-            process = subprocess.Popen(
-                command,
-                cwd=str(MODULE_BASE),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                env=env,
-            )
-        except Exception:
-            logger.write("❌ サブプロセスの起動に失敗しました。\n")
-            logger.write(traceback.format_exc())
-            if temp_url_file_path and temp_url_file_path.exists():
-                try:
-                    temp_url_file_path.unlink()
-                except OSError:
-                    pass
+            args = run_full_pipeline.parse_args(argv)
+        except SystemExit:
+            logger.write("❌ パイプラインの引数が不正です。\n")
             return False
 
-        try:
-            assert process.stdout is not None
-            with process.stdout:
-                for line in process.stdout:
-                    logger.write(line)
-                    self._process_pipeline_stdout_line(line)
-
-            return_code = process.wait()
-            if return_code == 0:
-                ads_count = config.get("ads_url_count", 0)
-                if ads_count:
-                    logger.write(f"\n✅ 広告経由で追加したURL数: {ads_count}\n")
-                logger.write("\n✅ フルパイプライン処理が完了しました。\n")
-                self.after(0, self._display_pipeline_results)
-                return True
-
-            logger.write(f"\n❌ フルパイプライン処理が異常終了しました (exit code {return_code}).\n")
-            self.after(0, lambda: self.result_summary_var.set("今回の実行はエラーで終了しました。ログを確認してください。"))
-            return False
-        finally:
-            temp_path = config.get("temp_url_file")
-            if isinstance(temp_path, Path):
-                cleanup_target = temp_path
-            elif temp_path:
-                cleanup_target = Path(str(temp_path))
-            else:
-                cleanup_target = temp_url_file_path
-            if cleanup_target and cleanup_target.exists():
-                try:
-                    cleanup_target.unlink()
-                except OSError:
-                    pass
-
-    def _process_pipeline_stdout_line(self, line: str) -> None:
-        stripped = line.strip()
-        if not stripped:
-            return
+        self.after(0, lambda: self._update_status("URLを解析中…"))
 
-        normalized = stripped.lstrip("-•").strip()
+        # 同じプロセス内で実行し、進捗は文字列ではなくイベントで受け取る
+        with redirect_stdout(logger), redirect_stderr(logger):
+            try:
+                outcome = run_full_pipeline.run_pipeline(
+                    args,
+                    emit=self._on_pipeline_event,
+                    cancel_event=self._cancel_event,
+                )
+            except run_full_pipeline.PipelineError as error:
+                print(f"❌ {error}")
+                self.after(0, lambda: self.result_summary_var.set("処理対象URLがありませんでした。"))
+                return False
+
+        status = outcome["status"]
+        if status in ("completed", "incomplete"):
+            logger.write("\n✅ フルパイプライン処理が完了しました。\n")
+            self.after(0, self._display_pipeline_results)
+            return True
+
+        if status == "cancelled":
+            logger.write("\n⏹ フルパイプライン処理をキャンセルしました。\n")
+            self.after(0, self._display_pipeline_results)
+            return False
 
-        if "の処理を開始します" in stripped:
-            message = normalized
+        logger.write("\n❌ フルパイプライン処理はすべてのURLで失敗しました。\n")
+        self.after(0, lambda: self.result_summary_var.set("今回の実行はエラーで終了しました。ログを確認してください。"))
+        return False
+
+    def _on_pipeline_event(self, event: str, **fields: object) -> None:
+        """パイプラインのワーカースレッドから呼ばれる。画面の更新は after で Tk スレッドに渡す"""
+        if event == "urls_collected":
+            self._pipeline_total = len(fields.get("urls") or [])
+            self.after(0, lambda: self._update_status(f"{self._pipeline_total} 件のURLを処理します…"))
+        elif event == "stage_started":
+            label = PIPELINE_STAGE_LABELS.get(str(fields.get("stage")), str(fields.get("stage")))
+            message = f"[{int(fields['index']) + 1}/{self._pipeline_total}] {label}中: {fields.get('url')}"
             self.after(0, lambda msg=message: self._update_status(msg))
-        elif "Gemini によるマーケティング分析が完了しました" in stripped:
-            self.after(0, lambda: self._update_status("Gemini分析が完了しました。"))
-        elif "Gemini による分析に失敗しました" in stripped:
-            self.after(0, lambda: self._update_status("Gemini分析でエラーが発生しました。"))
-        elif "文字起こしとプロンプト生成が完了しました" in stripped:
-            self.after(0, lambda: self._update_status("文字起こしとプロンプト生成が完了しました。"))
-
-        if normalized.startswith("文字起こし Markdown:"):
-            path = normalized.split(":", 1)[1].strip()
-            if path and path not in self._pipeline_result_paths["transcripts"]:
-                self._pipeline_result_paths["transcripts"].append(path)
-        elif normalized.startswith("Gemini 分析結果:"):
-            path = normalized.split(":", 1)[1].strip()
-            if path and "生成されていません" not in path:
-                if path not in self._pipeline_result_paths["analysis_results"]:
-                    self._pipeline_result_paths["analysis_results"].append(path)
+        elif event == "stage_finished" and fields.get("status") == "failed":
+            label = PIPELINE_STAGE_LABELS.get(str(fields.get("stage")), str(fields.get("stage")))
+            self.after(0, lambda msg=f"{label}でエラーが発生しました。": self._update_status(msg))
+        elif event == "url_finished":
+            paths = self._pipeline_result_paths
+            transcript = fields.get("transcript")
+            analysis_result = fields.get("analysis_result")
+            if transcript and transcript not in paths["transcripts"]:
+                paths["transcripts"].append(str(transcript))
+            if analysis_result and analysis_result not in paths["analysis_results"]:
+                paths["analysis_results"].append(str(analysis_result))
+            if fields.get("success"):
+                self.after(0, lambda: self._update_status("文字起こしとプロンプト生成が完了しました。"))
+        elif event == "summary_started":
+            self.after(0, lambda: self._update_status("統合レポートを生成中…"))
 
     def _display_pipeline_results(self) -> None:
         transcripts = [Path(p) for p in self._pipeline_result_paths.get("transcripts", []) if p]
@@ -729,7 +653,10 @@ class SearchManApp(tk.Tk):
         self.analysis_text.configure(state="disabled")
 
         screenshot_path: Path | None = None
-        if run_dir is not None:
+        manifest = transcribe_website.load_run_manifest(run_dir) if run_dir is not None else None
+        if manifest and manifest.get("screenshot", {}).get("path"):
+            screenshot_path = Path(manifest["screenshot"]["path"])
+        elif run_dir is not None:
             candidate = run_dir / "full_page.png"
             if candidate.exists():
                 screenshot_path = candidate
@@ -739,19 +666,10 @@ class SearchManApp(tk.Tk):
                     screenshot_path = png_candidates[0]
 
         if screenshot_path and screenshot_path.exists():
-            try:
-                with Image.open(screenshot_path) as img:
-                    max_size = (560, 560)
-                    img.thumbnail(max_size, Image.LANCZOS)
-                    self._result_image = ImageTk.PhotoImage(img)
-            except Exception as error:
-                self._result_image = None
-                self.image_label.configure(image="", text=f"スクリーンショットを読み込めませんでした: {error}")
-            else:
-                self.image_label.configure(image=self._result_image, text="")
+            # タイル生成・読み込みはビューア側のワーカーで行う
+            self.screenshot_viewer.show_image(screenshot_path)
         else:
-            self._result_image = None
-            self.image_label.configure(image="", text="スクリーンショットが見つかりませんでした。")
+            self.screenshot_viewer.show_message("スクリーンショットが見つかりませんでした。")
 
         self.notebook.select(self.result_tab)
 
@@ -5,7 +5,6 @@ LP文字起こしGUIアプリケーション
 
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
-from PIL import Image, ImageTk
 try:
     from tkinterdnd2 import DND_FILES, TkinterDnD
     TKDND_AVAILABLE = True
@@ -20,9 +19,25 @@ from pathlib import Path
 from datetime import datetime
 from typing import Optional
 
-# transcribe_websiteモジュールをインポート
+# transcribe_websiteモジュールの場所
 sys.path.insert(0, str(Path(__file__).resolve().parent / "search_man copy"))
-import transcribe_website
+# タイルビューアが使う image_pyramid は search_man 側にある
+sys.path.append(str(Path(__file__).resolve().parent / "search_man"))
+from tile_viewer import TiledImageViewer
+
+# transcribe_website は Playwright・Pillow・Gemini を読み込むため、ウィンドウを表示してから読み込む
+transcribe_website = None
+_transcriber_lock = threading.Lock()
+
+
+def load_transcribe_website():
+    """transcribe_website を初回呼び出し時に読み込んで返す"""
+    global transcribe_website
+    with _transcriber_lock:
+        if transcribe_website is None:
+            import transcribe_website as module
+            transcribe_website = module
+        return transcribe_website
 
 
 class LPTranscriberApp:
@@ -336,15 +351,14 @@ class LPTranscriberApp:
         # カード3: スクリーンショットプレビュー
         screenshot_card = self._create_card(main_frame, "📸 スクリーンショット")
         
-        self.screenshot_label = tk.Label(
+        self.screenshot_viewer = TiledImageViewer(
             screenshot_card,
-            text="スクリーンショットはここに表示されます",
-            font=('SF Pro Text', 11),
-            fg=self.colors['text_light'],
+            width=800,
+            height=480,
             bg=self.colors['card_bg'],
-            relief='flat'
         )
-        self.screenshot_label.pack(fill="both", expand=True, pady=20)
+        self.screenshot_viewer.pack(fill="both", expand=True, pady=20)
+        self.screenshot_viewer.show_message("スクリーンショットはここに表示されます")
         
         # カード4: ログ
         log_card = self._create_card(main_frame, "📊 ログ")
@@ -436,7 +450,7 @@ class LPTranscriberApp:
 
         # OCR準備チェック
         self.log_message("🎉 アプリケーション起動")
-        self.check_ocr_ready()
+        threading.Thread(target=self._load_transcriber, daemon=True).start()
         self.on_input_mode_change()
     
     def _create_card(self, parent, title):
@@ -535,6 +549,15 @@ class LPTranscriberApp:
         self.log_text.see(tk.END)
         self.log_text.config(state=tk.DISABLED)
     
+    def _load_transcriber(self):
+        """文字起こしモジュールを別スレッドで読み込み、終わったらOCR準備チェックを行う"""
+        try:
+            load_transcribe_website()
+        except Exception as e:
+            self.root.after(0, self.log_message, f"❌ 文字起こしモジュールの読み込みに失敗しました: {e}")
+            return
+        self.root.after(0, self.check_ocr_ready)
+
     def check_ocr_ready(self):
         """OCR機能の利用可能性をチェック"""
         if not transcribe_website.GEMINI_AVAILABLE:
@@ -654,6 +677,7 @@ class LPTranscriberApp:
     def process_input(self, mode, value):
         """入力タイプに応じて処理を実行（別スレッド）"""
         try:
+            load_transcribe_website()
             self.log_message("📄 ページを読み込み中...")
 
             if mode == "local":
@@ -788,29 +812,9 @@ class LPTranscriberApp:
                 messagebox.showerror("エラー", f"フォルダを開けませんでした: {e}")
     
     def display_screenshot(self, screenshot_path):
-        """スクリーンショットを表示"""
-        try:
-            img = Image.open(screenshot_path)
-            
-            # 表示サイズを計算（最大幅800px、高さは比率を維持）
-            max_width = 800
-            width, height = img.size
-            if width > max_width:
-                ratio = max_width / width
-                new_width = max_width
-                new_height = int(height * ratio)
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # PIL ImageをTkinter PhotoImageに変換
-            photo = ImageTk.PhotoImage(img)
-            
-            # ラベルに画像を設定（参照を保持しないとガベージコレクションされる）
-            self.screenshot_label.config(image=photo, text="")
-            self.screenshot_label.image = photo
-            
-            self.log_message("✅ スクリーンショットを表示しました")
-        except Exception as e:
-            self.log_message(f"⚠️ スクリーンショット表示エラー: {e}")
+        """スクリーンショットを表示（タイルの生成・読み込みはワーカーで行う）"""
+        self.screenshot_viewer.show_image(Path(screenshot_path))
+        self.log_message("✅ スクリーンショットのプレビューを準備しています")
 
 
 def main():
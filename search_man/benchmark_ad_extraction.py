@@ -0,0 +1,164 @@
+"""
+広告抽出のベンチマーク（ロケーター方式とページ内スクリプト1回方式の比較）
+
+保存済みの page_source.html をネットワークを遮断したページに読み込み、
+以前のロケーター方式（ブロックごとに outerHTML・is_visible・inner_text を往復取得）と
+extract_ads.extract_ads_in_page の所要時間を比べ、抽出結果が一致するかも確認する。
+
+使い方:
+    python benchmark_ad_extraction.py
+    python benchmark_ad_extraction.py SearchAds/foo/page_source.html --repeat 10 --output ads_bench.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import extract_ads
+import serp_parser
+
+DEFAULT_FIXTURE_GLOB = "**/page_source.html"
+
+
+def extract_with_locators(page) -> List[Dict[str, str]]:
+    """以前の extract_sponsored_ads と同じロケーター方式（比較用）"""
+    sponsor_labels = page.locator(
+        'span:has-text("スポンサー"), span:has-text("広告"), span:has-text("Sponsored"), span:has-text("Ad")'
+    ).all()
+    ad_blocks = page.locator(serp_parser.AD_BLOCK_SELECTOR).all()
+    aria_ad_blocks = page.locator(serp_parser.AD_ARIA_SELECTOR).all()
+
+    ad_blocks_from_labels = []
+    for label in sponsor_labels:
+        try:
+            parent = label.locator(
+                'xpath=ancestor::div[contains(@class, "uEierd") or contains(@class, "Cu4Edb")]'
+            ).first
+            ad_blocks_from_labels.append(parent)
+        except Exception:
+            pass
+
+    unique_ad_blocks = []
+    seen_block_html = set()
+    for block in ad_blocks + ad_blocks_from_labels + aria_ad_blocks:
+        try:
+            signature = block.evaluate("el => el.outerHTML", timeout=1000)
+            if not signature:
+                continue
+            signature = signature.strip()
+        except Exception:
+            continue
+        if signature in seen_block_html:
+            continue
+        seen_block_html.add(signature)
+        unique_ad_blocks.append(block)
+
+    ads_data = []
+    for ad_block in unique_ad_blocks:
+        headline = ""
+        for selector in serp_parser.AD_HEADLINE_SELECTORS:
+            try:
+                headline_elem = ad_block.locator(selector).first
+                if headline_elem.is_visible():
+                    headline = headline_elem.inner_text(timeout=1000)
+                    if headline and len(headline) > 5:
+                        break
+            except Exception:
+                continue
+
+        url = ""
+        try:
+            url = ad_block.locator("a").first.get_attribute("href", timeout=1000) or ""
+        except Exception:
+            pass
+
+        description = ""
+        try:
+            desc_elem = ad_block.locator(serp_parser.AD_DESCRIPTION_SELECTOR).first
+            if desc_elem.is_visible():
+                description = desc_elem.inner_text(timeout=1000)
+        except Exception:
+            pass
+
+        if headline:
+            ads_data.append(
+                {
+                    "headline": headline.strip(),
+                    "url": (url or "").strip(),
+                    "description": (description or "").strip(),
+                }
+            )
+    return ads_data
+
+
+def _records(ads: List[Dict[str, str]]) -> List[tuple]:
+    return sorted({(ad["headline"], ad["url"], ad["description"]) for ad in ads})
+
+
+def benchmark_fixture(page, fixture: Path, repeat: int) -> Dict[str, Any]:
+    page.set_content(fixture.read_text(encoding="utf-8", errors="replace"), wait_until="domcontentloaded")
+    timings: Dict[str, List[float]] = {"locators": [], "evaluate": []}
+    outputs: Dict[str, List[Dict[str, str]]] = {}
+    for _ in range(repeat):
+        for name, extractor in (("locators", extract_with_locators), ("evaluate", extract_ads.extract_ads_in_page)):
+            started_at = time.perf_counter()
+            outputs[name] = extractor(page)
+            timings[name].append(time.perf_counter() - started_at)
+
+    locator_ms = statistics.median(timings["locators"]) * 1000
+    evaluate_ms = statistics.median(timings["evaluate"]) * 1000
+    return {
+        "fixture": str(fixture),
+        "ads": len(outputs["evaluate"]),
+        "locators_ms": round(locator_ms, 2),
+        "evaluate_ms": round(evaluate_ms, 2),
+        "speedup": round(locator_ms / evaluate_ms, 1) if evaluate_ms else None,
+        "same_records": _records(outputs["locators"]) == _records(outputs["evaluate"]),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="広告抽出（ロケーター方式 / ページ内スクリプト方式）の比較")
+    parser.add_argument("fixtures", nargs="*", type=Path, help="計測する page_source.html（未指定なら SearchAds 以下すべて）")
+    parser.add_argument("--repeat", type=int, default=5, help="各方式の繰り返し回数（中央値を表示）")
+    parser.add_argument("--output", type=Path, help="結果JSONの保存先")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    fixtures = args.fixtures or sorted(extract_ads.OUTPUT_DIR.glob(DEFAULT_FIXTURE_GLOB))
+    if not fixtures:
+        print("❌ 計測する page_source.html が見つかりません。")
+        return
+
+    from playwright.sync_api import sync_playwright
+
+    results = []
+    with sync_playwright() as playwright:
+        browser = playwright.chromium.launch(headless=True)
+        context = browser.new_context(**playwright.devices["iPhone 12"], locale="ja-JP")
+        # 保存済みHTMLに含まれる外部リソースは読み込まない
+        context.route("**/*", lambda route: route.abort())
+        page = context.new_page()
+        for fixture in fixtures:
+            result = benchmark_fixture(page, fixture, max(1, args.repeat))
+            results.append(result)
+            mark = "✅" if result["same_records"] else "⚠️"
+            print(
+                f"{mark} {fixture}: 広告 {result['ads']} 件 / "
+                f"ロケーター {result['locators_ms']:.1f}ms → evaluate {result['evaluate_ms']:.1f}ms"
+                f" (x{result['speedup']})"
+            )
+        browser.close()
+
+    if args.output:
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"📁 結果を保存しました: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
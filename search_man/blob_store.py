@@ -0,0 +1,191 @@
+"""
+キャプチャ成果物のコンテンツアドレス型ストア
+
+スクリーンショットや分割画像を sha256 をキーに blobs/<先頭2桁>/<次の2桁>/<hash><拡張子> へ1回だけ保存し、
+run_* ディレクトリ側のファイルはハードリンク（不可ならシンボリックリンク）に置き換える。
+同じLPを何度キャプチャしても実体は1つで済み、ハッシュはそのままOCRキャッシュのキーになる。
+"""
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+STORE_DIR_ENV = "ARTIFACT_STORE_DIR"
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE", "1") != "0"
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE", "1") != "0"
+
+
+def store_dir_path(default: Path) -> Path:
+    """環境変数 ARTIFACT_STORE_DIR があればツール間で共有するストアとして使う（フォルダは作成しない）"""
+    configured = os.getenv(STORE_DIR_ENV)
+    return Path(configured).expanduser() if configured else default
+
+
+def get_store_dir(default: Path) -> Path:
+    store_dir = store_dir_path(default)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    return store_dir
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_path(store_dir: Path, digest: str, suffix: str = "") -> Path:
+    return store_dir / digest[:2] / digest[2:4] / f"{digest}{suffix}"
+
+
+SYMLINK_MARKER = ".uses_symlinks"
+
+
+def _hardlink_unsupported(error: OSError) -> bool:
+    """別ファイルシステム(EXDEV)やハードリンク非対応(EPERM)のときだけシンボリックリンクに切り替える"""
+    return error.errno in (errno.EXDEV, errno.EPERM)
+
+
+def _link_into_place(store_dir: Path, source: Path, target: Path) -> None:
+    tmp_path = target.with_name(target.name + ".link")
+    if tmp_path.exists() or tmp_path.is_symlink():
+        tmp_path.unlink()
+    try:
+        os.link(source, tmp_path)
+    except OSError as error:
+        # ブロブが消えていた場合（FileNotFoundError）などは呼び出し側で取り込み直す
+        if not _hardlink_unsupported(error):
+            raise
+        (store_dir / SYMLINK_MARKER).touch()
+        os.symlink(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def _import_blob(store_dir: Path, source: Path, target: Path) -> bool:
+    """source をブロブとして取り込む。ハードリンクで取り込めた（source がすでにブロブと同じ実体）なら True
+
+    先に source をストアへハードリンクするので、取り込み直後からリンク数が2以上になり
+    remove_orphan_blobs に孤立ブロブとして消されることがない。
+    """
+    tmp_target = target.with_name(target.name + ".tmp")
+    if tmp_target.exists() or tmp_target.is_symlink():
+        tmp_target.unlink()
+    try:
+        os.link(source, tmp_target)
+    except OSError as error:
+        if not _hardlink_unsupported(error):
+            raise
+        # 複製したブロブはリンク数1なので、掃除を止める目印を先に置いてから複製する
+        (store_dir / SYMLINK_MARKER).touch()
+        shutil.copyfile(source, tmp_target)
+        os.replace(tmp_target, target)
+        return False
+    os.replace(tmp_target, target)
+    return True
+
+
+def store_file(store_dir: Path, path: Path, digest: Optional[str] = None) -> str:
+    """ファイルをストアへ取り込み、元の場所をストアへのリンクに置き換えてハッシュを返す"""
+    path = Path(path)
+    digest = digest or file_sha256(path)
+    target = blob_path(store_dir, digest, path.suffix)
+
+    if path.resolve() == target.resolve():
+        return digest
+
+    if not path.exists():
+        raise FileNotFoundError(f"取り込むファイルがありません: {path}")
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        if target.exists():
+            try:
+                if not path.is_symlink() and os.path.samefile(path, target):
+                    return digest
+                _link_into_place(store_dir, target, path)
+                return digest
+            except FileNotFoundError:
+                # 確認した直後に remove_orphan_blobs がブロブを消した場合だけ取り込み直す
+                if target.exists() or not path.exists():
+                    raise
+                continue
+        if _import_blob(store_dir, path, target):
+            return digest
+
+
+def load_ocr_cache(store_dir: Path, digest: Optional[str], model_name: str) -> Optional[Dict[str, Any]]:
+    if not OCR_CACHE_ENABLED or not digest:
+        return None
+    cache_path = blob_path(store_dir, digest, f".{model_name}.ocr.json")
+    try:
+        return json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def save_ocr_cache(store_dir: Path, digest: Optional[str], model_name: str, raw_text: str) -> None:
+    if not OCR_CACHE_ENABLED or not digest or not raw_text:
+        return
+    cache_path = blob_path(store_dir, digest, f".{model_name}.ocr.json")
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    tmp_path.write_text(
+        json.dumps({"model": model_name, "raw_text": raw_text}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, cache_path)
+
+
+def analysis_cache_key(prompt_text: str, model_name: str, temperature: float) -> str:
+    """分析プロンプト全文（テンプレート・キーワード・CV目標・文字起こしを含む）とモデル設定のハッシュ"""
+    return hashlib.sha256(f"{model_name}\n{temperature}\n{prompt_text}".encode("utf-8")).hexdigest()
+
+
+def load_analysis_cache(store_dir: Path, digest: str) -> Optional[Dict[str, Any]]:
+    if not ANALYSIS_CACHE_ENABLED:
+        return None
+    try:
+        return json.loads(blob_path(store_dir, digest, ".analysis.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def save_analysis_cache(store_dir: Path, digest: str, model_name: str, result_text: str) -> None:
+    if not ANALYSIS_CACHE_ENABLED or not result_text:
+        return
+    cache_path = blob_path(store_dir, digest, ".analysis.json")
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    tmp_path.write_text(
+        json.dumps({"model": model_name, "result_text": result_text}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, cache_path)
+
+
+def remove_orphan_blobs(store_dir: Path) -> int:
+    """どの run からもハードリンクされていない画像ブロブを削除し、解放したバイト数を返す
+
+    シンボリックリンクで参照しているストアでは参照元を追えないため何もしない。
+    OCRキャッシュ(.ocr.json)・分析キャッシュ(.analysis.json)は小さいので残す。
+    """
+    if not store_dir.exists() or (store_dir / SYMLINK_MARKER).exists():
+        return 0
+    freed = 0
+    for blob in store_dir.glob("*/*/*"):
+        if blob.name.endswith((".json", ".tmp", ".link")) or not blob.is_file():
+            continue
+        try:
+            stat = blob.stat()
+            if stat.st_nlink > 1:
+                continue
+            blob.unlink()
+            freed += stat.st_size
+        except OSError:
+            continue
+    return freed
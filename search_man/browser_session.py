@@ -0,0 +1,137 @@
+"""
+キーワード処理全体で共有するブラウザセッション
+
+SEO抽出・広告抽出・各URLの文字起こしがそれぞれ Chromium を起動していたため、
+ブラウザは1度だけ起動して使い回し、段ごとに BrowserContext（Cookie等が独立）を分ける。
+Playwright の同期APIは作成したスレッドでしか使えないため、セッションはスレッドごとに持つ。
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# 検索結果ページ向けに自動操作の検知を抑える起動オプション
+SEARCH_BROWSER_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--disable-features=IsolateOrigins,site-per-process",
+]
+
+_local = threading.local()
+
+
+class BrowserSession:
+    def __init__(self, headless: bool = True, launcher: Optional[Callable[[Any], Any]] = None) -> None:
+        self.headless = headless
+        self._launcher = launcher
+        self._manager = None
+        self.playwright = None
+        self.browser = None
+        self.launch_count = 0
+        self.context_count = 0
+
+    def start(self) -> "BrowserSession":
+        """未起動（またはブラウザが落ちている）場合だけ起動する"""
+        if self.browser is not None and self.browser.is_connected():
+            return self
+        if self.playwright is None:
+            # Playwright は実際にブラウザを起動するときに読み込む
+            from playwright.sync_api import sync_playwright
+
+            self._manager = sync_playwright()
+            self.playwright = self._manager.start()
+        if self.headless and self._launcher is not None:
+            self.browser = self._launcher(self.playwright)
+        else:
+            self.browser = self.playwright.chromium.launch(headless=self.headless, args=SEARCH_BROWSER_ARGS)
+        self.launch_count += 1
+        return self
+
+    def new_context(
+        self,
+        device: Optional[str] = None,
+        device_fallback: Optional[Dict[str, Any]] = None,
+        **options: Any,
+    ):
+        self.start()
+        context_options: Dict[str, Any] = {}
+        profile = self.playwright.devices.get(device) if device else None
+        if profile:
+            context_options.update(profile)
+        elif device_fallback:
+            context_options.update(device_fallback)
+        context_options.update(options)
+        self.context_count += 1
+        return self.browser.new_context(**context_options)
+
+    def close(self) -> None:
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception as error:
+                print(f"⚠️ ブラウザの終了に失敗しました: {error}")
+            self.browser = None
+        if self._manager is not None:
+            try:
+                self._manager.__exit__(None, None, None)
+            except Exception:
+                pass
+            self._manager = None
+            self.playwright = None
+
+    def __enter__(self) -> "BrowserSession":
+        return self.start()
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+
+def get_session() -> Optional[BrowserSession]:
+    """このスレッドで開いている共有セッション（無ければ None）"""
+    return getattr(_local, "session", None)
+
+
+def open_session(headless: bool = True, launcher: Optional[Callable[[Any], Any]] = None) -> BrowserSession:
+    """このスレッドの共有セッションを開く。既に開いていればそれを返す"""
+    session = get_session()
+    if session is None:
+        session = BrowserSession(headless=headless, launcher=launcher)
+        _local.session = session
+    return session
+
+
+def close_session() -> None:
+    session = get_session()
+    if session is not None:
+        _local.session = None
+        if session.launch_count:
+            print(
+                f"ℹ️ 共有ブラウザを終了します（起動 {session.launch_count} 回 / コンテキスト {session.context_count} 件）"
+            )
+        session.close()
+
+
+@contextmanager
+def stage_context(
+    headless: bool = True,
+    launcher: Optional[Callable[[Any], Any]] = None,
+    device: Optional[str] = None,
+    device_fallback: Optional[Dict[str, Any]] = None,
+    **options: Any,
+) -> Iterator[Any]:
+    """段ごとの BrowserContext を返す
+
+    スレッドの共有セッションがあればそのブラウザを使い、無ければこの段のためだけに起動して閉じる。
+    """
+    session = get_session()
+    temporary = session is None
+    if temporary:
+        session = BrowserSession(headless=headless, launcher=launcher)
+    try:
+        context = session.new_context(device=device, device_fallback=device_fallback, **options)
+        try:
+            yield context
+        finally:
+            context.close()
+    finally:
+        if temporary:
+            session.close()
@@ -0,0 +1,308 @@
+"""
+複数キーワードの検索結果（SEO・広告）をまとめて収集するスクリプト
+
+1つのブラウザで複数のコンテキストを同時に動かし、検索エンジンへのアクセスは全体で
+一定間隔に制限する。取得したHTMLは既存と同じ キーワード別フォルダ（SearchSEO/<slug>/,
+SearchAds/<slug>/）に保存し、抽出は serp_parser でオフラインに行う。
+最後に全キーワードの結果をまとめた索引（JSON / Markdown）を出力する。
+
+使い方:
+    python collect_serps.py --keywords-file keywords.txt --concurrency 4 --rate 20
+    python collect_serps.py --keyword "生成AI セミナー" --keyword "ChatGPT 研修" --kind seo
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+
+import browser_session
+import extract_ads
+import extract_seo
+import serp_parser
+
+INDEX_BASENAME = "keyword_index"
+CONCURRENCY_DEFAULT = 4
+# 検索エンジンへのリクエスト数の上限（全キーワード合計・1分あたり）
+RATE_PER_MINUTE_DEFAULT = 20.0
+# CAPTCHAが出たときに全体のアクセスを止める秒数
+CAPTCHA_BACKOFF_SECONDS = 120.0
+CAPTCHA_MARKERS = ("recaptcha", "unusual traffic")
+
+
+def slugify(text: str) -> str:
+    normalized = unicodedata.normalize("NFKC", text)
+    lowered = normalized.lower()
+    slug = re.sub(r"[^0-9a-zA-Z一-龥ぁ-んァ-ヶー_]+", "_", lowered).strip("_")
+    return slug or "default"
+
+
+def read_keywords(args: argparse.Namespace) -> List[str]:
+    keywords: List[str] = list(args.keyword or [])
+    if args.keywords_file:
+        for line in args.keywords_file.read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                keywords.append(line)
+    unique: List[str] = []
+    seen = set()
+    for keyword in keywords:
+        slug = slugify(keyword)
+        if slug in seen:
+            continue
+        seen.add(slug)
+        unique.append(keyword)
+    return unique
+
+
+class RateLimiter:
+    """全体で interval 秒に1回までに抑える（asyncio 用）"""
+
+    def __init__(self, per_minute: float) -> None:
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at)
+            self._next_at = start_at + self.interval
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    def backoff(self, seconds: float) -> None:
+        self._next_at = max(self._next_at, time.monotonic() + seconds)
+
+
+def search_targets(keyword: str, slug: str, kind: str) -> List[Dict[str, Any]]:
+    """キーワードごとに取得するページ（既存の抽出スクリプトと同じURL・保存先）"""
+    targets = []
+    if kind in ("both", "seo"):
+        output_dir = extract_seo._ensure_output_dir(slug)
+        targets.append(
+            {
+                "kind": "seo",
+                "url": "https://www.google.com/search?"
+                + urlencode({"q": keyword, "hl": "ja", "gl": "JP", "udm": "14"}),
+                "html_path": output_dir / "page_source_seo.html",
+                "screenshot_path": output_dir / "search_result_seo.png",
+                "wait_selector": extract_seo.RESULT_CONTAINER_SELECTOR,
+                "scroll": 800,
+            }
+        )
+    if kind in ("both", "ads"):
+        output_dir = extract_ads._ensure_output_dir(slug)
+        targets.append(
+            {
+                "kind": "ads",
+                "url": "https://www.google.com/search?" + urlencode({"q": keyword}),
+                "html_path": output_dir / "page_source.html",
+                "screenshot_path": output_dir / "search_result.png",
+                "wait_selector": extract_ads.RESULT_CONTAINER_SELECTOR,
+                "scroll": 300,
+            }
+        )
+    return targets
+
+
+async def fetch_snapshot(
+    browser,
+    device: Dict[str, Any],
+    target: Dict[str, Any],
+    limiter: RateLimiter,
+    screenshots: bool,
+) -> Optional[str]:
+    """1ページを取得してHTMLを保存する。CAPTCHAの場合は保存せずに例外を送出する"""
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    await limiter.wait()
+    context = await browser.new_context(**device, locale="ja-JP", timezone_id="Asia/Tokyo")
+    try:
+        page = await context.new_page()
+        await page.goto(target["url"], wait_until="domcontentloaded")
+        try:
+            await page.wait_for_selector(target["wait_selector"], timeout=extract_seo.RESULT_WAIT_TIMEOUT_MS)
+        except PlaywrightTimeoutError:
+            pass
+        html = await page.content()
+        if any(marker in html.lower() for marker in CAPTCHA_MARKERS):
+            limiter.backoff(CAPTCHA_BACKOFF_SECONDS)
+            raise RuntimeError("CAPTCHA が表示されました")
+        await page.evaluate(f"window.scrollBy(0, {target['scroll']})")
+        if screenshots:
+            await page.screenshot(path=str(target["screenshot_path"]), full_page=True)
+        target["html_path"].write_text(html, encoding="utf-8")
+        return html
+    finally:
+        await context.close()
+
+
+async def collect_keyword(
+    keyword: str,
+    browser,
+    device: Dict[str, Any],
+    semaphore: asyncio.Semaphore,
+    limiter: RateLimiter,
+    args: argparse.Namespace,
+) -> Dict[str, Any]:
+    slug = slugify(keyword)
+    entry: Dict[str, Any] = {"keyword": keyword, "slug": slug, "status": "ok", "errors": []}
+
+    for target in search_targets(keyword, slug, args.kind):
+        started_at = time.perf_counter()
+        root = None
+        source = "snapshot"
+        if not args.refresh:
+            root = serp_parser.load_fresh_snapshot(target["html_path"], keyword)
+        if root is None:
+            source = "live"
+            try:
+                async with semaphore:
+                    html = await fetch_snapshot(browser, device, target, limiter, not args.no_screenshots)
+            except Exception as error:
+                entry["status"] = "error"
+                entry["errors"].append(f"{target['kind']}: {error}")
+                print(f"⚠️ [{keyword}] {target['kind']} の取得に失敗しました: {error}", flush=True)
+                continue
+            root = serp_parser.parse_html(html)
+
+        if target["kind"] == "seo":
+            candidates = serp_parser.extract_organic_candidates(root, args.limit)
+            results = serp_parser.build_organic_results(candidates, args.limit)
+            markdown_path = extract_seo.save_to_markdown(results, keyword, keyword_slug=slug)
+            entry["seo"] = {"count": len(results), "results": results}
+        else:
+            results = serp_parser.dedupe_ads(serp_parser.extract_ad_candidates(root))
+            markdown_path = extract_ads.save_to_markdown(results, keyword, keyword_slug=slug)
+            entry["ads"] = {"count": len(results), "results": results}
+        entry[target["kind"]].update(
+            {
+                "source": source,
+                "html": str(target["html_path"]),
+                "markdown": str(markdown_path),
+                "seconds": round(time.perf_counter() - started_at, 3),
+            }
+        )
+        print(
+            f"✅ [{keyword}] {target['kind']}: {len(results)} 件"
+            f" ({'保存済みHTML' if source == 'snapshot' else '取得'} / {entry[target['kind']]['seconds']}s)",
+            flush=True,
+        )
+    return entry
+
+
+async def collect_all(keywords: List[str], args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from playwright.async_api import async_playwright
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limiter = RateLimiter(args.rate)
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(
+            headless=not args.interactive,
+            args=browser_session.SEARCH_BROWSER_ARGS,
+        )
+        device = playwright.devices.get("iPhone 12") or {}
+        try:
+            return await asyncio.gather(
+                *(collect_keyword(keyword, browser, device, semaphore, limiter, args) for keyword in keywords)
+            )
+        finally:
+            await browser.close()
+
+
+def write_index(entries: List[Dict[str, Any]], index_path: Path, elapsed: float) -> Path:
+    """全キーワードの結果を1つのJSONと一覧Markdownにまとめる"""
+    index = {
+        "generated_at": datetime.now().isoformat(),
+        "elapsed_seconds": round(elapsed, 3),
+        "keywords": entries,
+    }
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    index_path.write_text(json.dumps(index, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    lines = [
+        "# キーワード別 検索結果一覧",
+        "",
+        f"生成日時: {time.strftime('%Y年%m月%d日 %H:%M:%S')}",
+        "",
+        "| キーワード | SEO件数 | 広告件数 | SEO 1位 | 状態 |",
+        "| --- | --- | --- | --- | --- |",
+    ]
+    for entry in entries:
+        seo = entry.get("seo") or {}
+        ads = entry.get("ads") or {}
+        top = (seo.get("results") or [{}])[0]
+        top_label = f"[{top['title']}]({top['url']})" if top.get("url") else "-"
+        status = "OK" if entry["status"] == "ok" else "; ".join(entry["errors"])
+        lines.append(
+            f"| {entry['keyword']} | {seo.get('count', '-')} | {ads.get('count', '-')} | {top_label} | {status} |"
+        )
+    index_path.with_suffix(".md").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return index_path
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="複数キーワードの検索結果（SEO・広告）をまとめて収集します")
+    parser.add_argument("--keyword", action="append", help="検索キーワード（複数指定可）")
+    parser.add_argument("--keywords-file", type=Path, help="1行1キーワードのファイル（# で始まる行は無視）")
+    parser.add_argument("--kind", choices=["both", "seo", "ads"], default="both", help="収集する種類")
+    parser.add_argument("--limit", type=int, default=extract_seo.RESULT_LIMIT, help="オーガニック結果の最大件数")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=CONCURRENCY_DEFAULT,
+        help=f"同時に開くコンテキスト数 (既定: {CONCURRENCY_DEFAULT})",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=RATE_PER_MINUTE_DEFAULT,
+        help=f"検索エンジンへの1分あたりの最大リクエスト数 (既定: {RATE_PER_MINUTE_DEFAULT:g})",
+    )
+    parser.add_argument("--refresh", action="store_true", help="新しい保存済みHTMLがあっても取得し直します。")
+    parser.add_argument("--no-screenshots", action="store_true", help="検索結果のスクリーンショットを保存しません。")
+    parser.add_argument("--interactive", action="store_true", help="ブラウザを表示して実行します。")
+    parser.add_argument(
+        "--index",
+        type=Path,
+        default=extract_seo.BASE_OUTPUT_DIR / f"{INDEX_BASENAME}.json",
+        help="全キーワードの索引（JSON）の出力先。同名の .md も作成します。",
+    )
+    args = parser.parse_args()
+    if not args.keyword and not args.keywords_file:
+        parser.error("--keyword または --keywords-file を指定してください。")
+    if args.concurrency <= 0:
+        parser.error("--concurrency には1以上の値を指定してください。")
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    keywords = read_keywords(args)
+    if not keywords:
+        print("❌ 収集対象のキーワードがありません。", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"🔍 {len(keywords)} キーワードを収集します（同時 {args.concurrency} / 最大 {args.rate:g} 件/分）")
+    started_at = time.perf_counter()
+    entries = asyncio.run(collect_all(keywords, args))
+    elapsed = time.perf_counter() - started_at
+
+    index_path = write_index(entries, args.index, elapsed)
+    failed = [entry for entry in entries if entry["status"] != "ok"]
+    print(f"\n✅ {len(entries) - len(failed)}/{len(entries)} キーワードを {elapsed:.1f}s で収集しました")
+    print(f"📁 索引: {index_path} / {index_path.with_suffix('.md')}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,156 @@
 """
 指定KWのスポンサード広告を抽出するスクリプト
+
+既定はヘッドレスのバッチモードで、検索結果のコンテナが現れるまで待ってすぐ抽出する。
+--interactive を付けるとブラウザを表示し、CAPTCHAの手動解決待ちと抽出後の確認待ちを行う。
 """
+import argparse
 from pathlib import Path
-from playwright.sync_api import sync_playwright
+from typing import Optional
 import time
 
+import browser_session
+import serp_parser
+
 BASE_DIR = Path(__file__).resolve().parent
 OUTPUT_DIR = BASE_DIR / "SearchAds"
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 DEFAULT_KEYWORD = "マウスピース矯正"
 
-def extract_sponsored_ads(keyword: str = DEFAULT_KEYWORD):
+# 検索結果（広告を含む）のコンテナ。これが現れたら抽出を始める
+RESULT_CONTAINER_SELECTOR = "#rso, #search, div.MjjYud, div.uEierd, div[data-text-ad]"
+RESULT_WAIT_TIMEOUT_MS = 10000
+# 対話モードでCAPTCHAの手動解決を待つ上限と、抽出後にブラウザを開いておく秒数
+CAPTCHA_WAIT_TIMEOUT_MS = 120000
+INTERACTIVE_LINGER_SECONDS = 10
+
+def _ensure_output_dir(keyword_slug: Optional[str] = None) -> Path:
+    if keyword_slug:
+        target_dir = OUTPUT_DIR / keyword_slug
+    else:
+        target_dir = OUTPUT_DIR
+    target_dir.mkdir(parents=True, exist_ok=True)
+    return target_dir
+
+# 広告ブロックを3通りの方法で集め、ブロック単位で重複を除いてから見出し・URL・説明文を取り出す。
+# ルールは serp_parser のオフライン抽出と同じ（セレクタは引数で受け取る）
+AD_EXTRACTION_SCRIPT = """
+(rules) => {
+    const isVisible = (el) => {
+        if (typeof el.checkVisibility === 'function') return el.checkVisibility();
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0;
+    };
+    const blocks = [];
+    const seenBlocks = new Set();
+    const addBlock = (el) => {
+        if (el && !seenBlocks.has(el)) {
+            seenBlocks.add(el);
+            blocks.push(el);
+        }
+    };
+
+    // 方法1: 既知の広告コンテナセレクタ
+    document.querySelectorAll(rules.blockSelector).forEach(addBlock);
+    // 方法2: 「スポンサー」「広告」などのラベルを含む span から広告コンテナを辿る
+    const ancestorSelector = rules.labelAncestorClasses.map((cls) => `div.${cls}`).join(', ');
+    document.querySelectorAll('span').forEach((span) => {
+        const text = (span.textContent || '').toLowerCase();
+        if (rules.labelTexts.some((label) => text.includes(label))) {
+            addBlock(span.closest(ancestorSelector));
+        }
+    });
+    // 方法3: aria-label で広告を示している要素
+    document.querySelectorAll(rules.ariaSelector).forEach(addBlock);
+
+    const ads = [];
+    for (const block of blocks) {
+        let headline = '';
+        for (const selector of rules.headlineSelectors) {
+            const el = block.querySelector(selector);
+            if (!el || !isVisible(el)) continue;
+            headline = el.innerText || '';
+            if (headline && headline.length > 5) break;
+        }
+        if (!headline) continue;
+
+        const link = block.querySelector('a');
+        const url = link ? (link.getAttribute('href') || '') : '';
+
+        const descriptionEl = block.querySelector(rules.descriptionSelector);
+        const description = descriptionEl && isVisible(descriptionEl) ? (descriptionEl.innerText || '') : '';
+
+        ads.push({ headline: headline.trim(), url: url.trim(), description: description.trim() });
+    }
+    return { blockCount: blocks.length, ads };
+}
+"""
+
+def extract_ads_in_page(page):
+    """ページ内スクリプト1回で広告候補（headline / url / description）を取得する"""
+    extracted = page.evaluate(
+        AD_EXTRACTION_SCRIPT,
+        {
+            "blockSelector": serp_parser.AD_BLOCK_SELECTOR,
+            "ariaSelector": serp_parser.AD_ARIA_SELECTOR,
+            "labelTexts": list(serp_parser.AD_LABEL_TEXTS),
+            "labelAncestorClasses": list(serp_parser.AD_LABEL_ANCESTOR_CLASSES),
+            "headlineSelectors": serp_parser.AD_HEADLINE_SELECTORS,
+            "descriptionSelector": serp_parser.AD_DESCRIPTION_SELECTOR,
+        },
+    )
+    print(f"ユニーク広告ブロック数: {extracted['blockCount']}")
+    return extracted["ads"]
+
+def extract_sponsored_ads(
+    keyword: str = DEFAULT_KEYWORD,
+    interactive: bool = False,
+    snapshot_max_age_hours: Optional[float] = None,
+    keyword_slug: Optional[str] = None,
+):
     """
     指定されたキーワードでGoogle検索を行い、
     スポンサード広告の見出しを抽出する
+
+    同じキーワードの新しい page_source.html があれば、ブラウザを起動せずにそれを解析する。
     """
+    output_dir = _ensure_output_dir(keyword_slug)
+    snapshot_path = output_dir / "page_source.html"
+    snapshot = serp_parser.load_fresh_snapshot(snapshot_path, keyword, snapshot_max_age_hours)
+    if snapshot is not None:
+        print(f"♻️ 保存済みの検索結果を解析します（ブラウザは起動しません）: {snapshot_path}")
+        return serp_parser.dedupe_ads(serp_parser.extract_ad_candidates(snapshot))
+
+    # Playwright はブラウザで取得するときだけ読み込む
+    from playwright.sync_api import TimeoutError
+
     ads_data = []
     
-    with sync_playwright() as p:
-        # ブラウザを起動（通常モード、より人間らしい設定）
-        browser = p.chromium.launch(
-            headless=False,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-features=IsolateOrigins,site-per-process'
-            ]
-        )
-        iphone_device = p.devices.get("iPhone 12")
-        context = browser.new_context(
-            **iphone_device,
-            locale='ja-JP',
-            timezone_id='Asia/Tokyo'
-        )
-        
+    # ブラウザは共有セッションのものを使い、広告抽出用のコンテキストを分ける
+    # （共有セッションが無ければ通常モードで起動、より人間らしい設定）
+    with browser_session.stage_context(
+        headless=not interactive,
+        device="iPhone 12",
+        locale='ja-JP',
+        timezone_id='Asia/Tokyo'
+    ) as context:
         # webdriver プロパティを削除して自動化検知を回避
         page = context.new_page()
         
         try:
             # Google検索ページへ移動
             print(f"検索中: {keyword}")
-            print("ページが読み込まれるまでお待ちください...")
+            if interactive:
+                print("ページが読み込まれるまでお待ちください...")
             page.goto(f"https://www.google.com/search?q={keyword}", wait_until="domcontentloaded")
             
-            # ページの読み込みを待つ（人間のような動作をシミュレート）
-            time.sleep(5)
+            # 固定時間待つのではなく、検索結果のコンテナが現れた時点で抽出に進む
+            try:
+                page.wait_for_selector(RESULT_CONTAINER_SELECTOR, timeout=RESULT_WAIT_TIMEOUT_MS)
+            except TimeoutError:
+                print("検索結果のコンテナを取得できませんでしたが処理を続行します")
             
             # スクロールして広告が表示されるのを確認
             page.evaluate("window.scrollBy(0, 300)")
-            time.sleep(2)
             
             # デバッグ: ページのHTMLを確認
             html_content = page.content()
@@ -56,170 +159,51 @@ def extract_sponsored_ads(keyword: str = DEFAULT_KEYWORD):
             # CAPTCHAが表示されているか確認
             if "recaptcha" in html_content.lower() or "unusual traffic" in html_content.lower():
                 print("\n⚠️ 警告: GoogleがCAPTCHAを表示しています")
-                print("ブラウザウィンドウでCAPTCHAを手動で解決してください...")
-                print("解決後、30秒間待機します...\n")
-                time.sleep(30)
-                html_content = page.content()
-            
-            # 広告要素を探す
-            print("広告要素を検索中...")
-            
-            # より包括的なセレクタで広告を検索
-            # Googleの広告表示パターンは複数あるため、様々な方法で試す
-            
-            # 方法1: 「スポンサー」または「広告」テキストを含む要素から親要素を取得
-            sponsor_labels = page.locator('span:has-text("スポンサー"), span:has-text("広告"), span:has-text("Sponsored"), span:has-text("Ad")').all()
-            print(f"見つかったスポンサーラベル数: {len(sponsor_labels)}")
-            
-            # 方法2: 既知の広告コンテナセレクタ
-            ad_blocks = page.locator('div.uEierd, div.Cu4Edb, div.v5yQqb, div[data-text-ad], li.ads-ad').all()
-            print(f"見つかった広告ブロック数（セレクタ）: {len(ad_blocks)}")
-            
-            # 方法3: aria-labelで広告を探す
-            aria_ad_blocks = page.locator('[aria-label*="広告"], [aria-label*="Ad"], [aria-label*="スポンサー"]').all()
-            print(f"見つかった広告ブロック数（aria-label）: {len(aria_ad_blocks)}")
-            
-            # スポンサーラベルから親要素を取得して広告ブロックを特定
-            ad_blocks_from_labels = []
-            for label in sponsor_labels:
-                try:
-                    # 親要素を複数レベル上がって広告ブロックを探す
-                    parent = label.locator('xpath=ancestor::div[contains(@class, "uEierd") or contains(@class, "Cu4Edb")]').first
-                    ad_blocks_from_labels.append(parent)
-                except:
-                    pass
-            
-            print(f"スポンサーラベルから取得した広告ブロック数: {len(ad_blocks_from_labels)}")
-            
-            # すべての広告ブロックを統合
-            raw_ad_blocks = ad_blocks + ad_blocks_from_labels + aria_ad_blocks
-            print(f"合計広告ブロック数: {len(raw_ad_blocks)}")
-
-            unique_ad_blocks = []
-            seen_block_html = set()
-            for block in raw_ad_blocks:
-                try:
-                    signature = block.evaluate("el => el.outerHTML")
-                    if not signature:
-                        continue
-                    signature = signature.strip()
-                except Exception:
-                    continue
-                if signature in seen_block_html:
-                    continue
-                seen_block_html.add(signature)
-                unique_ad_blocks.append(block)
-            print(f"ユニーク広告ブロック数: {len(unique_ad_blocks)}")
-            
-            for idx, ad_block in enumerate(unique_ad_blocks):
-                try:
-                    # 広告の見出しを抽出（複数のセレクタを試す）
-                    headline_selectors = [
-                        'div[role="heading"]',
-                        'div.v5yQqb',
-                        'div.CCgQ5',
-                        'span',
-                        'a > div > div > span',
-                    ]
-                    
-                    headline = ""
-                    for selector in headline_selectors:
-                        try:
-                            headline_elem = ad_block.locator(selector).first
-                            if headline_elem.is_visible():
-                                headline = headline_elem.inner_text()
-                                if headline and len(headline) > 5:  # 有効な見出しかチェック
-                                    break
-                        except:
-                            continue
-                    
-                    # URLを抽出
-                    url = ""
+                if interactive:
+                    print("ブラウザウィンドウでCAPTCHAを手動で解決してください...")
+                    print(f"検索結果が表示されるまで最大{CAPTCHA_WAIT_TIMEOUT_MS // 1000}秒待機します...\n")
                     try:
-                        url_elem = ad_block.locator('a').first
-                        url = url_elem.get_attribute('href') or ""
-                    except:
-                        pass
-                    
-                    # 説明文を抽出
-                    description = ""
-                    try:
-                        desc_elem = ad_block.locator('div.MUxGbd').first
-                        if desc_elem.is_visible():
-                            description = desc_elem.inner_text()
-                    except:
-                        pass
-                    
-                    if headline:
-                        ads_data.append({
-                            'headline': headline.strip(),
-                            'url': (url or "").strip(),
-                            'description': (description or "").strip()
-                        })
-                
-                except Exception as e:
-                    print(f"広告ブロック {idx + 1} の処理中にエラー: {e}")
-                    continue
+                        page.wait_for_selector(RESULT_CONTAINER_SELECTOR, timeout=CAPTCHA_WAIT_TIMEOUT_MS)
+                    except TimeoutError:
+                        print("CAPTCHAが解決されないまま待機時間を過ぎました")
+                    html_content = page.content()
+                else:
+                    print("バッチモードのため待機せずに続行します（手動で解決する場合は --interactive を指定）\n")
+            
+            # 広告ブロックの収集・重複除去・見出し等の取得をブラウザ内で1回で行う
+            print("広告要素を検索中...")
+            ads_data = extract_ads_in_page(page)
             
             # スクリーンショットを保存
-            screenshot_path = OUTPUT_DIR / "search_result.png"
+            screenshot_path = output_dir / "search_result.png"
             page.screenshot(path=str(screenshot_path), full_page=True)
             print(f"スクリーンショットを保存: {screenshot_path}")
             
             # デバッグ用: HTMLを保存
-            html_path = OUTPUT_DIR / "page_source.html"
+            html_path = output_dir / "page_source.html"
             with open(html_path, 'w', encoding='utf-8') as f:
                 f.write(page.content())
             print(f"ページHTMLを保存: {html_path}")
             
             # ブラウザを開いたまま待機（手動確認用）
-            print("\n結果を確認するため、ブラウザを10秒間開いたままにします...")
-            time.sleep(10)
+            if interactive:
+                print(f"\n結果を確認するため、ブラウザを{INTERACTIVE_LINGER_SECONDS}秒間開いたままにします...")
+                time.sleep(INTERACTIVE_LINGER_SECONDS)
             
         except Exception as e:
             print(f"エラーが発生しました: {e}")
             import traceback
             traceback.print_exc()
-        
-        finally:
-            browser.close()
     
     print(f"候補広告総数: {len(ads_data)}")
 
-    unique_ads = []
-    seen_ads = set()
-    for ad in ads_data:
-        key = (ad['headline'], ad['url'], ad['description'])
-        if key in seen_ads:
-            print(f"重複広告をスキップ: {ad['headline']}")
-            continue
-        seen_ads.add(key)
-        ad_with_index = ad.copy()
-        ad_with_index['index'] = len(unique_ads) + 1
-        unique_ads.append(ad_with_index)
-        print(f"広告 {ad_with_index['index']}: {ad_with_index['headline']}")
-
-    if not unique_ads and ads_data:
-        print("ユニーク抽出で全件除外されたため、見出し単位で整理し直します")
-        unique_ads = []
-        seen_headlines = set()
-        for ad in ads_data:
-            headline = ad['headline']
-            if headline in seen_headlines:
-                continue
-            seen_headlines.add(headline)
-            ad_with_index = ad.copy()
-            ad_with_index['index'] = len(unique_ads) + 1
-            unique_ads.append(ad_with_index)
-            print(f"広告 {ad_with_index['index']}: {headline}")
+    return serp_parser.dedupe_ads(ads_data)
 
-    return unique_ads
-
-def save_to_markdown(ads_data, keyword: str = DEFAULT_KEYWORD):
+def save_to_markdown(ads_data, keyword: str = DEFAULT_KEYWORD, keyword_slug: Optional[str] = None):
     """
     抽出した広告データをMarkdownファイルに保存
     """
-    md_path = OUTPUT_DIR / "sponsored_ads.md"
+    md_path = _ensure_output_dir(keyword_slug) / "sponsored_ads.md"
     
     with open(md_path, 'w', encoding='utf-8') as f:
         f.write(f"# {keyword} - スポンサード広告見出し一覧\n\n")
@@ -245,12 +229,23 @@ def save_to_markdown(ads_data, keyword: str = DEFAULT_KEYWORD):
     print(f"Markdownファイルを保存: {md_path}")
     return md_path
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Google スポンサード広告抽出ツール")
+    parser.add_argument("--keyword", default=DEFAULT_KEYWORD, help="検索キーワード")
+    parser.add_argument(
+        "--interactive",
+        action="store_true",
+        help="ブラウザを表示し、CAPTCHAの手動解決と抽出後の確認のために待機します。",
+    )
+    return parser.parse_args()
+
 if __name__ == "__main__":
     print("=== Google スポンサード広告抽出ツール ===\n")
     
     # 広告を抽出
-    keyword = DEFAULT_KEYWORD
-    ads = extract_sponsored_ads(keyword)
+    args = parse_args()
+    keyword = args.keyword
+    ads = extract_sponsored_ads(keyword, interactive=args.interactive)
     
     print(f"\n抽出完了: {len(ads)}件の広告が見つかりました")
     
@@ -1,19 +1,30 @@
 """
 指定KWのオーガニック検索結果（SEO）を抽出するスクリプト
+
+既定はヘッドレスのバッチモードで、検索結果のコンテナが現れるまで待ってすぐ抽出する。
+--interactive を付けるとブラウザを表示し、確認のため抽出後もしばらく開いたままにする。
 """
+import argparse
 from pathlib import Path
 from typing import Optional
 from urllib.parse import urlencode
-from playwright.sync_api import sync_playwright, TimeoutError
 import time
 
+import browser_session
+import serp_parser
+
 BASE_DIR = Path(__file__).resolve().parent
 BASE_OUTPUT_DIR = BASE_DIR / "SearchSEO"
-BASE_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 DEFAULT_KEYWORD = "マウスピース矯正"
 RESULT_LIMIT = 4
 
+# 検索結果のコンテナ（これが現れたら抽出を始める）
+RESULT_CONTAINER_SELECTOR = "div.g, div.tF2Cxc, div.MjjYud"
+RESULT_WAIT_TIMEOUT_MS = 10000
+# 対話モードで抽出後にブラウザを開いておく秒数
+INTERACTIVE_LINGER_SECONDS = 5
+
 
 def _ensure_output_dir(keyword_slug: Optional[str] = None) -> Path:
     if keyword_slug:
@@ -28,37 +39,41 @@ def extract_organic_results(
     keyword: str = DEFAULT_KEYWORD,
     limit: int = RESULT_LIMIT,
     keyword_slug: Optional[str] = None,
+    interactive: bool = False,
+    snapshot_max_age_hours: Optional[float] = None,
 ):
     """
     指定されたキーワードでGoogle検索を行い、
     オーガニック検索結果の上位 `limit` 件を抽出する
+
+    同じキーワードの新しい page_source_seo.html があれば、ブラウザを起動せずにそれを解析する。
     """
     output_dir = _ensure_output_dir(keyword_slug)
 
+    snapshot_path = output_dir / "page_source_seo.html"
+    snapshot = serp_parser.load_fresh_snapshot(snapshot_path, keyword, snapshot_max_age_hours)
+    if snapshot is not None:
+        print(f"♻️ 保存済みの検索結果を解析します（ブラウザは起動しません）: {snapshot_path}")
+        return serp_parser.build_organic_results(serp_parser.extract_organic_candidates(snapshot, limit), limit)
+
+    # Playwright はブラウザで取得するときだけ読み込む
+    from playwright.sync_api import TimeoutError
+
     results = []
-    seen_urls = set()
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=False,
-            args=[
-                "--disable-blink-features=AutomationControlled",
-                "--disable-features=IsolateOrigins,site-per-process",
-            ],
-        )
-
-        iphone_device = p.devices.get("iPhone 12")
-        context = browser.new_context(
-            **iphone_device,
-            locale="ja-JP",
-            timezone_id="Asia/Tokyo",
-        )
 
+    # 共有セッションがあればそのブラウザに専用コンテキストを作る（無ければこの処理だけ起動する）
+    with browser_session.stage_context(
+        headless=not interactive,
+        device="iPhone 12",
+        locale="ja-JP",
+        timezone_id="Asia/Tokyo",
+    ) as context:
         page = context.new_page()
 
         try:
             print(f"検索中: {keyword}")
-            print("ページが読み込まれるまでお待ちください...")
+            if interactive:
+                print("ページが読み込まれるまでお待ちください...")
             query_params = {
                 "q": keyword,
                 "hl": "ja",
@@ -68,14 +83,12 @@ def extract_organic_results(
             search_url = "https://www.google.com/search?" + urlencode(query_params)
             page.goto(search_url, wait_until="domcontentloaded")
 
-            time.sleep(5)
-            page.evaluate("window.scrollBy(0, 800)")
-            time.sleep(2.5)
-
+            # 固定時間待つのではなく、検索結果のコンテナが現れた時点で抽出に進む
             try:
-                page.wait_for_selector("div.g, div.tF2Cxc, div.MjjYud", timeout=10000)
+                page.wait_for_selector(RESULT_CONTAINER_SELECTOR, timeout=RESULT_WAIT_TIMEOUT_MS)
             except TimeoutError:
                 print("検索結果のコンテナを取得できませんでしたが処理を続行します")
+            page.evaluate("window.scrollBy(0, 800)")
 
             extracted = page.evaluate(
                 """
@@ -138,8 +151,9 @@ def extract_organic_results(
                     const title = titleEl.textContent ? titleEl.textContent.trim() : '';
                     if (!title || title.length < 3) continue;
 
-                    const textContent = el.textContent || '';
-                    if (adPattern.test(textContent)) continue;
+                    // 広告ラベルは表示されるテキストで判定する（script/style の中身は含めない）
+                    const renderedText = el.innerText || '';
+                    if (adPattern.test(renderedText)) continue;
 
                     let snippet = '';
                     for (const selector of snippetSelectors) {
@@ -172,28 +186,7 @@ def extract_organic_results(
 
             print(f"抽出候補数 (JS): {len(extracted)}")
 
-            for entry in extracted:
-                if len(results) >= limit:
-                    break
-                url = entry.get("url", "").strip()
-                title = entry.get("title", "").strip()
-                snippet = entry.get("snippet", "").strip()
-
-                if not title or not url:
-                    continue
-                if url in seen_urls:
-                    continue
-
-                result = {
-                    "index": len(results) + 1,
-                    "title": title,
-                    "url": url,
-                    "snippet": snippet,
-                }
-
-                results.append(result)
-                seen_urls.add(url)
-                print(f"結果 {result['index']}: {title}")
+            results = serp_parser.build_organic_results(extracted, limit)
 
             screenshot_path = output_dir / "search_result_seo.png"
             page.screenshot(path=str(screenshot_path), full_page=True)
@@ -204,8 +197,9 @@ def extract_organic_results(
                 f.write(page.content())
             print(f"ページHTMLを保存: {html_path}")
 
-            print("結果を確認するため、ブラウザを5秒間開いたままにします...")
-            time.sleep(5)
+            if interactive:
+                print(f"結果を確認するため、ブラウザを{INTERACTIVE_LINGER_SECONDS}秒間開いたままにします...")
+                time.sleep(INTERACTIVE_LINGER_SECONDS)
 
         except Exception as e:
             print(f"エラーが発生しました: {e}")
@@ -213,9 +207,6 @@ def extract_organic_results(
 
             traceback.print_exc()
 
-        finally:
-            browser.close()
-
     return results
 
 
@@ -254,11 +245,23 @@ def save_to_markdown(
     return md_path
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Google オーガニック検索結果抽出ツール")
+    parser.add_argument("--keyword", default=DEFAULT_KEYWORD, help="検索キーワード")
+    parser.add_argument(
+        "--interactive",
+        action="store_true",
+        help="ブラウザを表示し、抽出後も確認のためしばらく開いたままにします。",
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
     print("=== Google オーガニック検索結果抽出ツール ===\n")
 
-    keyword = DEFAULT_KEYWORD
-    results = extract_organic_results(keyword)
+    args = parse_args()
+    keyword = args.keyword
+    results = extract_organic_results(keyword, interactive=args.interactive)
 
     print(f"\n抽出完了: {len(results)}件の結果が見つかりました")
 
@@ -0,0 +1,189 @@
+"""
+フルページスクリーンショットのタイル化（DeepZoom形式）
+
+full_page.png から以下を生成する。
+- full_page.dzi            : 画像サイズ・タイルサイズを記したDZI(XML)
+- full_page_files/<L>/<c>_<r>.jpg : 解像度レベルごとのタイル（レベル0が1x1px、最大レベルが原寸）
+- full_page_thumb.jpg      : 一覧表示用の小さなサムネイル
+
+GUI・Web UI は表示幅に合うレベルを選び、見えている範囲のタイルだけを読み込む。
+"""
+
+from __future__ import annotations
+
+import math
+import shutil
+import xml.etree.ElementTree as ET
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+TILE_SIZE = 512
+TILE_FORMAT = "jpg"
+TILE_QUALITY = 85
+THUMBNAIL_WIDTH = 360
+DZI_NAMESPACE = "http://schemas.microsoft.com/deepzoom/2008"
+
+# タイル生成はUIスレッドやOCRを止めないよう専用ワーカーで1枚ずつ行う
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pyramid")
+
+
+def dzi_path_for(image_path: Path) -> Path:
+    return image_path.with_suffix(".dzi")
+
+
+def tiles_dir_for(image_path: Path) -> Path:
+    return image_path.with_name(f"{image_path.stem}_files")
+
+
+def thumbnail_path_for(image_path: Path) -> Path:
+    return image_path.with_name(f"{image_path.stem}_thumb.jpg")
+
+
+def max_level_for(width: int, height: int) -> int:
+    return int(math.ceil(math.log2(max(width, height, 1))))
+
+
+def level_size(info: Dict[str, Any], level: int) -> Tuple[int, int]:
+    scale = 2 ** (info["max_level"] - level)
+    return (
+        max(1, int(math.ceil(info["width"] / scale))),
+        max(1, int(math.ceil(info["height"] / scale))),
+    )
+
+
+def tile_path(info: Dict[str, Any], level: int, col: int, row: int) -> Path:
+    return Path(info["tiles_dir"]) / str(level) / f"{col}_{row}.{info['format']}"
+
+
+def _to_rgb(img: Image.Image) -> Image.Image:
+    from PIL import Image
+
+    if img.mode == "RGB":
+        return img
+    if img.mode in ("RGBA", "LA", "P"):
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.split()[-1])
+        return background
+    return img.convert("RGB")
+
+
+def build_pyramid(image_path: Path, tile_size: int = TILE_SIZE) -> Dict[str, Any]:
+    """タイルピラミッドとサムネイルを生成し、読み込み用の情報を返す"""
+    image_path = Path(image_path)
+    tiles_dir = tiles_dir_for(image_path)
+    work_dir = tiles_dir.with_name(tiles_dir.name + ".tmp")
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Pillow の読み込みは最初のタイル生成まで遅らせる（ワーカースレッドで行われる）
+    from PIL import Image
+
+    with Image.open(image_path) as source:
+        current = _to_rgb(source)
+        width, height = current.size
+        max_level = max_level_for(width, height)
+
+        thumb = current.copy()
+        thumb.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_WIDTH * 40), Image.LANCZOS)
+        thumb.save(thumbnail_path_for(image_path), "JPEG", quality=TILE_QUALITY)
+
+        for level in range(max_level, -1, -1):
+            level_dir = work_dir / str(level)
+            level_dir.mkdir(parents=True, exist_ok=True)
+            level_width, level_height = current.size
+            for row in range(int(math.ceil(level_height / tile_size))):
+                for col in range(int(math.ceil(level_width / tile_size))):
+                    box = (
+                        col * tile_size,
+                        row * tile_size,
+                        min((col + 1) * tile_size, level_width),
+                        min((row + 1) * tile_size, level_height),
+                    )
+                    current.crop(box).save(
+                        level_dir / f"{col}_{row}.{TILE_FORMAT}", "JPEG", quality=TILE_QUALITY
+                    )
+            if level > 0:
+                # 2x2の平均で半分に縮小（サイズは切り上げ）
+                current = current.reduce(2)
+
+    shutil.rmtree(tiles_dir, ignore_errors=True)
+    work_dir.rename(tiles_dir)
+
+    root = ET.Element(
+        "Image",
+        {"xmlns": DZI_NAMESPACE, "TileSize": str(tile_size), "Overlap": "0", "Format": TILE_FORMAT},
+    )
+    ET.SubElement(root, "Size", {"Width": str(width), "Height": str(height)})
+    dzi_path = dzi_path_for(image_path)
+    ET.ElementTree(root).write(dzi_path, encoding="utf-8", xml_declaration=True)
+
+    return load_pyramid(dzi_path)
+
+
+def load_pyramid(dzi_path: Path) -> Optional[Dict[str, Any]]:
+    """DZIファイルを読み込み、タイル参照に必要な情報を返す（未生成なら None）"""
+    dzi_path = Path(dzi_path)
+    if not dzi_path.exists():
+        return None
+    try:
+        root = ET.parse(dzi_path).getroot()
+    except (OSError, ET.ParseError):
+        return None
+    size = root.find(f"{{{DZI_NAMESPACE}}}Size")
+    if size is None:
+        return None
+    width = int(size.get("Width"))
+    height = int(size.get("Height"))
+    image_path = dzi_path.with_suffix(".png")
+    return {
+        "dzi": str(dzi_path),
+        "tiles_dir": str(tiles_dir_for(image_path)),
+        "thumbnail": str(thumbnail_path_for(image_path)),
+        "width": width,
+        "height": height,
+        "tile_size": int(root.get("TileSize", TILE_SIZE)),
+        "format": root.get("Format", TILE_FORMAT),
+        "max_level": max_level_for(width, height),
+    }
+
+
+def submit_pyramid(image_path: Path) -> Future:
+    """ワーカーでピラミッドを生成する。結果は Future.result() で受け取る"""
+    return _executor.submit(build_pyramid, Path(image_path))
+
+
+def ensure_pyramid(image_path: Path) -> Future:
+    """生成済みならその情報を、未生成ならワーカーでの生成結果を返す Future"""
+    info = load_pyramid(dzi_path_for(Path(image_path)))
+    if info is not None:
+        future: Future = Future()
+        future.set_result(info)
+        return future
+    return submit_pyramid(image_path)
+
+
+def choose_level(info: Dict[str, Any], display_width: int) -> int:
+    """表示幅以上の解像度を持つ最小のレベルを選ぶ"""
+    for level in range(info["max_level"] + 1):
+        if level_size(info, level)[0] >= display_width:
+            return level
+    return info["max_level"]
+
+
+def visible_tiles(
+    info: Dict[str, Any],
+    level: int,
+    top: float,
+    bottom: float,
+) -> List[Tuple[int, int]]:
+    """レベル座標系で top〜bottom の範囲に掛かるタイル (col, row) を返す"""
+    level_width, level_height = level_size(info, level)
+    tile_size = info["tile_size"]
+    first_row = max(0, int(top // tile_size))
+    last_row = min(int(math.ceil(level_height / tile_size)) - 1, int(bottom // tile_size))
+    cols = int(math.ceil(level_width / tile_size))
+    return [(col, row) for row in range(first_row, last_row + 1) for col in range(cols)]
@@ -1,20 +1,77 @@
 import argparse
+import contextlib
+import json
 import os
+import queue
 import re
 import sys
+import threading
+import time
 import unicodedata
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
-
-import google.generativeai as genai
+from typing import Any, Callable, Dict, List, Optional
 
+import blob_store
 import transcribe_website
 import summarize_analyses
 import extract_seo
+import extract_ads
+import browser_session
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 
+# 段ごとの並列数と、段の間のキューの上限（上限に達すると前段が待つ）
+CAPTURE_WORKERS_DEFAULT = 2
+OCR_WORKERS_DEFAULT = 2
+ANALYSIS_WORKERS_DEFAULT = 2
+STAGE_QUEUE_SIZE_DEFAULT = 2
+
+ANALYSIS_TEMPERATURE = 0.2
+# 分析プロンプトに入れる文字起こしの上限（推定トークン数, 0 で無制限）
+ANALYSIS_TOKEN_BUDGET_DEFAULT = int(os.getenv("ANALYSIS_TOKEN_BUDGET", "12000"))
+# website_transcription.md のうち「整理済みテキスト」と内容が重複するセクション
+TRANSCRIPT_DUPLICATE_SECTIONS = ("## Playwright抽出テキスト", "## OCRセグメント詳細")
+TRANSCRIPT_CLEAN_SECTION = "## 整理済みテキスト"
+TRUNCATION_NOTE = "…（以下省略）"
+HEADING_MAX_CHARS = 60
+
+# パイプライン実行ごとのチェックポイント（URL別の完了段と成果物）
+CHECKPOINT_DIRNAME = "pipeline_runs"
+CHECKPOINT_VERSION = 1
+
+# --events jsonl で標準出力に流すイベントの形式（人向けのログは標準エラーへ）
+EVENT_FORMATS = ("jsonl",)
+CANCELLED_MESSAGE = "キャンセルされました"
+
+_STAGE_DONE = object()
+_print_lock = threading.Lock()
+_checkpoint_lock = threading.Lock()
+
+EventCallback = Callable[..., None]
+
+
+class PipelineError(Exception):
+    """処理対象のURLが無いなど、パイプラインを続行できない場合のエラー"""
+
+
+def _ignore_event(event: str, **fields: Any) -> None:
+    return None
+
+
+def make_jsonl_emitter(stream) -> EventCallback:
+    """emit(event, **fields) を1行1イベントのJSONとして stream に書き出す関数を返す"""
+    lock = threading.Lock()
+
+    def emit(event: str, **fields: Any) -> None:
+        record = {"event": event, "time": datetime.now().isoformat(timespec="milliseconds"), **fields}
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with lock:
+            stream.write(line + "\n")
+            stream.flush()
+
+    return emit
+
 
 def slugify(text: str) -> str:
     normalized = unicodedata.normalize("NFKC", text)
@@ -28,18 +85,26 @@ def run_transcription(
     slice_height: int,
     overlap: int,
     keyword_slug: Optional[str] = None,
+    incremental: bool = False,
 ) -> Path:
     transcribe_website.ensure_ocr_ready()
 
-    result = transcribe_website.transcribe_website(
+    capture = transcribe_website.capture_website(
         url=url,
         slice_height=slice_height,
         overlap=overlap,
         keyword_slug=keyword_slug,
     )
+    return finish_transcription(capture, incremental=incremental)
+
+
+def finish_transcription(capture: Dict[str, Any], incremental: bool = False) -> Path:
+    """取得済みのスクリーンショットをOCRし、Markdown などの出力を保存する"""
+    result = transcribe_website.transcribe_capture(capture, incremental=incremental)
 
     md_path = transcribe_website.save_markdown(result)
     transcribe_website.save_plain_text(result)
+    transcribe_website.save_metrics(result)
     transcribe_website.cleanup_segment_images(result)
     transcribe_website.update_latest_symlink(
         result["run_dir"],
@@ -49,11 +114,85 @@ def run_transcription(
     return md_path
 
 
+def compact_transcript(markdown_text: str) -> str:
+    """整理済みテキストがあれば、それと重複する抽出テキスト・セグメント詳細を落とす"""
+    if f"\n{TRANSCRIPT_CLEAN_SECTION}\n" not in markdown_text:
+        return markdown_text
+    cut_at = len(markdown_text)
+    for heading in TRANSCRIPT_DUPLICATE_SECTIONS:
+        position = markdown_text.find(f"\n{heading}\n")
+        if position != -1:
+            cut_at = min(cut_at, position)
+    return markdown_text[:cut_at].rstrip()
+
+
+def _split_sections(text: str) -> List[List[str]]:
+    """見出し行ごとに [見出し, 本文] に分ける（先頭の見出し無し部分は見出しを空にする）
+
+    OCR整形で見出しと本文が1行に連結されることがあるため、長い見出し行は先頭だけを見出しとする。
+    """
+    sections: List[List[str]] = [["", ""]]
+    for line in text.splitlines(keepends=True):
+        if line.startswith("#"):
+            if len(line) > HEADING_MAX_CHARS:
+                sections.append([line[:HEADING_MAX_CHARS] + "\n", line[HEADING_MAX_CHARS:]])
+            else:
+                sections.append([line, ""])
+        else:
+            sections[-1][1] += line
+    return [section for section in sections if section[0] or section[1]]
+
+
+def _truncate_body(body: str, limit: int) -> str:
+    if len(body) <= limit:
+        return body
+    cut = body.rfind("\n", 0, limit)
+    if cut < limit // 2:
+        cut = limit
+    return body[:cut].rstrip() + f"\n{TRUNCATION_NOTE}\n\n"
+
+
+def fit_to_token_budget(text: str, token_budget: int) -> tuple[str, int]:
+    """見出しをすべて残したまま、各セクションの本文を均等に削って予算に収める
+
+    短いセクションは全文を残し、余った分を長いセクションに回す。
+    戻り値は (本文, 切り詰めたセクション数)。
+    """
+    if token_budget <= 0 or summarize_analyses.estimate_tokens(text) <= token_budget:
+        return text, 0
+
+    sections = _split_sections(text)
+    available = int(token_budget * summarize_analyses.CHARS_PER_TOKEN) - sum(
+        len(heading) + len(TRUNCATION_NOTE) + 3 for heading, _ in sections
+    )
+    allowances: Dict[int, int] = {}
+    remaining = max(0, available)
+    by_size = sorted(range(len(sections)), key=lambda idx: len(sections[idx][1]))
+    for position, idx in enumerate(by_size):
+        share = remaining // (len(sections) - position)
+        allowances[idx] = min(len(sections[idx][1]), share)
+        remaining -= allowances[idx]
+
+    parts = []
+    truncated = 0
+    for idx, (heading, body) in enumerate(sections):
+        if len(body) > allowances[idx]:
+            truncated += 1
+        parts.append(heading + _truncate_body(body, allowances[idx]))
+    fitted = "".join(parts).rstrip()
+    # 見出しだけで予算を超える場合は末尾から切る
+    max_chars = int(token_budget * summarize_analyses.CHARS_PER_TOKEN)
+    if len(fitted) > max_chars:
+        fitted = _truncate_body(fitted, max_chars - len(TRUNCATION_NOTE) - 3).rstrip()
+    return fitted, truncated
+
+
 def generate_analysis_request(
     prompt_file: Path,
     transcript_path: Path,
     keyword: str,
     conversion_goal: str,
+    token_budget: int = ANALYSIS_TOKEN_BUDGET_DEFAULT,
 ) -> Path:
     if not prompt_file.exists():
         raise FileNotFoundError(f"prompt file not found: {prompt_file}")
@@ -61,7 +200,17 @@ def generate_analysis_request(
         raise FileNotFoundError(f"transcript file not found: {transcript_path}")
 
     template = prompt_file.read_text(encoding="utf-8")
-    transcript_text = transcript_path.read_text(encoding="utf-8").strip()
+    full_text = transcript_path.read_text(encoding="utf-8").strip()
+    compact_text = compact_transcript(full_text)
+    transcript_text, truncated = fit_to_token_budget(compact_text, token_budget)
+
+    estimate = summarize_analyses.estimate_tokens
+    note = f" / {truncated} セクションを切り詰め" if truncated else ""
+    with _print_lock:
+        print(
+            f"📉 分析用の文字起こし: 推定 {estimate(full_text)} → 重複除去 {estimate(compact_text)}"
+            f" → {estimate(transcript_text)} tokens{note} ({transcript_path.parent.name})"
+        )
 
     filled = (
         template.replace("{{KEYWORD}}", keyword)
@@ -71,10 +220,11 @@ def generate_analysis_request(
 
     output_path = transcript_path.parent / "analysis_request.md"
     output_path.write_text(filled, encoding="utf-8")
+    transcribe_website.record_run_output(transcript_path.parent, "analysis_request", output_path)
     return output_path
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description=(
             "URL の文字起こしを実行し、マーケティング分析プロンプトの生成と Gemini による分析を行います。"
@@ -87,11 +237,10 @@ def parse_args() -> argparse.Namespace:
         type=Path,
         help="URL の一覧を記載したファイル。各行または `URL:` 行に含まれるリンクを対象にします。",
     )
-    parser.add_argument("--keyword", required=True, help="検索キーワード")
+    parser.add_argument("--keyword", help="検索キーワード（--resume 時はチェックポイントの値を使用）")
     parser.add_argument(
         "--conversion-goal",
-        required=True,
-        help="想定しているコンバージョン（例: 無料相談予約）",
+        help="想定しているコンバージョン（例: 無料相談予約。--resume 時はチェックポイントの値を使用）",
     )
     parser.add_argument(
         "--slice-height",
@@ -116,11 +265,60 @@ def parse_args() -> argparse.Namespace:
         default="models/gemini-2.5-flash",
         help="分析に使用する Gemini モデル ID",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="前回の文字起こし結果と比較し、変化したセグメントだけOCRします。",
+    )
+    parser.add_argument(
+        "--capture-workers",
+        type=int,
+        default=CAPTURE_WORKERS_DEFAULT,
+        help=f"ページ取得（ブラウザ）を同時に行う数 (既定: {CAPTURE_WORKERS_DEFAULT})",
+    )
+    parser.add_argument(
+        "--ocr-workers",
+        type=int,
+        default=OCR_WORKERS_DEFAULT,
+        help=f"OCRとプロンプト生成を同時に行う数 (既定: {OCR_WORKERS_DEFAULT})",
+    )
+    parser.add_argument(
+        "--analysis-workers",
+        type=int,
+        default=ANALYSIS_WORKERS_DEFAULT,
+        help=f"Gemini 分析を同時に行う数 (既定: {ANALYSIS_WORKERS_DEFAULT})",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=STAGE_QUEUE_SIZE_DEFAULT,
+        help=f"段の間で待機できるURL数の上限 (既定: {STAGE_QUEUE_SIZE_DEFAULT})",
+    )
+    parser.add_argument(
+        "--resume",
+        nargs="?",
+        const="latest",
+        default=None,
+        metavar="CHECKPOINT",
+        help=(
+            "中断したパイプライン実行を再開します。完了済みの段は再利用し、失敗・未実行の段だけ実行します。"
+            "チェックポイントのパスを省略した場合は同じキーワードの最新のものを使います。"
+        ),
+    )
     parser.add_argument(
         "--skip-gemini",
         action="store_true",
         help="Gemini による分析実行をスキップし、analysis_request.md の生成までで終了します。",
     )
+    parser.add_argument(
+        "--analysis-token-budget",
+        type=int,
+        default=ANALYSIS_TOKEN_BUDGET_DEFAULT,
+        help=(
+            "分析プロンプトに入れる文字起こしの上限（推定トークン数）。超える場合は見出しを残して"
+            f"各セクションを均等に切り詰めます。0 で無制限 (既定: {ANALYSIS_TOKEN_BUDGET_DEFAULT})"
+        ),
+    )
     parser.add_argument(
         "--summary-prompt-file",
         type=Path,
@@ -133,6 +331,12 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="統合レポートの出力先。未指定の場合は runs-dir 配下に timestamp 付きで作成",
     )
+    parser.add_argument(
+        "--summary-mode",
+        choices=summarize_analyses.SUMMARY_MODES,
+        default=summarize_analyses.SUMMARY_MODE_DEFAULT,
+        help="統合レポートの作り方（single: 全文を1回で統合 / mapreduce: 要約→グループ統合→最終統合 / auto: 分量で切替）",
+    )
     parser.add_argument(
         "--skip-summary",
         action="store_true",
@@ -143,20 +347,53 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="指定キーワードのSEO上位サイトを自動抽出し、分析対象に追加します。",
     )
+    parser.add_argument(
+        "--use-ads",
+        action="store_true",
+        help="指定キーワードのスポンサー広告のリンク先を抽出し、分析対象に追加します。",
+    )
+    parser.add_argument(
+        "--interactive",
+        action="store_true",
+        help="SEO・広告抽出でブラウザを表示し、CAPTCHAの手動解決や確認のための待機を行います。",
+    )
+    parser.add_argument(
+        "--refresh-serp",
+        action="store_true",
+        help="保存済みの検索結果HTMLが新しくても使わず、Google から取得し直します。",
+    )
     parser.add_argument(
         "--seo-limit",
         type=int,
         default=extract_seo.RESULT_LIMIT,
         help=f"SEO抽出で処理する最大件数 (既定: {extract_seo.RESULT_LIMIT})",
     )
+    parser.add_argument(
+        "--events",
+        choices=EVENT_FORMATS,
+        default=None,
+        help=(
+            "進捗をイベントとして標準出力に書き出します（jsonl: 1行1JSON）。"
+            "このとき人向けのログは標準エラーに出力します。"
+        ),
+    )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     if args.seo_limit <= 0:
         parser.error("--seo-limit には1以上の値を指定してください。")
+    for option in ("capture_workers", "ocr_workers", "analysis_workers", "queue_size"):
+        if getattr(args, option) <= 0:
+            parser.error(f"--{option.replace('_', '-')} には1以上の値を指定してください。")
 
-    if not args.url and not args.url_list and not args.use_seo:
-        parser.error("--url / --url-list / --use-seo のいずれかは指定が必要です。")
+    if not args.url and not args.url_list and not args.use_seo and not args.use_ads and not args.resume:
+        parser.error("--url / --url-list / --use-seo / --use-ads / --resume のいずれかは指定が必要です。")
+    if not args.resume:
+        for option in ("keyword", "conversion_goal"):
+            if not getattr(args, option):
+                parser.error(f"--{option.replace('_', '-')} の指定が必要です。")
+    elif args.resume == "latest" and not args.keyword:
+        parser.error("--resume でチェックポイントのパスを省略する場合は --keyword の指定が必要です。")
 
     if not args.prompt_file.is_absolute():
         args.prompt_file = (SCRIPT_DIR / args.prompt_file).resolve()
@@ -169,23 +406,55 @@ def parse_args() -> argparse.Namespace:
 def run_gemini_analysis(
     analysis_prompt_path: Path,
     model_name: str,
+    call_log: Optional[List[Dict[str, Any]]] = None,
+    cache_stats: Optional[Dict[str, int]] = None,
 ) -> Path:
+    """analysis_request.md を Gemini で分析する
+
+    プロンプト全文・モデル・temperature が同じ過去の結果があれば、Gemini を呼ばずにそれを書き出す。
+    cache_stats を渡すとキャッシュの hits / misses を数える。
+    """
     if not analysis_prompt_path.exists():
         raise FileNotFoundError(f"analysis prompt not found: {analysis_prompt_path}")
 
+    prompt_text = analysis_prompt_path.read_text(encoding="utf-8")
+    output_path = analysis_prompt_path.parent / "analysis_result_gemini.md"
+    cache_key = blob_store.analysis_cache_key(prompt_text, model_name, ANALYSIS_TEMPERATURE)
+    cached = blob_store.load_analysis_cache(transcribe_website.ARTIFACT_STORE_DIR, cache_key)
+    if cached and cached.get("result_text"):
+        if cache_stats is not None:
+            cache_stats["hits"] = cache_stats.get("hits", 0) + 1
+        output_path.write_text(cached["result_text"], encoding="utf-8")
+        transcribe_website.record_run_output(analysis_prompt_path.parent, "analysis_result", output_path)
+        return output_path
+    if cache_stats is not None:
+        cache_stats["misses"] = cache_stats.get("misses", 0) + 1
+
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise RuntimeError("環境変数 GOOGLE_API_KEY が設定されていません。")
 
-    genai.configure(api_key=api_key)
+    import google.generativeai as genai
 
-    prompt_text = analysis_prompt_path.read_text(encoding="utf-8")
+    genai.configure(api_key=api_key)
 
     model = genai.GenerativeModel(model_name)
-    response = model.generate_content(
-        prompt_text,
-        generation_config={"temperature": 0.2},
-    )
+    started_at = time.perf_counter()
+    try:
+        response = model.generate_content(
+            prompt_text,
+            generation_config={"temperature": ANALYSIS_TEMPERATURE},
+        )
+    except Exception as error:
+        if call_log is not None:
+            call_log.append(
+                transcribe_website.build_gemini_call_record("analysis", model_name, None, started_at, error=error)
+            )
+        raise
+    if call_log is not None:
+        call_log.append(
+            transcribe_website.build_gemini_call_record("analysis", model_name, response, started_at)
+        )
 
     result_text = (
         transcribe_website.extract_text_from_genai_response(response).strip()
@@ -196,11 +465,64 @@ def run_gemini_analysis(
     if not result_text:
         raise RuntimeError("Gemini から有効なテキスト応答が得られませんでした。")
 
-    output_path = analysis_prompt_path.parent / "analysis_result_gemini.md"
     output_path.write_text(result_text, encoding="utf-8")
+    blob_store.save_analysis_cache(transcribe_website.ARTIFACT_STORE_DIR, cache_key, model_name, result_text)
+    transcribe_website.record_run_output(analysis_prompt_path.parent, "analysis_result", output_path)
     return output_path
 
 
+def save_pipeline_metrics(
+    keyword_slug: str,
+    overall_results: List[Dict[str, Any]],
+    pipeline_calls: List[Dict[str, Any]],
+    started_at: float,
+    stage_seconds: Optional[Dict[str, float]] = None,
+) -> Optional[Path]:
+    """パイプライン実行全体のGemini利用量をURL別・合計で保存する"""
+    totals = transcribe_website.summarize_gemini_calls(pipeline_calls)
+    cache_flags = [r.get("analysis_cache_hit") for r in overall_results if r.get("analysis_cache_hit") is not None]
+    analysis_cache = {"hits": sum(cache_flags), "misses": len(cache_flags) - sum(cache_flags)}
+    wall_time = round(time.perf_counter() - started_at, 3)
+    metrics = {
+        "keyword_slug": keyword_slug,
+        "generated_at": datetime.now().isoformat(),
+        "wall_time_seconds": wall_time,
+        "stage_seconds": {key: round(value, 3) for key, value in (stage_seconds or {}).items()},
+        "urls": [
+            {
+                "url": result["url"],
+                "success": result.get("success", False),
+                "analysis_cache_hit": result.get("analysis_cache_hit"),
+                "usage": result.get("usage"),
+            }
+            for result in overall_results
+        ],
+        "totals": totals,
+        "analysis_cache": analysis_cache,
+    }
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    metrics_path = transcribe_website.get_output_root(keyword_slug) / f"pipeline_metrics_{timestamp}.json"
+    try:
+        metrics_path.write_text(json.dumps(metrics, ensure_ascii=False, indent=2), encoding="utf-8")
+    except OSError as error:
+        print(f"⚠️ パイプラインの利用量メトリクス保存に失敗しました: {error}", file=sys.stderr)
+        return None
+
+    print("Gemini 利用量 (パイプライン合計):")
+    print(f"   - calls: {totals['calls']} (errors: {totals['errors']})")
+    print(f"   - 入力 tokens: {totals['prompt_tokens']} / 出力 tokens: {totals['output_tokens']}")
+    if totals.get("estimated_cost_usd") is not None:
+        print(f"   - 推定コスト: ${totals['estimated_cost_usd']}")
+    if cache_flags:
+        print(f"   - 分析キャッシュ: hit {analysis_cache['hits']} / miss {analysis_cache['misses']}")
+    if stage_seconds:
+        busy = " / ".join(f"{key} {value:.1f}s" for key, value in stage_seconds.items())
+        print(f"   - 段別の処理時間合計: {busy} (全体 {wall_time:.1f}s)")
+    print(f"   - 保存先: {metrics_path}")
+    return metrics_path
+
+
 def extract_urls_from_file(url_file: Path) -> list[str]:
     import re
 
@@ -216,11 +538,469 @@ def extract_urls_from_file(url_file: Path) -> list[str]:
     return urls
 
 
-def main() -> None:
-    args = parse_args()
+def checkpoint_dir(keyword_slug: str) -> Path:
+    return transcribe_website.get_output_root(keyword_slug) / CHECKPOINT_DIRNAME
+
+
+def new_checkpoint(
+    args: argparse.Namespace,
+    keyword_slug: str,
+    urls: List[str],
+    url_metadata: Dict[str, Dict[str, str]],
+) -> tuple[Path, Dict[str, Any]]:
+    timestamp = datetime.now()
+    path = checkpoint_dir(keyword_slug) / f"pipeline_{timestamp.strftime('%Y%m%d_%H%M%S')}.json"
+    checkpoint = {
+        "version": CHECKPOINT_VERSION,
+        "keyword": args.keyword,
+        "keyword_slug": keyword_slug,
+        "conversion_goal": args.conversion_goal,
+        "url_list": str(args.url_list) if args.url_list else None,
+        "created_at": timestamp.isoformat(),
+        "updated_at": timestamp.isoformat(),
+        "status": "running",
+        "urls": [
+            {"url": url, "meta": url_metadata.get(url, {}), "stages": {}}
+            for url in urls
+        ],
+        "summary": None,
+    }
+    save_checkpoint(path, checkpoint)
+    return path, checkpoint
+
+
+def save_checkpoint(path: Path, checkpoint: Dict[str, Any]) -> None:
+    """途中で落ちても壊れないよう一時ファイル経由で置き換える"""
+    with _checkpoint_lock:
+        checkpoint["updated_at"] = datetime.now().isoformat()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(checkpoint, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        checkpoint = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        return None
+    return checkpoint
+
+
+def find_latest_checkpoint(keyword_slug: str) -> Optional[Path]:
+    """未完了のものを優先して、最新のチェックポイントを返す"""
+    candidates = sorted(checkpoint_dir(keyword_slug).glob("pipeline_*.json"), reverse=True)
+    for path in candidates:
+        checkpoint = load_checkpoint(path)
+        if checkpoint is not None and checkpoint.get("status") != "completed":
+            return path
+    return candidates[0] if candidates else None
+
+
+def resume_args(args: argparse.Namespace, checkpoint: Dict[str, Any]) -> argparse.Namespace:
+    """キーワードとCV目標をチェックポイントの値に揃えた引数（指定値と食い違う場合は PipelineError）"""
+    resumed = argparse.Namespace(**vars(args))
+    for option, label in (("keyword", "--keyword"), ("conversion_goal", "--conversion-goal")):
+        recorded = checkpoint.get(option)
+        given = getattr(args, option)
+        if given and recorded and given != recorded:
+            raise PipelineError(
+                f"{label} ({given}) がチェックポイントの値 ({recorded}) と異なります。"
+                " 指定を外すか、チェックポイントと同じ値を指定してください。"
+            )
+        if not recorded and not given:
+            raise PipelineError(f"チェックポイントに {option} が記録されていません。{label} を指定してください。")
+        setattr(resumed, option, recorded or given)
+    return resumed
+
+
+def mark_stage(
+    path: Optional[Path],
+    checkpoint: Optional[Dict[str, Any]],
+    index: int,
+    stage: str,
+    status: str,
+    **fields: Any,
+) -> None:
+    if checkpoint is None or path is None:
+        return
+    with _checkpoint_lock:
+        checkpoint["urls"][index]["stages"][stage] = {
+            "status": status,
+            "finished_at": datetime.now().isoformat(),
+            **{key: str(value) if isinstance(value, Path) else value for key, value in fields.items()},
+        }
+    save_checkpoint(path, checkpoint)
+
+
+def completed_artifact(
+    checkpoint: Optional[Dict[str, Any]],
+    index: int,
+    stage: str,
+    key: str,
+) -> Optional[Path]:
+    """チェックポイント上で完了済み、かつ成果物が残っていればそのパスを返す"""
+    if checkpoint is None:
+        return None
+    record = checkpoint["urls"][index]["stages"].get(stage) or {}
+    if record.get("status") != "done" or not record.get(key):
+        return None
+    artifact = Path(record[key])
+    return artifact if artifact.exists() else None
+
+
+def source_label(source: Optional[str]) -> str:
+    if source == "seo":
+        return "SEO抽出"
+    if source == "ads":
+        return "広告抽出"
+    return "指定URL"
+
+
+def failure_record(job: Dict[str, Any], message: str) -> Dict[str, Any]:
+    meta = job["meta"]
+    return {
+        "url": job["url"],
+        "source": meta.get("source", "manual"),
+        "title": meta.get("title"),
+        "snippet": meta.get("snippet"),
+        "success": False,
+        "error": message,
+    }
+
+
+def start_stage(
+    name: str,
+    worker_count: int,
+    inbox: "queue.Queue",
+    outbox: Optional["queue.Queue"],
+    handle,
+    on_exit=None,
+) -> List[threading.Thread]:
+    """inbox のジョブを handle で処理し、戻り値があれば outbox へ渡すワーカー群を起動する
+
+    on_exit はワーカーが終了する直前に、そのワーカーのスレッドで呼ばれる。
+    """
+
+    def worker() -> None:
+        while True:
+            job = inbox.get()
+            if job is _STAGE_DONE:
+                # 同じ段の他のワーカーにも終了を伝える
+                inbox.put(_STAGE_DONE)
+                if on_exit is not None:
+                    on_exit()
+                return
+            try:
+                next_job = handle(job)
+            except Exception as error:
+                # 想定外のエラーでもワーカーを止めず、後続のURLを処理し続ける
+                with _print_lock:
+                    print(f"❌ {name} 段で予期しないエラーが発生しました ({job.get('url')}): {error}", file=sys.stderr)
+                continue
+            if next_job is not None and outbox is not None:
+                outbox.put(next_job)
+
+    threads = [
+        threading.Thread(target=worker, name=f"{name}-{number}", daemon=True)
+        for number in range(1, worker_count + 1)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run_pipeline_stages(
+    urls: List[str],
+    url_metadata: Dict[str, Dict[str, str]],
+    args: argparse.Namespace,
+    keyword_slug: str,
+    checkpoint_path: Optional[Path] = None,
+    checkpoint: Optional[Dict[str, Any]] = None,
+    emit: Optional[EventCallback] = None,
+    cancel_event: Optional[threading.Event] = None,
+) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, float]]:
+    """取得 → OCR/プロンプト生成 → Gemini 分析 を段ごとのワーカーで流れ作業として実行する
+
+    段の間は上限付きキューでつなぎ、後段が詰まったら前段が待つ。
+    チェックポイントで完了済みの段は成果物を再利用して飛ばす。
+    cancel_event がセットされると、各段は次のジョブから処理せずにキャンセル扱いにする
+    （実行中のページ取得・Gemini 呼び出しは終わるまで待つ）。
+    結果はURLの指定順に並べて返す。
+    """
+    transcribe_website.ensure_ocr_ready()
+
+    emit = emit or _ignore_event
+    total = len(urls)
+    records: List[Optional[Dict[str, Any]]] = [None] * total
+    pipeline_calls: List[Dict[str, Any]] = []
+    stage_seconds = {"capture": 0.0, "ocr": 0.0, "analysis": 0.0}
+    state_lock = threading.Lock()
+
+    def cancelled() -> bool:
+        return cancel_event is not None and cancel_event.is_set()
+
+    def stage_started(job: Dict[str, Any], stage: str) -> None:
+        emit("stage_started", index=job["index"], url=job["url"], stage=stage)
 
-    keyword_slug = slugify(args.keyword)
+    def stage_finished(
+        job: Dict[str, Any],
+        stage: str,
+        status: str,
+        started_at: Optional[float] = None,
+        **fields: Any,
+    ) -> None:
+        """段の終了をイベントで通知し、完了・失敗はチェックポイントにも記録する"""
+        if stage != "capture" and status in ("done", "failed"):
+            mark_stage(checkpoint_path, checkpoint, job["index"], stage, status, **fields)
+        seconds = round(time.perf_counter() - started_at, 3) if started_at is not None else None
+        emit("stage_finished", index=job["index"], url=job["url"], stage=stage, status=status, seconds=seconds, **fields)
 
+    def finish_url(job: Dict[str, Any], record: Dict[str, Any]) -> None:
+        records[job["index"]] = record
+        emit("url_finished", index=job["index"], **record)
+
+    def cancellable(stage: str, handle):
+        def run(job: Dict[str, Any]):
+            if cancelled():
+                finish_url(job, failure_record(job, CANCELLED_MESSAGE))
+                stage_finished(job, stage, "cancelled")
+                return None
+            return handle(job)
+
+        return run
+
+    def log(job: Dict[str, Any], message: str, error: bool = False) -> None:
+        with _print_lock:
+            print(f"[{job['index'] + 1}/{total}] {message}", file=sys.stderr if error else sys.stdout, flush=True)
+
+    def add_stage_time(stage: str, started_at: float) -> None:
+        with state_lock:
+            stage_seconds[stage] += time.perf_counter() - started_at
+
+    def capture_stage(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        transcript_path = completed_artifact(checkpoint, job["index"], "transcription", "transcript")
+        if transcript_path is not None:
+            log(job, f"♻️ {job['url']} の文字起こしは完了済みのため再利用します。")
+            job["transcript_path"] = transcript_path
+            stage_finished(job, "transcription", "reused", transcript=transcript_path)
+            return job
+
+        log(job, f"{job['url']} のページ取得を開始します。")
+        stage_started(job, "capture")
+        started_at = time.perf_counter()
+        # ブラウザはワーカーごとに1度だけ起動し、URLごとにコンテキストを分けて使い回す
+        browser_session.open_session(headless=True, launcher=transcribe_website.launch_browser)
+        try:
+            job["capture"] = transcribe_website.capture_website(
+                url=job["url"],
+                slice_height=args.slice_height,
+                overlap=args.overlap,
+                keyword_slug=keyword_slug,
+            )
+        except Exception as error:
+            msg = f"文字起こし処理でエラーが発生しました ({job['url']}): {error}"
+            log(job, f"❌ {msg}", error=True)
+            stage_finished(job, "transcription", "failed", started_at, error=msg)
+            finish_url(job, failure_record(job, msg))
+            return None
+        finally:
+            add_stage_time("capture", started_at)
+        stage_finished(job, "capture", "done", started_at, screenshot=job["capture"].get("screenshot"))
+        return job
+
+    def ocr_stage(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        started_at = time.perf_counter()
+        try:
+            if "transcript_path" not in job:
+                log(job, f"{job['url']} のOCRを開始します。")
+                stage_started(job, "transcription")
+                try:
+                    job["transcript_path"] = finish_transcription(job.pop("capture"), incremental=args.incremental)
+                except Exception as error:
+                    msg = f"文字起こし処理でエラーが発生しました ({job['url']}): {error}"
+                    log(job, f"❌ {msg}", error=True)
+                    stage_finished(job, "transcription", "failed", started_at, error=msg)
+                    finish_url(job, failure_record(job, msg))
+                    return None
+                stage_finished(
+                    job,
+                    "transcription",
+                    "done",
+                    started_at,
+                    transcript=job["transcript_path"],
+                    run_dir=job["transcript_path"].parent,
+                )
+
+            analysis_prompt_path = completed_artifact(checkpoint, job["index"], "analysis_request", "analysis_prompt")
+            if analysis_prompt_path is not None:
+                job["analysis_prompt_path"] = analysis_prompt_path
+                stage_finished(job, "analysis_request", "reused", analysis_prompt=analysis_prompt_path)
+                return job
+
+            request_started_at = time.perf_counter()
+            try:
+                job["analysis_prompt_path"] = generate_analysis_request(
+                    prompt_file=args.prompt_file,
+                    transcript_path=job["transcript_path"],
+                    keyword=args.keyword,
+                    conversion_goal=args.conversion_goal,
+                    token_budget=args.analysis_token_budget,
+                )
+            except Exception as error:
+                msg = f"マーケティング分析用プロンプトの生成でエラーが発生しました ({job['url']}): {error}"
+                log(job, f"❌ {msg}", error=True)
+                stage_finished(job, "analysis_request", "failed", request_started_at, error=msg)
+                finish_url(job, failure_record(job, msg))
+                return None
+            stage_finished(
+                job,
+                "analysis_request",
+                "done",
+                request_started_at,
+                analysis_prompt=job["analysis_prompt_path"],
+            )
+        finally:
+            add_stage_time("ocr", started_at)
+        return job
+
+    def analysis_stage(job: Dict[str, Any]) -> None:
+        transcript_path: Path = job["transcript_path"]
+        analysis_prompt_path: Path = job["analysis_prompt_path"]
+        analysis_result_path: Optional[Path] = None
+        analysis_calls: List[Dict[str, Any]] = []
+        analysis_cache: Dict[str, int] = {}
+
+        started_at = time.perf_counter()
+        if not args.skip_gemini:
+            analysis_result_path = completed_artifact(checkpoint, job["index"], "analysis", "analysis_result")
+            if analysis_result_path is not None:
+                log(job, f"♻️ {job['url']} の Gemini 分析は完了済みのため再利用します。")
+                stage_finished(job, "analysis", "reused", analysis_result=analysis_result_path)
+            else:
+                log(job, f"{job['url']} の Gemini 分析を開始します。")
+                stage_started(job, "analysis")
+                try:
+                    analysis_result_path = run_gemini_analysis(
+                        analysis_prompt_path=analysis_prompt_path,
+                        model_name=args.gemini_model,
+                        call_log=analysis_calls,
+                        cache_stats=analysis_cache,
+                    )
+                except Exception as error:
+                    log(job, f"⚠️ Gemini による分析に失敗しました ({job['url']}): {error}", error=True)
+                    stage_finished(job, "analysis", "failed", started_at, error=str(error))
+                else:
+                    if analysis_cache.get("hits"):
+                        log(job, "♻️ 同じ分析プロンプトの結果をキャッシュから書き出しました。")
+                    else:
+                        log(job, "✅ Gemini によるマーケティング分析が完了しました。")
+                    stage_finished(
+                        job,
+                        "analysis",
+                        "done",
+                        started_at,
+                        analysis_result=analysis_result_path,
+                        cache_hit=bool(analysis_cache.get("hits")),
+                    )
+
+        else:
+            stage_finished(job, "analysis", "skipped")
+
+        run_metrics = transcribe_website.append_metrics_calls(transcript_path.parent, analysis_calls)
+        add_stage_time("analysis", started_at)
+        with state_lock:
+            pipeline_calls.extend(
+                seg["usage"] for seg in run_metrics.get("segments", []) if seg.get("usage")
+            )
+            pipeline_calls.extend(analysis_calls)
+
+        with _print_lock:
+            print("=" * 80)
+            print(f"[{job['index'] + 1}/{total}] {job['url']}")
+            print("✅ 文字起こしとプロンプト生成が完了しました。")
+            print(f"  - 文字起こし Markdown: {transcript_path}")
+            print(f"  - 分析プロンプト: {analysis_prompt_path}")
+            if analysis_result_path and analysis_result_path.exists():
+                print(f"  - Gemini 分析結果: {analysis_result_path}")
+            else:
+                print("  - Gemini 分析結果: 生成されていません。")
+
+            print("次の手順:")
+            if analysis_result_path and analysis_result_path.exists():
+                print("  1. `analysis_result_gemini.md` を確認し、必要に応じて共有または検証してください。")
+                print("  2. さらに Claude での再分析が必要な場合は、analysis_request.md を利用できます。")
+            else:
+                print("  1. Claude Code から上記プロンプトファイルを開き、その内容を会話に貼り付けるか、")
+                print("     MCP のファイル読み込み機能で内容を共有してください。")
+                print("  2. 必要であれば同フォルダ内のテキスト版も参照できます。")
+
+        meta = job["meta"]
+        finish_url(job, {
+            "url": job["url"],
+            "source": meta.get("source", "manual"),
+            "title": meta.get("title"),
+            "snippet": meta.get("snippet"),
+            "success": True,
+            "transcript": str(transcript_path),
+            "analysis_prompt": str(analysis_prompt_path),
+            "analysis_result": str(analysis_result_path) if analysis_result_path else None,
+            "analysis_cache_hit": bool(analysis_cache.get("hits")) if analysis_cache else None,
+            "usage": run_metrics.get("totals"),
+        })
+
+    capture_queue: "queue.Queue" = queue.Queue(maxsize=args.queue_size)
+    ocr_queue: "queue.Queue" = queue.Queue(maxsize=args.queue_size)
+    analysis_queue: "queue.Queue" = queue.Queue(maxsize=args.queue_size)
+
+    capture_threads = start_stage(
+        "capture",
+        args.capture_workers,
+        capture_queue,
+        ocr_queue,
+        cancellable("capture", capture_stage),
+        on_exit=browser_session.close_session,
+    )
+    ocr_threads = start_stage(
+        "ocr", args.ocr_workers, ocr_queue, analysis_queue, cancellable("transcription", ocr_stage)
+    )
+    analysis_threads = start_stage(
+        "analysis", args.analysis_workers, analysis_queue, None, cancellable("analysis", analysis_stage)
+    )
+
+    for index, target_url in enumerate(urls):
+        if cancelled():
+            break
+        capture_queue.put({"index": index, "url": target_url, "meta": url_metadata.get(target_url, {})})
+
+    # 前段のワーカーがすべて終わってから次段に終了を伝える
+    for inbox, threads in (
+        (capture_queue, capture_threads),
+        (ocr_queue, ocr_threads),
+        (analysis_queue, analysis_threads),
+    ):
+        inbox.put(_STAGE_DONE)
+        for thread in threads:
+            thread.join()
+
+    overall_results = [
+        record
+        if record is not None
+        else failure_record(
+            {"url": urls[index], "meta": url_metadata.get(urls[index], {})},
+            CANCELLED_MESSAGE if cancelled() else f"処理が完了しませんでした ({urls[index]})",
+        )
+        for index, record in enumerate(records)
+    ]
+    return overall_results, pipeline_calls, stage_seconds
+
+
+def collect_target_urls(
+    args: argparse.Namespace,
+    keyword_slug: str,
+) -> tuple[List[str], Dict[str, Dict[str, str]]]:
     urls: list[str] = []
     url_metadata: dict[str, dict[str, str]] = {}
 
@@ -231,6 +1011,8 @@ def main() -> None:
                 keyword=args.keyword,
                 limit=args.seo_limit,
                 keyword_slug=keyword_slug,
+                interactive=args.interactive,
+                snapshot_max_age_hours=0 if args.refresh_serp else None,
             )
             if seo_results:
                 extract_seo.save_to_markdown(
@@ -255,15 +1037,40 @@ def main() -> None:
         except Exception as error:
             print(f"⚠️ SEO抽出に失敗しました: {error}", file=sys.stderr)
 
+    if args.use_ads:
+        print("📣 スポンサー広告からURLを抽出中...")
+        try:
+            ads_results = extract_ads.extract_sponsored_ads(
+                keyword=args.keyword,
+                interactive=args.interactive,
+                snapshot_max_age_hours=0 if args.refresh_serp else None,
+                keyword_slug=keyword_slug,
+            )
+            extract_ads.save_to_markdown(ads_results, args.keyword, keyword_slug=keyword_slug)
+        except Exception as error:
+            print(f"⚠️ 広告抽出に失敗しました: {error}", file=sys.stderr)
+        else:
+            ads_url_count = 0
+            for ad in ads_results:
+                normalized_url = (ad.get("url") or "").strip()
+                if not normalized_url or normalized_url in url_metadata:
+                    continue
+                urls.append(normalized_url)
+                url_metadata[normalized_url] = {
+                    "source": "ads",
+                    "title": ad.get("headline", ""),
+                    "snippet": ad.get("description", ""),
+                }
+                ads_url_count += 1
+            print(f"✅ 広告経由で追加したURL数: {ads_url_count}")
+
     manual_urls: list[str] = []
     if args.url_list:
         if not args.url_list.exists():
-            print(f"❌ URL一覧ファイルが見つかりません: {args.url_list}", file=sys.stderr)
-            sys.exit(1)
+            raise PipelineError(f"URL一覧ファイルが見つかりません: {args.url_list}")
         manual_urls = extract_urls_from_file(args.url_list)
         if not manual_urls:
-            print(f"❌ URL一覧ファイルから有効なリンクが見つかりませんでした: {args.url_list}", file=sys.stderr)
-            sys.exit(1)
+            raise PipelineError(f"URL一覧ファイルから有効なリンクが見つかりませんでした: {args.url_list}")
     elif args.url:
         manual_urls = [args.url.strip()]
 
@@ -277,148 +1084,192 @@ def main() -> None:
         url_metadata[normalized] = {"source": "manual"}
 
     if not urls:
-        print("❌ 処理対象となるURLが見つかりませんでした。", file=sys.stderr)
-        sys.exit(1)
+        raise PipelineError("処理対象となるURLが見つかりませんでした。")
 
-    print("処理対象URL一覧:")
-    for idx, target_url in enumerate(urls, start=1):
-        meta = url_metadata.get(target_url, {})
-        source_label = "SEO抽出" if meta.get("source") == "seo" else "指定URL"
-        print(f"  {idx}. {target_url} ({source_label})")
-        if meta.get("title"):
-            print(f"     タイトル: {meta['title']}")
+    return urls, url_metadata
 
-    overall_results = []
 
-    for idx, target_url in enumerate(urls, start=1):
-        print("=" * 80)
-        print(f"[{idx}/{len(urls)}] {target_url} の処理を開始します。")
-        meta = url_metadata.get(target_url, {})
+def run_pipeline(
+    args: argparse.Namespace,
+    emit: Optional[EventCallback] = None,
+    cancel_event: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """パイプライン全体を実行し、結果をまとめて返す（GUI などから同じプロセスで呼べる）
 
-        try:
-            transcript_path = run_transcription(
-                url=target_url,
-                slice_height=args.slice_height,
-                overlap=args.overlap,
-                keyword_slug=keyword_slug,
-            )
-        except Exception as error:
-            msg = f"文字起こし処理でエラーが発生しました ({target_url}): {error}"
-            print(f"❌ {msg}", file=sys.stderr)
-            overall_results.append(
-                {
-                    "url": target_url,
-                    "source": meta.get("source", "manual"),
-                    "title": meta.get("title"),
-                    "snippet": meta.get("snippet"),
-                    "success": False,
-                    "error": msg,
-                }
-            )
-            continue
+    進捗は emit(event, **fields) で通知する。主なイベント:
+    run_started / urls_collected / stage_started / stage_finished / url_finished /
+    summary_finished / run_finished
+    戻り値の status は completed / incomplete / failed / cancelled のいずれか。
+    続行できないエラーは PipelineError を送出する（run_finished も failed で通知する）。
+    """
+    emit = emit or _ignore_event
+    transcribe_website.init_runtime()
+    try:
+        return _run_pipeline(args, emit, cancel_event)
+    except PipelineError as error:
+        emit("run_finished", status="failed", error=str(error))
+        raise
 
-        try:
-            analysis_prompt_path = generate_analysis_request(
-                prompt_file=args.prompt_file,
-                transcript_path=transcript_path,
-                keyword=args.keyword,
-                conversion_goal=args.conversion_goal,
-            )
-        except Exception as error:
-            msg = f"マーケティング分析用プロンプトの生成でエラーが発生しました ({target_url}): {error}"
-            print(f"❌ {msg}", file=sys.stderr)
-            overall_results.append(
-                {
-                    "url": target_url,
-                    "source": meta.get("source", "manual"),
-                    "title": meta.get("title"),
-                    "snippet": meta.get("snippet"),
-                    "success": False,
-                    "error": msg,
-                }
-            )
-            continue
-
-        analysis_result_path: Optional[Path] = None
 
-        if not args.skip_gemini:
-            try:
-                analysis_result_path = run_gemini_analysis(
-                    analysis_prompt_path=analysis_prompt_path,
-                    model_name=args.gemini_model,
-                )
-            except Exception as error:
-                print(f"⚠️ Gemini による分析に失敗しました ({target_url}): {error}", file=sys.stderr)
-            else:
-                print("✅ Gemini によるマーケティング分析が完了しました。")
+def _run_pipeline(
+    args: argparse.Namespace,
+    emit: EventCallback,
+    cancel_event: Optional[threading.Event],
+) -> Dict[str, Any]:
+    checkpoint_path: Optional[Path] = None
+    checkpoint: Optional[Dict[str, Any]] = None
+    if args.resume:
+        checkpoint_path = (
+            find_latest_checkpoint(slugify(args.keyword)) if args.resume == "latest" else Path(args.resume)
+        )
+        checkpoint = load_checkpoint(checkpoint_path) if checkpoint_path else None
+        if checkpoint is None:
+            raise PipelineError(f"再開できるチェックポイントが見つかりません ({args.resume})")
+        args = resume_args(args, checkpoint)
+        keyword_slug = checkpoint.get("keyword_slug") or slugify(args.keyword)
+    else:
+        keyword_slug = slugify(args.keyword)
+    emit("run_started", keyword=args.keyword, keyword_slug=keyword_slug, resume=args.resume)
 
-        print("✅ 文字起こしとプロンプト生成が完了しました。")
-        print(f"  - 文字起こし Markdown: {transcript_path}")
-        print(f"  - 分析プロンプト: {analysis_prompt_path}")
-        if analysis_result_path and analysis_result_path.exists():
-            print(f"  - Gemini 分析結果: {analysis_result_path}")
-        else:
-            print("  - Gemini 分析結果: 生成されていません。")
+    if checkpoint is not None:
+        urls = [entry["url"] for entry in checkpoint["urls"]]
+        url_metadata = {entry["url"]: entry.get("meta", {}) for entry in checkpoint["urls"]}
+        finished = sum(
+            1
+            for entry in checkpoint["urls"]
+            if (entry["stages"].get("analysis") or {}).get("status") == "done"
+        )
+        print(f"🔁 チェックポイントから再開します: {checkpoint_path}")
+        print(f"   - 分析完了済み: {finished}/{len(urls)} URL")
+        checkpoint["status"] = "running"
+        save_checkpoint(checkpoint_path, checkpoint)
+    else:
+        # SEO抽出と広告抽出は1つのブラウザを共有し、段ごとにコンテキストを分ける
+        if args.use_seo or args.use_ads:
+            browser_session.open_session(headless=not args.interactive)
+        try:
+            urls, url_metadata = collect_target_urls(args, keyword_slug)
+        finally:
+            browser_session.close_session()
+        checkpoint_path, checkpoint = new_checkpoint(args, keyword_slug, urls, url_metadata)
+        print(f"📝 チェックポイント: {checkpoint_path}")
 
-        print("次の手順:")
-        if analysis_result_path and analysis_result_path.exists():
-            print("  1. `analysis_result_gemini.md` を確認し、必要に応じて共有または検証してください。")
-            print("  2. さらに Claude での再分析が必要な場合は、analysis_request.md を利用できます。")
-        else:
-            print("  1. Claude Code から上記プロンプトファイルを開き、その内容を会話に貼り付けるか、")
-            print("     MCP のファイル読み込み機能で内容を共有してください。")
-            print("  2. 必要であれば同フォルダ内のテキスト版も参照できます。")
+    emit(
+        "urls_collected",
+        checkpoint=checkpoint_path,
+        urls=[{"url": url, **url_metadata.get(url, {})} for url in urls],
+    )
+    print("処理対象URL一覧:")
+    for idx, target_url in enumerate(urls, start=1):
+        meta = url_metadata.get(target_url, {})
+        print(f"  {idx}. {target_url} ({source_label(meta.get('source'))})")
+        if meta.get("title"):
+            print(f"     タイトル: {meta['title']}")
 
-        overall_results.append(
-            {
-                "url": target_url,
-                "source": meta.get("source", "manual"),
-                "title": meta.get("title"),
-                "snippet": meta.get("snippet"),
-                "success": True,
-                "transcript": str(transcript_path),
-                "analysis_prompt": str(analysis_prompt_path),
-                "analysis_result": str(analysis_result_path) if analysis_result_path else None,
-            }
-        )
+    pipeline_started_at = time.perf_counter()
+    overall_results, pipeline_calls, stage_seconds = run_pipeline_stages(
+        urls,
+        url_metadata,
+        args,
+        keyword_slug,
+        checkpoint_path=checkpoint_path,
+        checkpoint=checkpoint,
+        emit=emit,
+        cancel_event=cancel_event,
+    )
+    was_cancelled = cancel_event is not None and cancel_event.is_set()
+    checkpoint["status"] = (
+        "completed"
+        if all(r.get("success") and (args.skip_gemini or r.get("analysis_result")) for r in overall_results)
+        else "incomplete"
+    )
+    save_checkpoint(checkpoint_path, checkpoint)
 
     print("=" * 80)
     print("処理サマリ:")
     for result in overall_results:
-        source_label = "SEO抽出" if result.get("source") == "seo" else "指定URL"
+        label = source_label(result.get("source"))
         if result.get("success"):
-            print(f"✅ {result['url']} ({source_label})")
+            print(f"✅ {result['url']} ({label})")
             if result.get("title"):
                 print(f"   - title: {result['title']}")
             print(f"   - transcript: {result['transcript']}")
             print(f"   - analysis_prompt: {result['analysis_prompt']}")
             if result.get("analysis_result"):
-                print(f"   - analysis_result: {result['analysis_result']}")
+                cached_note = " (キャッシュ)" if result.get("analysis_cache_hit") else ""
+                print(f"   - analysis_result: {result['analysis_result']}{cached_note}")
             else:
                 print("   - analysis_result: なし")
+            usage = result.get("usage")
+            if usage:
+                print(
+                    f"   - gemini: {usage['calls']} calls / 入力 {usage['prompt_tokens']} tokens"
+                    f" / 出力 {usage['output_tokens']} tokens / {usage['latency_seconds']}s"
+                )
         else:
-            print(f"❌ {result['url']} ({source_label})")
+            print(f"❌ {result['url']} ({label})")
             if result.get("title"):
                 print(f"   - title: {result['title']}")
             print(f"   - error: {result['error']}")
 
-    if not any(r.get("success") for r in overall_results):
-        sys.exit(1)
+    outcome: Dict[str, Any] = {
+        "status": checkpoint["status"],
+        "keyword_slug": keyword_slug,
+        "checkpoint": str(checkpoint_path),
+        "results": overall_results,
+        "summary_path": None,
+        "metrics_path": None,
+    }
+    if was_cancelled or not any(r.get("success") for r in overall_results):
+        outcome["status"] = "cancelled" if was_cancelled else "failed"
+        outcome["metrics_path"] = save_pipeline_metrics(
+            keyword_slug, overall_results, pipeline_calls, pipeline_started_at, stage_seconds
+        )
+        emit("run_finished", **{key: value for key, value in outcome.items() if key != "results"})
+        return outcome
 
     analysis_ready = [
         r for r in overall_results if r.get("success") and r.get("analysis_result")
     ]
 
-    if args.url_list and not args.skip_summary and analysis_ready:
+    summary_sources = sorted(r["analysis_result"] for r in analysis_ready)
+    previous_summary = checkpoint.get("summary") or {}
+    summary_done = (
+        previous_summary.get("sources") == summary_sources
+        and Path(previous_summary.get("path") or "").is_file()
+    )
+    # URL一覧や広告経由で複数URLを処理した場合に統合レポートを作る
+    multi_url = bool(
+        args.url_list
+        or checkpoint.get("url_list")
+        or any(entry.get("meta", {}).get("source") == "ads" for entry in checkpoint["urls"])
+    )
+
+    if summary_done and not args.skip_summary:
+        print(f"♻️ 統合レポートは作成済みです: {previous_summary['path']}")
+        outcome["summary_path"] = previous_summary["path"]
+        emit("summary_finished", status="reused", path=previous_summary["path"])
+    elif multi_url and not args.skip_summary and analysis_ready:
+        emit("summary_started", sources=len(analysis_ready))
+        summary_started_at = time.perf_counter()
         try:
             first_result_path = Path(analysis_ready[0]["analysis_result"])
             runs_dir = first_result_path.parent.parent
-            latest_count = len(analysis_ready)
-            entries = summarize_analyses.collect_analysis_entries(runs_dir, latest_count)
-            prompt_text = summarize_analyses.build_prompt(args.summary_prompt_file, entries)
-            summary_text = summarize_analyses.run_gemini(prompt_text, args.gemini_model)
+            # インデックスの「最新N件」ではなく、このチェックポイントで分析したものだけを統合する
+            entries = summarize_analyses.load_analysis_entries(
+                [(r["url"], Path(r["analysis_result"])) for r in analysis_ready]
+            )
+            summary_text = summarize_analyses.consolidate(
+                entries,
+                args.summary_prompt_file,
+                args.gemini_model,
+                mode=args.summary_mode,
+                call_log=pipeline_calls,
+                cache_dir=runs_dir / summarize_analyses.SUMMARY_CACHE_DIRNAME,
+            )
         except Exception as error:
             print(f"⚠️ 統合レポート生成に失敗しました: {error}", file=sys.stderr)
+            emit("summary_finished", status="failed", error=str(error))
         else:
             if args.summary_output:
                 summary_path = args.summary_output
@@ -429,6 +1280,46 @@ def main() -> None:
             summary_path.write_text(summary_text, encoding="utf-8")
             print("✅ 統合レポートを生成しました。")
             print(f"   - 保存先: {summary_path}")
+            checkpoint["summary"] = {"path": str(summary_path), "sources": summary_sources}
+            save_checkpoint(checkpoint_path, checkpoint)
+            outcome["summary_path"] = str(summary_path)
+            emit(
+                "summary_finished",
+                status="done",
+                path=summary_path,
+                seconds=round(time.perf_counter() - summary_started_at, 3),
+            )
+
+    outcome["metrics_path"] = save_pipeline_metrics(
+        keyword_slug, overall_results, pipeline_calls, pipeline_started_at, stage_seconds
+    )
+    emit(
+        "run_finished",
+        seconds=round(time.perf_counter() - pipeline_started_at, 3),
+        **{key: value for key, value in outcome.items() if key != "results"},
+    )
+    return outcome
+
+
+def main() -> None:
+    args = parse_args()
+
+    emit: Optional[EventCallback] = None
+    log_stream = sys.stdout
+    if args.events == "jsonl":
+        # 標準出力はイベント専用にし、人向けのログは標準エラーへ回す
+        emit = make_jsonl_emitter(sys.stdout)
+        log_stream = sys.stderr
+
+    try:
+        with contextlib.redirect_stdout(log_stream):
+            outcome = run_pipeline(args, emit=emit)
+    except PipelineError as error:
+        print(f"❌ {error}", file=sys.stderr)
+        sys.exit(1)
+
+    if outcome["status"] in ("failed", "cancelled"):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
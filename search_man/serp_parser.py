@@ -0,0 +1,587 @@
+"""
+保存済みの検索結果HTML（page_source*.html）からオーガニック結果・広告を抽出するパーサー
+
+extract_seo / extract_ads がブラウザ内で行っている抽出ルールを、標準ライブラリだけで再現する。
+Google に再アクセスせずにセレクタ改善を試したり、新しいスナップショットがあれば
+ブラウザ起動を省略する高速経路として使う。
+
+使い方:
+    python serp_parser.py SearchSEO/              # 配下の page_source*.html をまとめて解析
+    python serp_parser.py SearchAds/page_source.html --kind ads --json ads.json
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urljoin, urlparse
+
+GOOGLE_ORIGIN = "https://www.google.com"
+SNAPSHOT_GLOB = "page_source*.html"
+# この時間内に保存されたスナップショットがあれば、ブラウザを起動せずに解析する（0で無効）
+SNAPSHOT_MAX_AGE_HOURS = float(os.getenv("SERP_SNAPSHOT_MAX_AGE_HOURS", "6"))
+
+# extract_seo.py のブラウザ内抽出と同じルール
+ORGANIC_CONTAINER_SELECTORS = [
+    "div.tF2Cxc",
+    "div.MjjYud",
+    "div.g",
+    "div.dv3tp",
+    "div.N54PNb",
+]
+ORGANIC_SNIPPET_SELECTORS = [
+    "div[data-content-feature='1']",
+    "div[data-sncf='1']",
+    "div.VwiC3b",
+    "div[data-attrid='wa:/description']",
+    "span[jsname='bN97Pc']",
+    "div.yXK7lf",
+    "div.P7xzyd",
+    "div.fc9yUc",
+]
+ORGANIC_TITLE_SELECTOR = 'h3, div[role="heading"]'
+AD_TEXT_PATTERN = re.compile(r"(スポンサー|広告|Ad\b)", re.IGNORECASE)
+
+# extract_ads.py のブラウザ内抽出と同じルール
+AD_BLOCK_SELECTOR = "div.uEierd, div.Cu4Edb, div.v5yQqb, div[data-text-ad], li.ads-ad"
+AD_ARIA_SELECTOR = '[aria-label*="広告"], [aria-label*="Ad"], [aria-label*="スポンサー"]'
+AD_LABEL_TEXTS = ("スポンサー", "広告", "sponsored", "ad")
+AD_LABEL_ANCESTOR_CLASSES = ("uEierd", "Cu4Edb")
+AD_HEADLINE_SELECTORS = [
+    'div[role="heading"]',
+    "div.v5yQqb",
+    "div.CCgQ5",
+    "span",
+    "a > div > div > span",
+]
+AD_DESCRIPTION_SELECTOR = "div.MUxGbd"
+
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+NON_RENDERED_ELEMENTS = {"script", "style", "noscript", "template"}
+
+
+# --- 最小限のDOM ----------------------------------------------------------------
+
+
+class Node:
+    __slots__ = ("tag", "attrs", "children", "parent")
+
+    def __init__(self, tag: str, attrs: Dict[str, str], parent: Optional["Node"]) -> None:
+        self.tag = tag
+        self.attrs = attrs
+        self.children: List[Any] = []
+        self.parent = parent
+
+    @property
+    def classes(self) -> List[str]:
+        return self.attrs.get("class", "").split()
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self.attrs.get(name, default)
+
+    def descendants(self) -> Iterator["Node"]:
+        """文書順（深さ優先）で子孫要素を返す"""
+        stack = [child for child in reversed(self.children) if isinstance(child, Node)]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(child for child in reversed(node.children) if isinstance(child, Node))
+
+    def ancestors(self) -> Iterator["Node"]:
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def text_content(self) -> str:
+        """DOM の textContent と同じく、子孫のテキストをそのまま連結する"""
+        parts: List[str] = []
+        stack: List[Any] = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, Node):
+                stack.extend(reversed(item.children))
+            else:
+                parts.append(item)
+        return "".join(parts)
+
+    def inner_text(self) -> str:
+        """innerText の近似（script/style を除き、空白をまとめる）"""
+        parts: List[str] = []
+        stack: List[Any] = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, Node):
+                if item.tag in NON_RENDERED_ELEMENTS:
+                    continue
+                if item.tag in ("br", "div", "p", "li"):
+                    parts.append("\n")
+                stack.extend(reversed(item.children))
+            else:
+                parts.append(item)
+        lines = (" ".join(line.split()) for line in "".join(parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.root = Node("#document", {}, None)
+        self._current = self.root
+
+    def handle_starttag(self, tag, attrs) -> None:
+        node = Node(tag, {name: value or "" for name, value in attrs}, self._current)
+        self._current.children.append(node)
+        if tag not in VOID_ELEMENTS:
+            self._current = node
+
+    def handle_startendtag(self, tag, attrs) -> None:
+        self._current.children.append(Node(tag, {name: value or "" for name, value in attrs}, self._current))
+
+    def handle_endtag(self, tag) -> None:
+        # 閉じ忘れに寛容に、同名の開いている要素まで戻る
+        node = self._current
+        while node is not None and node.tag != tag:
+            node = node.parent
+        if node is not None and node.parent is not None:
+            self._current = node.parent
+
+    def handle_data(self, data) -> None:
+        self._current.children.append(data)
+
+
+def parse_html(html: str) -> Node:
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+# --- CSSセレクタ（抽出ルールで使う範囲のみ） --------------------------------------
+
+_ATTR_RE = re.compile(r"""\[\s*([\w:-]+)\s*(?:([*^$]?=)\s*(?:"([^"]*)"|'([^']*)'|([^\]\s]+)))?\s*\]""")
+_COMPOUND_RE = re.compile(r"""^([a-zA-Z][\w-]*|\*)?((?:\.[\w-]+|\[[^\]]*\])*)$""")
+
+
+def _parse_compound(text: str) -> Tuple[Optional[str], List[str], List[Tuple[str, Optional[str], str]]]:
+    match = _COMPOUND_RE.match(text)
+    if not match:
+        raise ValueError(f"unsupported selector: {text}")
+    tag = match.group(1) if match.group(1) not in (None, "*") else None
+    rest = match.group(2)
+    classes = re.findall(r"\.([\w-]+)", re.sub(r"\[[^\]]*\]", "", rest))
+    attrs = [
+        (name, op, next((value for value in values if value is not None), ""))
+        for name, op, *values in _ATTR_RE.findall(rest)
+    ]
+    attrs = [(name, op or None, value) for name, op, value in attrs]
+    return tag, classes, attrs
+
+
+@lru_cache(maxsize=None)
+def parse_selector(selector: str) -> List[List[Tuple[str, Any]]]:
+    """カンマ区切りのセレクタを [(結合子, 複合セレクタ), ...] のリストに変換する"""
+    groups = []
+    for part in _split_top_level(selector, ","):
+        tokens = re.findall(r"""\[[^\]]*\]|>|[^\s>\[]+(?:\[[^\]]*\])*""", part)
+        steps: List[Tuple[str, Any]] = []
+        combinator = " "
+        for token in tokens:
+            if token == ">":
+                combinator = ">"
+                continue
+            steps.append((combinator, _parse_compound(token)))
+            combinator = " "
+        groups.append(steps)
+    return groups
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        if char == separator and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+
+def _match_compound(node: Node, compound) -> bool:
+    tag, classes, attrs = compound
+    if tag is not None and node.tag != tag:
+        return False
+    if classes:
+        node_classes = node.classes
+        if any(cls not in node_classes for cls in classes):
+            return False
+    for name, op, value in attrs:
+        actual = node.attrs.get(name)
+        if actual is None:
+            return False
+        if op == "=" and actual != value:
+            return False
+        if op == "*=" and value not in actual:
+            return False
+        if op == "^=" and not actual.startswith(value):
+            return False
+        if op == "$=" and not actual.endswith(value):
+            return False
+    return True
+
+
+def _match_steps(node: Node, steps, index: int) -> bool:
+    combinator, compound = steps[index]
+    if not _match_compound(node, compound):
+        return False
+    if index == 0:
+        return True
+    if combinator == ">":
+        return node.parent is not None and _match_steps(node.parent, steps, index - 1)
+    return any(_match_steps(ancestor, steps, index - 1) for ancestor in node.ancestors())
+
+
+def matches(node: Node, selector: str) -> bool:
+    return any(_match_steps(node, steps, len(steps) - 1) for steps in parse_selector(selector))
+
+
+def select_all(root: Node, selector: str) -> List[Node]:
+    return [node for node in root.descendants() if matches(node, selector)]
+
+
+def select_one(root: Node, selector: str) -> Optional[Node]:
+    return next((node for node in root.descendants() if matches(node, selector)), None)
+
+
+# --- スナップショットの情報 --------------------------------------------------------
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text or "").split()).lower()
+
+
+def snapshot_query(root: Node) -> Optional[str]:
+    """検索ボックス（name=q）または <title> から検索語を取り出す"""
+    for node in root.descendants():
+        if node.get("name") == "q" and node.tag in ("textarea", "input"):
+            value = node.get("value") or node.text_content()
+            if value.strip():
+                return value.strip()
+    title = select_one(root, "title")
+    if title is not None:
+        text = title.text_content().strip()
+        if " - Google" in text:
+            return text.rsplit(" - Google", 1)[0].strip()
+    return None
+
+
+def load_fresh_snapshot(
+    path: Path,
+    keyword: str,
+    max_age_hours: Optional[float] = None,
+) -> Optional[Node]:
+    """同じ検索語で max_age_hours 以内に保存されたスナップショットなら、解析済みのDOMを返す"""
+    max_age_hours = SNAPSHOT_MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+    if max_age_hours <= 0 or not path.is_file():
+        return None
+    if time.time() - path.stat().st_mtime > max_age_hours * 3600:
+        return None
+    root = parse_html(path.read_text(encoding="utf-8", errors="replace"))
+    query = snapshot_query(root)
+    if query is None or normalize_query(query) != normalize_query(keyword):
+        return None
+    return root
+
+
+# --- オーガニック結果 --------------------------------------------------------------
+
+
+def _resolve_href(href: str) -> str:
+    if href.startswith("/"):
+        href = urljoin(GOOGLE_ORIGIN, href)
+    if href.startswith(f"{GOOGLE_ORIGIN}/url?"):
+        target = parse_qs(urlparse(href).query).get("q")
+        if target and target[0]:
+            href = target[0]
+    return href
+
+
+def extract_organic_candidates(root: Node, limit: int) -> List[Dict[str, str]]:
+    """ブラウザ内の page.evaluate と同じ手順で候補を集める"""
+    containers: List[Node] = []
+    seen_nodes = set()
+    for selector in ORGANIC_CONTAINER_SELECTORS:
+        for node in select_all(root, selector):
+            if id(node) not in seen_nodes:
+                seen_nodes.add(id(node))
+                containers.append(node)
+
+    results: List[Dict[str, str]] = []
+    seen_urls = set()
+    for container in containers:
+        if len(results) >= limit:
+            break
+        link = select_one(container, "a[href]")
+        if link is None:
+            continue
+        href = link.get("href") or ""
+        if not href:
+            continue
+        if href.startswith("/aclk") or "googleadservices" in href:
+            continue
+        href = _resolve_href(href)
+        if not href or href in seen_urls:
+            continue
+
+        title_node = select_one(container, ORGANIC_TITLE_SELECTOR)
+        if title_node is None:
+            continue
+        title = title_node.text_content().strip()
+        if not title or len(title) < 3:
+            continue
+
+        # 広告ラベルは表示されるテキストで判定する（インライン script の base64 などに誤って一致しないように）
+        if AD_TEXT_PATTERN.search(container.inner_text()):
+            continue
+
+        snippet = ""
+        for selector in ORGANIC_SNIPPET_SELECTORS:
+            candidate = select_one(container, selector)
+            if candidate is not None:
+                text = candidate.text_content().strip()
+                if text:
+                    snippet = text
+                    break
+        if not snippet:
+            span = select_one(container, "span")
+            if span is not None:
+                snippet = span.text_content().strip()
+
+        results.append({"title": title, "url": href, "snippet": snippet})
+        seen_urls.add(href)
+    return results
+
+
+def build_organic_results(extracted: List[Dict[str, str]], limit: int) -> List[Dict[str, Any]]:
+    """候補を整形・重複除去して index を振る（ブラウザ抽出と共通）"""
+    results: List[Dict[str, Any]] = []
+    seen_urls = set()
+    for entry in extracted:
+        if len(results) >= limit:
+            break
+        url = (entry.get("url") or "").strip()
+        title = (entry.get("title") or "").strip()
+        snippet = (entry.get("snippet") or "").strip()
+
+        if not title or not url:
+            continue
+        if url in seen_urls:
+            continue
+
+        result = {
+            "index": len(results) + 1,
+            "title": title,
+            "url": url,
+            "snippet": snippet,
+        }
+        results.append(result)
+        seen_urls.add(url)
+        print(f"結果 {result['index']}: {title}")
+    return results
+
+
+def parse_organic_html(html: str, limit: int) -> List[Dict[str, Any]]:
+    return build_organic_results(extract_organic_candidates(parse_html(html), limit), limit)
+
+
+# --- スポンサー広告 ----------------------------------------------------------------
+
+
+def _has_ad_label(node: Node) -> bool:
+    # Playwright の :has-text() と同じく大文字小文字を無視した部分一致
+    text = node.text_content().lower()
+    return any(label in text for label in AD_LABEL_TEXTS)
+
+
+def extract_ad_candidates(root: Node) -> List[Dict[str, str]]:
+    ad_blocks = select_all(root, AD_BLOCK_SELECTOR)
+
+    blocks_from_labels: List[Node] = []
+    for label in select_all(root, "span"):
+        if not _has_ad_label(label):
+            continue
+        for ancestor in label.ancestors():
+            if ancestor.tag == "div" and any(cls in ancestor.get("class", "") for cls in AD_LABEL_ANCESTOR_CLASSES):
+                blocks_from_labels.append(ancestor)
+                break
+
+    aria_blocks = select_all(root, AD_ARIA_SELECTOR)
+
+    unique_blocks: List[Node] = []
+    seen = set()
+    for block in ad_blocks + blocks_from_labels + aria_blocks:
+        if id(block) in seen:
+            continue
+        seen.add(id(block))
+        unique_blocks.append(block)
+
+    ads_data: List[Dict[str, str]] = []
+    for block in unique_blocks:
+        headline = ""
+        for selector in AD_HEADLINE_SELECTORS:
+            element = select_one(block, selector)
+            if element is None:
+                continue
+            headline = element.inner_text()
+            if headline and len(headline) > 5:
+                break
+
+        link = select_one(block, "a")
+        url = (link.get("href") or "") if link is not None else ""
+
+        description_node = select_one(block, AD_DESCRIPTION_SELECTOR)
+        description = description_node.inner_text() if description_node is not None else ""
+
+        if headline:
+            ads_data.append(
+                {
+                    "headline": headline.strip(),
+                    "url": url.strip(),
+                    "description": description.strip(),
+                }
+            )
+    return ads_data
+
+
+def dedupe_ads(ads_data: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """見出し・URL・説明文の組で重複を除き index を振る（ブラウザ抽出と共通）"""
+    unique_ads = []
+    seen_ads = set()
+    for ad in ads_data:
+        key = (ad["headline"], ad["url"], ad["description"])
+        if key in seen_ads:
+            print(f"重複広告をスキップ: {ad['headline']}")
+            continue
+        seen_ads.add(key)
+        ad_with_index = ad.copy()
+        ad_with_index["index"] = len(unique_ads) + 1
+        unique_ads.append(ad_with_index)
+        print(f"広告 {ad_with_index['index']}: {ad_with_index['headline']}")
+
+    if not unique_ads and ads_data:
+        print("ユニーク抽出で全件除外されたため、見出し単位で整理し直します")
+        unique_ads = []
+        seen_headlines = set()
+        for ad in ads_data:
+            headline = ad["headline"]
+            if headline in seen_headlines:
+                continue
+            seen_headlines.add(headline)
+            ad_with_index = ad.copy()
+            ad_with_index["index"] = len(unique_ads) + 1
+            unique_ads.append(ad_with_index)
+            print(f"広告 {ad_with_index['index']}: {headline}")
+
+    return unique_ads
+
+
+def parse_ads_html(html: str) -> List[Dict[str, Any]]:
+    return dedupe_ads(extract_ad_candidates(parse_html(html)))
+
+
+# --- 一括処理 ------------------------------------------------------------------
+
+
+def parse_snapshot(path: Path, kind: str = "auto", limit: int = 4) -> Dict[str, Any]:
+    """1ファイルを解析する。kind=auto ならオーガニック結果と広告の両方を返す"""
+    started_at = time.perf_counter()
+    root = parse_html(path.read_text(encoding="utf-8", errors="replace"))
+    entry: Dict[str, Any] = {"path": str(path), "query": snapshot_query(root)}
+    if kind in ("auto", "organic"):
+        entry["organic"] = build_organic_results(extract_organic_candidates(root, limit), limit)
+    if kind in ("auto", "ads"):
+        entry["ads"] = dedupe_ads(extract_ad_candidates(root))
+    entry["seconds"] = round(time.perf_counter() - started_at, 3)
+    return entry
+
+
+def collect_snapshots(targets: List[Path]) -> List[Path]:
+    paths: List[Path] = []
+    for target in targets:
+        if target.is_dir():
+            paths.extend(sorted(target.rglob(SNAPSHOT_GLOB)))
+        elif target.is_file():
+            paths.append(target)
+    return paths
+
+
+def _parse_quietly(args: Tuple[Path, str, int]) -> Dict[str, Any]:
+    path, kind, limit = args
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            return parse_snapshot(path, kind=kind, limit=limit)
+        finally:
+            sys.stdout = stdout
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="保存済みの検索結果HTMLをオフラインで解析します")
+    parser.add_argument("targets", nargs="+", type=Path, help="HTMLファイルまたはそれを含むフォルダ")
+    parser.add_argument("--kind", choices=["auto", "organic", "ads"], default="auto", help="抽出する種類")
+    parser.add_argument("--limit", type=int, default=4, help="オーガニック結果の最大件数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="並列プロセス数")
+    parser.add_argument("--json", type=Path, help="解析結果をまとめて保存するJSONファイル")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    paths = collect_snapshots(args.targets)
+    if not paths:
+        print("❌ 解析対象のHTMLが見つかりません。", file=sys.stderr)
+        sys.exit(1)
+
+    started_at = time.perf_counter()
+    jobs = [(path, args.kind, args.limit) for path in paths]
+    if args.workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(paths))) as executor:
+            entries = list(executor.map(_parse_quietly, jobs))
+    else:
+        entries = [_parse_quietly(job) for job in jobs]
+    elapsed = time.perf_counter() - started_at
+
+    for entry in entries:
+        counts = []
+        if "organic" in entry:
+            counts.append(f"オーガニック {len(entry['organic'])} 件")
+        if "ads" in entry:
+            counts.append(f"広告 {len(entry['ads'])} 件")
+        print(f"📄 {entry['path']} [{entry.get('query') or '検索語不明'}] {' / '.join(counts)} ({entry['seconds']}s)")
+    print(f"✅ {len(entries)} ファイルを {elapsed:.2f}s で解析しました")
+
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(entries, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"💾 解析結果を保存しました: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,39 @@
 import argparse
+import hashlib
+import json
+import math
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import List
-
-import google.generativeai as genai
+from typing import Any, Dict, List, Optional, Tuple
+
+import run_index
+import transcribe_website
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+RUN_INDEX_PATH = SCRIPT_DIR / "output" / run_index.INDEX_FILENAME
+
+# 統合モード: single は全文を1回で統合、mapreduce は要約→グループ統合→最終統合、
+# auto は全文がプロンプト予算に収まるかで切り替える
+SUMMARY_MODES = ("auto", "single", "mapreduce")
+SUMMARY_MODE_DEFAULT = os.getenv("SUMMARY_MODE", "auto")
+# 最終統合プロンプトに入れる分析本文の上限（推定トークン数）
+SUMMARY_PROMPT_TOKEN_BUDGET = int(os.getenv("SUMMARY_PROMPT_TOKEN_BUDGET", "30000"))
+# 1サイトの要約（1段目）と、グループ統合（2段目以降）の出力の目安
+CONDENSE_TOKEN_BUDGET = int(os.getenv("SUMMARY_CONDENSE_TOKEN_BUDGET", "1200"))
+MERGE_TOKEN_BUDGET = int(os.getenv("SUMMARY_MERGE_TOKEN_BUDGET", "2500"))
+MERGE_GROUP_SIZE = int(os.getenv("SUMMARY_MERGE_GROUP_SIZE", "5"))
+SUMMARY_MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "4"))
+# 日本語主体の文章で1トークンあたりのおおよその文字数
+CHARS_PER_TOKEN = 1.5
+CONDENSE_PROMPT_PATH = SCRIPT_DIR / "prompts" / "condense_analysis_prompt.md"
+MERGE_PROMPT_PATH = SCRIPT_DIR / "prompts" / "merge_analyses_prompt.md"
+SUMMARY_CACHE_DIRNAME = "summary_cache"
+SUMMARY_CACHE_ENABLED = os.getenv("SUMMARY_CACHE", "1") != "0"
+GEMINI_TEMPERATURE = 0.2
 
 
 def parse_args() -> argparse.Namespace:
@@ -41,6 +69,27 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="生成される統合レポートの保存先（未指定の場合は runs_dir 配下に timestamp 付きファイルを作成）",
     )
+    parser.add_argument(
+        "--mode",
+        choices=SUMMARY_MODES,
+        default=SUMMARY_MODE_DEFAULT,
+        help=(
+            "統合方法。single は全文を1回で統合、mapreduce はサイトごとの要約とグループ統合を経て最終統合、"
+            f"auto は全文が約 {SUMMARY_PROMPT_TOKEN_BUDGET} トークンを超える場合に mapreduce を使います。"
+        ),
+    )
+    parser.add_argument(
+        "--group-size",
+        type=int,
+        default=MERGE_GROUP_SIZE,
+        help=f"mapreduce で1回に統合する要約の数 (既定: {MERGE_GROUP_SIZE})",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=SUMMARY_MAX_WORKERS,
+        help=f"要約・グループ統合の Gemini 同時実行数 (既定: {SUMMARY_MAX_WORKERS})",
+    )
     return parser.parse_args()
 
 
@@ -56,6 +105,54 @@ def extract_url_from_analysis_request(request_path: Path) -> str:
 
 
 def collect_analysis_entries(runs_dir: Path, latest: int | None) -> List[dict]:
+    try:
+        rows = run_index.query_runs(
+            RUN_INDEX_PATH, output_root=runs_dir, with_analysis=True, limit=latest
+        )
+    except Exception as error:
+        print(f"⚠️ 実行インデックスを参照できないため、ディレクトリを走査します: {error}")
+        rows = []
+
+    if rows:
+        entries = []
+        for row in reversed(rows):
+            analysis_path = Path(row["analysis_result_path"])
+            if not analysis_path.exists():
+                continue
+            entries.append(
+                {
+                    "run_dir": Path(row["run_dir"]),
+                    "url": row["url"] or "N/A",
+                    "analysis_path": analysis_path,
+                    "analysis_text": analysis_path.read_text(encoding="utf-8").strip(),
+                }
+            )
+        return entries
+
+    return scan_analysis_entries(runs_dir, latest)
+
+
+def load_analysis_entries(sources: List[Tuple[str, Path]]) -> List[dict]:
+    """(URL, 分析結果のパス) の組から統合用のエントリを作る（インデックスを介さず対象を固定する）"""
+    entries = []
+    for url, analysis_path in sources:
+        analysis_path = Path(analysis_path)
+        if not analysis_path.exists():
+            print(f"⚠️ 分析結果が見つかりません: {analysis_path}")
+            continue
+        entries.append(
+            {
+                "run_dir": analysis_path.parent,
+                "url": url or "N/A",
+                "analysis_path": analysis_path,
+                "analysis_text": analysis_path.read_text(encoding="utf-8").strip(),
+            }
+        )
+    return entries
+
+
+def scan_analysis_entries(runs_dir: Path, latest: int | None) -> List[dict]:
+    """インデックス未作成の出力フォルダ向けに run_* ディレクトリを直接走査する"""
     run_dirs = sorted(
         [p for p in runs_dir.iterdir() if p.is_dir() and p.name.startswith("run_")],
         key=lambda p: p.name,
@@ -66,12 +163,13 @@ def collect_analysis_entries(runs_dir: Path, latest: int | None) -> List[dict]:
 
     entries = []
     for run_dir in run_dirs:
-        analysis_path = run_dir / "analysis_result_gemini.md"
+        manifest = transcribe_website.load_run_manifest(run_dir) or {}
+        outputs = manifest.get("outputs", {})
+        analysis_path = Path(outputs.get("analysis_result") or run_dir / "analysis_result_gemini.md")
         if not analysis_path.exists():
             continue
 
-        request_path = run_dir / "analysis_request.md"
-        url = extract_url_from_analysis_request(request_path)
+        url = manifest.get("url") or extract_url_from_analysis_request(run_dir / "analysis_request.md")
         analysis_text = analysis_path.read_text(encoding="utf-8").strip()
 
         entries.append(
@@ -107,17 +205,27 @@ def build_prompt(template_path: Path, entries: List[dict]) -> str:
     return template.replace("{{ANALYSES}}", analyses_block)
 
 
-def run_gemini(prompt: str, model_name: str) -> str:
+def run_gemini(
+    prompt: str,
+    model_name: str,
+    call_log: Optional[List[Dict[str, Any]]] = None,
+    label: str = "consolidated_summary",
+) -> str:
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise RuntimeError("環境変数 GOOGLE_API_KEY が設定されていません。")
 
+    import google.generativeai as genai
+
     genai.configure(api_key=api_key)
     model = genai.GenerativeModel(model_name)
+    started_at = time.perf_counter()
     response = model.generate_content(
         prompt,
-        generation_config={"temperature": 0.2},
+        generation_config={"temperature": GEMINI_TEMPERATURE},
     )
+    if call_log is not None:
+        call_log.append(transcribe_website.build_gemini_call_record(label, model_name, response, started_at))
 
     text = ""
     if hasattr(response, "text") and response.text:
@@ -140,6 +248,167 @@ def run_gemini(prompt: str, model_name: str) -> str:
     return text
 
 
+# --- map-reduce 統合 ------------------------------------------------------------
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def render_template(template_path: Path, **values: Any) -> str:
+    if not template_path.exists():
+        raise FileNotFoundError(f"prompt template not found: {template_path}")
+    text = template_path.read_text(encoding="utf-8")
+    for key, value in values.items():
+        text = text.replace("{{" + key + "}}", str(value))
+    return text
+
+
+def _cache_path(cache_dir: Path, model_name: str, prompt: str) -> Path:
+    digest = hashlib.sha256(f"{model_name}\n{GEMINI_TEMPERATURE}\n{prompt}".encode("utf-8")).hexdigest()
+    return cache_dir / digest[:2] / f"{digest}.json"
+
+
+def run_gemini_cached(
+    prompt: str,
+    model_name: str,
+    label: str,
+    cache_dir: Optional[Path],
+    call_log: Optional[List[Dict[str, Any]]] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> str:
+    """中間要約用。同じモデル・同じプロンプトの結果はキャッシュから返す"""
+    cache_path = _cache_path(cache_dir, model_name, prompt) if cache_dir and SUMMARY_CACHE_ENABLED else None
+    if cache_path is not None:
+        try:
+            cached = json.loads(cache_path.read_text(encoding="utf-8"))
+            if stats is not None:
+                stats["cache_hits"] += 1
+            return cached["text"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    text = run_gemini(prompt, model_name, call_log=call_log, label=label)
+    if stats is not None:
+        stats["calls"] += 1
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+        tmp_path.write_text(
+            json.dumps({"model": model_name, "label": label, "text": text}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, cache_path)
+    return text
+
+
+def condense_entries(
+    entries: List[dict],
+    model_name: str,
+    cache_dir: Optional[Path],
+    max_workers: int,
+    call_log: Optional[List[Dict[str, Any]]] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[dict]:
+    """1段目: サイトごとの分析を並列に要約する"""
+
+    def condense(item) -> dict:
+        idx, entry = item
+        prompt = render_template(
+            CONDENSE_PROMPT_PATH,
+            TOKEN_BUDGET=CONDENSE_TOKEN_BUDGET,
+            URL=entry["url"],
+            ANALYSIS=entry["analysis_text"],
+        )
+        text = run_gemini_cached(prompt, model_name, f"condense_site_{idx}", cache_dir, call_log, stats)
+        return {**entry, "analysis_text": text}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(executor.map(condense, enumerate(entries, start=1)))
+
+
+def merge_level(
+    items: List[dict],
+    level: int,
+    group_size: int,
+    model_name: str,
+    cache_dir: Optional[Path],
+    max_workers: int,
+    call_log: Optional[List[Dict[str, Any]]] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[dict]:
+    """2段目以降: group_size 件ずつまとめて1つの要約にする"""
+    groups = [items[start : start + group_size] for start in range(0, len(items), group_size)]
+
+    def merge(item) -> dict:
+        idx, group = item
+        if len(group) == 1:
+            return group[0]
+        blocks = [f"### 要約 {n}\n- URL: {entry['url']}\n\n{entry['analysis_text']}" for n, entry in enumerate(group, 1)]
+        prompt = render_template(
+            MERGE_PROMPT_PATH,
+            TOKEN_BUDGET=MERGE_TOKEN_BUDGET,
+            ANALYSES="\n\n".join(blocks),
+        )
+        text = run_gemini_cached(prompt, model_name, f"merge_l{level}_g{idx}", cache_dir, call_log, stats)
+        return {
+            "url": ", ".join(entry["url"] for entry in group),
+            "analysis_path": f"統合グループ（第{level}段 {idx}）",
+            "analysis_text": text,
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(executor.map(merge, enumerate(groups, start=1)))
+
+
+def total_tokens(entries: List[dict]) -> int:
+    return sum(estimate_tokens(entry["analysis_text"]) for entry in entries)
+
+
+def consolidate(
+    entries: List[dict],
+    template_path: Path,
+    model_name: str,
+    mode: str = SUMMARY_MODE_DEFAULT,
+    call_log: Optional[List[Dict[str, Any]]] = None,
+    cache_dir: Optional[Path] = None,
+    group_size: int = MERGE_GROUP_SIZE,
+    max_workers: int = SUMMARY_MAX_WORKERS,
+) -> str:
+    """分析群から統合レポートを作る
+
+    mapreduce では、サイトごとの要約（並列）→ group_size 件ずつの統合を
+    最終プロンプトが予算に収まるまで繰り返し → 既存テンプレートで最終統合、の順に行う。
+    段数は log(サイト数) で抑えられ、各段は並列実行されるので件数が増えても所要時間が伸びにくい。
+    中間要約は cache_dir にプロンプトのハッシュで保存し、再実行時は再利用する。
+    """
+    input_tokens = total_tokens(entries)
+    if mode == "auto":
+        mode = "mapreduce" if input_tokens > SUMMARY_PROMPT_TOKEN_BUDGET else "single"
+    if mode == "single" or len(entries) <= 1:
+        print(f"🧩 統合: 全文を1回で統合します（推定 {input_tokens} tokens）")
+        return run_gemini(build_prompt(template_path, entries), model_name, call_log=call_log)
+
+    group_size = max(2, group_size)
+    stats = {"calls": 0, "cache_hits": 0}
+    started_at = time.perf_counter()
+    print(f"🧩 統合: map-reduce で統合します（{len(entries)} サイト / 推定 {input_tokens} tokens）")
+
+    items = condense_entries(entries, model_name, cache_dir, max_workers, call_log, stats)
+    print(f"   - 第1段 要約: {len(items)} 件 / 推定 {total_tokens(items)} tokens")
+    level = 2
+    while len(items) > 1 and total_tokens(items) > SUMMARY_PROMPT_TOKEN_BUDGET:
+        items = merge_level(items, level, group_size, model_name, cache_dir, max_workers, call_log, stats)
+        print(f"   - 第{level}段 統合: {len(items)} 件 / 推定 {total_tokens(items)} tokens")
+        level += 1
+
+    print(
+        f"   - 中間処理: Gemini {stats['calls']} 回 / キャッシュ再利用 {stats['cache_hits']} 回"
+        f" / {time.perf_counter() - started_at:.1f}秒"
+    )
+    return run_gemini(build_prompt(template_path, items), model_name, call_log=call_log)
+
+
 def main() -> None:
     args = parse_args()
 
@@ -152,10 +421,18 @@ def main() -> None:
     for entry in entries:
         print(f"- {entry['url']} ({entry['analysis_path']})")
 
-    prompt = build_prompt(args.prompt_file, entries)
-
+    calls: List[Dict[str, Any]] = []
     try:
-        summary_text = run_gemini(prompt, args.gemini_model)
+        summary_text = consolidate(
+            entries,
+            args.prompt_file,
+            args.gemini_model,
+            mode=args.mode,
+            call_log=calls,
+            cache_dir=args.runs_dir / SUMMARY_CACHE_DIRNAME,
+            group_size=args.group_size,
+            max_workers=args.max_workers,
+        )
     except Exception as error:
         print(f"❌ Gemini による統合レポート生成でエラーが発生しました: {error}", file=sys.stderr)
         sys.exit(1)
@@ -170,6 +447,11 @@ def main() -> None:
 
     print("✅ 統合レポートを生成しました。")
     print(f"  - 保存先: {output_path}")
+    for call in calls:
+        print(
+            f"  - Gemini利用量 ({call['label']}): 入力 {call['prompt_tokens']} tokens / 出力 {call['output_tokens']} tokens"
+            f" / {call['latency_seconds']}秒"
+        )
 
 
 if __name__ == "__main__":
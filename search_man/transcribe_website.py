@@ -4,7 +4,10 @@ Playwrightでページを取得し、スマートフォン表示のフルスク
 """
 
 import argparse
+import hashlib
+import json
 import sys
+import threading
 import time
 import re
 from datetime import datetime
@@ -13,26 +16,21 @@ from typing import Dict, List, Optional, Any
 import os
 import subprocess
 import shutil
+import unicodedata
+from difflib import SequenceMatcher
 
 import math
 
-from PIL import Image
-
-# Playwrightのクラッシュレポーターを無効化して権限エラーを避ける
-os.environ.setdefault("PLAYWRIGHT_SKIP_CRASH_REPORTER", "1")
-
-# Gemini関連ライブラリをインポート
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
-
+# Pillow・Playwright・google-generativeai は起動（--help やGUI表示）を遅くするため、使う関数の中で読み込む
 try:
     from dotenv import load_dotenv
 except ImportError:
     load_dotenv = None
 
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import blob_store
+import browser_session
+import image_pyramid
+import run_index
 
 # .envファイルから環境変数を読み込む
 ENV_PATH = Path(__file__).resolve().parent / ".env"
@@ -41,7 +39,8 @@ if load_dotenv is not None:
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 BASE_OUTPUT_DIR = SCRIPT_DIR / "output"
-BASE_OUTPUT_DIR.mkdir(exist_ok=True)
+RUN_INDEX_PATH = BASE_OUTPUT_DIR / run_index.INDEX_FILENAME
+ARTIFACT_STORE_DIR = blob_store.store_dir_path(BASE_OUTPUT_DIR / "blobs")
 
 
 def get_output_root(keyword_slug: Optional[str] = None) -> Path:
@@ -54,25 +53,80 @@ def get_output_root(keyword_slug: Optional[str] = None) -> Path:
 
 ORIGINAL_HOME = Path.home()
 PLAYWRIGHT_SANDBOX_HOME = SCRIPT_DIR / ".playwright_home"
-PLAYWRIGHT_SANDBOX_HOME.mkdir(parents=True, exist_ok=True)
-
 CRASH_DUMPS_DIR = PLAYWRIGHT_SANDBOX_HOME / "crashpad"
-CRASH_DUMPS_DIR.mkdir(parents=True, exist_ok=True)
-
 DEFAULT_PLAYWRIGHT_BROWSERS = ORIGINAL_HOME / "Library" / "Caches" / "ms-playwright"
-os.environ.setdefault("PLAYWRIGHT_BROWSERS_PATH", str(DEFAULT_PLAYWRIGHT_BROWSERS))
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-GENAI_LIB_AVAILABLE = genai is not None
+# 以下の2つと genai は init_gemini() を呼ぶまで確定しない
+GENAI_LIB_AVAILABLE = False
 GEMINI_AVAILABLE = False
+genai = None
+
+_init_lock = threading.Lock()
+_initialized = set()
+
+
+def init_output_dirs() -> None:
+    """出力先とアーティファクトストアのフォルダを作成する"""
+    BASE_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    ARTIFACT_STORE_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def init_playwright_environment() -> None:
+    """Playwright用のサンドボックスHOMEを作成し、ブラウザの環境変数を設定する（初回のみ）"""
+    with _init_lock:
+        if "playwright" in _initialized:
+            return
+        # Playwrightのクラッシュレポーターを無効化して権限エラーを避ける
+        os.environ.setdefault("PLAYWRIGHT_SKIP_CRASH_REPORTER", "1")
+        os.environ.setdefault("PLAYWRIGHT_BROWSERS_PATH", str(DEFAULT_PLAYWRIGHT_BROWSERS))
+        CRASH_DUMPS_DIR.mkdir(parents=True, exist_ok=True)
+        _initialized.add("playwright")
+
+
+def init_gemini() -> bool:
+    """google-generativeai を読み込んでAPIキーを設定する（初回のみ）。Gemini OCRが使えるかを返す"""
+    global genai, GENAI_LIB_AVAILABLE, GEMINI_AVAILABLE
+    with _init_lock:
+        if "gemini" in _initialized:
+            return GEMINI_AVAILABLE
+        _initialized.add("gemini")
+        try:
+            import google.generativeai as genai_module
+        except ImportError:
+            return GEMINI_AVAILABLE
+        genai = genai_module
+        GENAI_LIB_AVAILABLE = True
+        if GOOGLE_API_KEY:
+            genai.configure(api_key=GOOGLE_API_KEY)
+            GEMINI_AVAILABLE = True
+        return GEMINI_AVAILABLE
+
+
+def init_runtime() -> None:
+    """CLI・GUIの開始時に呼ぶ初期化（出力先・Playwright環境・Gemini）"""
+    init_output_dirs()
+    init_playwright_environment()
+    init_gemini()
 
-# APIキーを設定
-if GENAI_LIB_AVAILABLE and GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    GEMINI_AVAILABLE = True
 
 SLICE_HEIGHT_DEFAULT = 1400
 SLICE_OVERLAP_DEFAULT = 120
+OCR_MODEL_NAME = "gemini-2.5-flash"
+METRICS_FILENAME = "metrics.json"
+MANIFEST_FILENAME = "run_manifest.json"
+MANIFEST_VERSION = 1
+
+# 隣接セグメントの重なり帯で重複した行を検出するための設定
+SEAM_WINDOW_LINES = 8
+SEAM_SIMILARITY_THRESHOLD = 0.85
+SEAM_MIN_CONTAINED_CHARS = 6
+ALIGNMENT_STRIP_PATTERN = re.compile(r"[\s#*>\-\[\]`_|・、。，,.．!！?？:：;；「」『』()（）【】]+")
+ALIGNMENT_DIGITS_PATTERN = re.compile(r"\d+")
+
+# 100万トークンあたりの単価(USD)。設定されている場合のみ推定コストを算出する
+GEMINI_INPUT_PRICE_PER_1M = float(os.getenv("GEMINI_INPUT_PRICE_PER_1M", "0") or 0)
+GEMINI_OUTPUT_PRICE_PER_1M = float(os.getenv("GEMINI_OUTPUT_PRICE_PER_1M", "0") or 0)
 VIEWPORT_SIZE = {"width": 1400, "height": 900}
 
 
@@ -140,6 +194,7 @@ def build_browser_env() -> dict:
 
 
 def launch_browser(playwright):
+    init_playwright_environment()
     launch_env = build_browser_env()
 
     def attempt(label, launcher):
@@ -187,6 +242,11 @@ def launch_browser(playwright):
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="WebサイトのOCR文字起こしツール")
     parser.add_argument("--url", dest="url", help="文字起こし対象のURL")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="前回の実行結果（latest）と画像ハッシュを比較し、変化したセグメントだけOCRします",
+    )
     parser.add_argument(
         "--slice-height",
         dest="slice_height",
@@ -205,6 +265,7 @@ def parse_args() -> argparse.Namespace:
 
 
 def ensure_ocr_ready() -> None:
+    init_gemini()
     if not GENAI_LIB_AVAILABLE:
         print("⚠️ ライブラリ `google-generativeai` が見つからないため、Gemini OCRは利用できません。")
         print("   `pip install google-generativeai` でインストール可能です。")
@@ -220,6 +281,8 @@ def ensure_ocr_ready() -> None:
 
 
 def load_page(page, url: str) -> None:
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
     print(f"📄 ページを読み込み中: {url}")
     try:
         page.goto(url, wait_until="domcontentloaded", timeout=120000)
@@ -295,6 +358,7 @@ def capture_page_screenshots(page, run_dir: Path) -> tuple[Path, List[Dict[str,
     except Exception as error:
         print(f"⚠️ フルページのスクリーンショット取得に失敗したため、分割キャプチャに切り替えます: {error}")
         segment_paths = capture_fallback_segments(page, run_dir, parts=2)
+        from PIL import Image
 
         segments_meta = []
         offset = 0
@@ -383,6 +447,8 @@ def capture_fallback_segments(
 
 
 def merge_segment_images(segment_paths: List[Path], output_path: Path) -> None:
+    from PIL import Image
+
     images = [Image.open(p).convert("RGB") for p in segment_paths]
     try:
         width = max(img.width for img in images)
@@ -419,16 +485,118 @@ def extract_text_from_genai_response(response) -> str:
     return "\n".join(texts)
 
 
-def run_gemini_ocr(image_path: str) -> str:
+def extract_usage_from_genai_response(response) -> Dict[str, int]:
+    """usage_metadata からトークン数を取り出す（取得できない項目は0）"""
+    usage = getattr(response, "usage_metadata", None) if response is not None else None
+
+    def _count(field: str) -> int:
+        if usage is None:
+            return 0
+        try:
+            return int(getattr(usage, field, 0) or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    return {
+        "prompt_tokens": _count("prompt_token_count"),
+        "output_tokens": _count("candidates_token_count"),
+        "total_tokens": _count("total_token_count"),
+    }
+
+
+def estimate_cost_usd(prompt_tokens: int, output_tokens: int) -> Optional[float]:
+    if not GEMINI_INPUT_PRICE_PER_1M and not GEMINI_OUTPUT_PRICE_PER_1M:
+        return None
+    cost = (
+        prompt_tokens * GEMINI_INPUT_PRICE_PER_1M
+        + output_tokens * GEMINI_OUTPUT_PRICE_PER_1M
+    ) / 1_000_000
+    return round(cost, 6)
+
+
+def build_gemini_call_record(
+    label: str,
+    model_name: str,
+    response,
+    started_at: float,
+    retries: int = 0,
+    error: Optional[Exception] = None,
+) -> Dict[str, Any]:
+    """Gemini呼び出し1回分のトークン数・レイテンシ・リトライ回数を記録する"""
+    try:
+        usage = extract_usage_from_genai_response(response)
+    except Exception:
+        usage = extract_usage_from_genai_response(None)
+
+    record: Dict[str, Any] = {
+        "label": label,
+        "model": model_name,
+        **usage,
+        "latency_seconds": round(time.perf_counter() - started_at, 3),
+        "retries": retries,
+    }
+    cost = estimate_cost_usd(usage["prompt_tokens"], usage["output_tokens"])
+    if cost is not None:
+        record["estimated_cost_usd"] = cost
+    if error is not None:
+        record["error"] = str(error)
+    return record
+
+
+def summarize_gemini_calls(calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """呼び出し記録を合計し、モデル別の内訳も付けて返す"""
+    totals: Dict[str, Any] = {
+        "calls": 0,
+        "errors": 0,
+        "prompt_tokens": 0,
+        "output_tokens": 0,
+        "total_tokens": 0,
+        "latency_seconds": 0.0,
+        "retries": 0,
+        "by_model": {},
+    }
+    cost_total: Optional[float] = None
+
+    for call in calls:
+        if not call:
+            continue
+        totals["calls"] += 1
+        if call.get("error"):
+            totals["errors"] += 1
+        for key in ("prompt_tokens", "output_tokens", "total_tokens", "retries"):
+            totals[key] += int(call.get(key, 0) or 0)
+        totals["latency_seconds"] += float(call.get("latency_seconds", 0.0) or 0.0)
+        if call.get("estimated_cost_usd") is not None:
+            cost_total = (cost_total or 0.0) + float(call["estimated_cost_usd"])
+
+        model_totals = totals["by_model"].setdefault(
+            call.get("model", "unknown"),
+            {"calls": 0, "prompt_tokens": 0, "output_tokens": 0},
+        )
+        model_totals["calls"] += 1
+        model_totals["prompt_tokens"] += int(call.get("prompt_tokens", 0) or 0)
+        model_totals["output_tokens"] += int(call.get("output_tokens", 0) or 0)
+
+    totals["latency_seconds"] = round(totals["latency_seconds"], 3)
+    if cost_total is not None:
+        totals["estimated_cost_usd"] = round(cost_total, 6)
+    return totals
+
+
+def run_gemini_ocr(image_path: str, call_log: Optional[List[Dict[str, Any]]] = None) -> str:
     """
     Gemini APIを呼び出して画像からテキストを抽出する
+
+    call_log を渡すと、呼び出しごとのトークン数・レイテンシを追記する。
     """
-    if not GEMINI_AVAILABLE:
+    if not init_gemini():
         return ""
 
+    started_at = time.perf_counter()
+    response = None
     try:
         print(f"    - Gemini APIでOCR処理中: {Path(image_path).name}")
-        model = genai.GenerativeModel("gemini-2.5-flash")
+        model = genai.GenerativeModel(OCR_MODEL_NAME)
         image_file = genai.upload_file(path=image_path)
         try:
             response = model.generate_content(
@@ -482,17 +650,25 @@ def run_gemini_ocr(image_path: str) -> str:
                 pass
 
         text = extract_text_from_genai_response(response).strip()
+        if call_log is not None:
+            call_log.append(
+                build_gemini_call_record(Path(image_path).name, OCR_MODEL_NAME, response, started_at)
+            )
         return text
 
     except Exception as e:
         print(f"❌ Gemini APIの呼び出し中にエラーが発生しました: {e}")
+        if call_log is not None:
+            call_log.append(
+                build_gemini_call_record(Path(image_path).name, OCR_MODEL_NAME, response, started_at, error=e)
+            )
         return ""
 
 
 def run_ocr_on_segments(segments: List[Dict[str, any]]) -> List[Dict[str, any]]:
     results: List[Dict[str, any]] = []
 
-    if not GEMINI_AVAILABLE:
+    if not init_gemini():
         print("⚠️ Gemini OCRが利用できないため、OCRセグメント処理をスキップします。")
         for segment in segments:
             results.append(
@@ -508,11 +684,19 @@ def run_ocr_on_segments(segments: List[Dict[str, any]]) -> List[Dict[str, any]]:
         return results
 
     for segment in segments:
-        print(f"🔍 セグメント {segment['index']} をGeminiでOCR処理中...")
-        # Gemini OCRを実行
-        ocr_raw = run_gemini_ocr(segment["path"])
+        image_sha256 = segment.get("image_sha256") or blob_store.file_sha256(segment["path"])
+        cached = blob_store.load_ocr_cache(ARTIFACT_STORE_DIR, image_sha256, OCR_MODEL_NAME)
+        calls: List[Dict[str, Any]] = []
+        if cached is not None:
+            print(f"♻️ セグメント {segment['index']} はOCRキャッシュを使用します")
+            raw_text = cached.get("raw_text", "")
+        else:
+            print(f"🔍 セグメント {segment['index']} をGeminiでOCR処理中...")
+            # Gemini OCRを実行
+            ocr_raw = run_gemini_ocr(segment["path"], call_log=calls)
+            raw_text = ocr_raw.strip()
+            blob_store.save_ocr_cache(ARTIFACT_STORE_DIR, image_sha256, OCR_MODEL_NAME, raw_text)
 
-        raw_text = ocr_raw.strip()
         clean_text = clean_ocr_text(raw_text)
 
         results.append(
@@ -523,6 +707,9 @@ def run_ocr_on_segments(segments: List[Dict[str, any]]) -> List[Dict[str, any]]:
                 "bottom": segment["bottom"],
                 "raw_text": raw_text,
                 "clean_text": clean_text,
+                "usage": calls[-1] if calls else None,
+                "image_sha256": image_sha256,
+                "ocr_cache_hit": cached is not None,
             }
         )
 
@@ -557,103 +744,529 @@ def clean_ocr_text(raw_text: str) -> str:
     if buffer:
         paragraphs.append("".join(buffer))
 
+    # OCRが同じ段落を続けて出力した場合のみ除去する（離れた位置の同一文言はLPの構成として残す）
     deduped: List[str] = []
-    seen = set()
+    previous_key: Optional[str] = None
 
     for paragraph in paragraphs:
-        key = paragraph.replace(" ", "")
-        if key in seen:
+        key = normalize_for_alignment(paragraph)
+        if key == previous_key:
             continue
-        seen.add(key)
+        previous_key = key
         deduped.append(paragraph)
 
     return "\n".join(deduped)
 
 
-def combine_clean_segments(segments: List[Dict[str, str]]) -> str:
-    combined: List[str] = []
-    seen = set()
+def normalize_for_alignment(text: str) -> str:
+    """OCR揺れを吸収するため、空白・記号・Markdown装飾を除いた比較用キーを作る"""
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    return ALIGNMENT_STRIP_PATTERN.sub("", normalized)
+
+
+def _splits_digit_run(text: str, start: int, end: int) -> bool:
+    """text[start:end] の両端が数字の途中で切れているか（「1000」が「11000」の一部に見えるのを防ぐ）"""
+    if 0 < start < len(text) and text[start - 1].isdigit() and text[start].isdigit():
+        return True
+    return 0 < end < len(text) and text[end - 1].isdigit() and text[end].isdigit()
+
+
+def _alignment_keys_match(previous_key: str, next_key: str) -> bool:
+    if previous_key == next_key:
+        return True
+    if not previous_key or not next_key:
+        return False
+
+    shorter, longer = sorted((previous_key, next_key), key=len)
+    # 重なり帯の境目で行が途中から/途中までしか写っていないケース
+    if len(shorter) >= max(SEAM_MIN_CONTAINED_CHARS, len(longer) // 2):
+        position = longer.find(shorter)
+        if position >= 0 and not _splits_digit_run(longer, position, position + len(shorter)):
+            return True
+
+    # 金額・数量だけが違う行（「料金 1000円」と「料金 1500円」など）は別の行として扱う
+    if ALIGNMENT_DIGITS_PATTERN.findall(previous_key) != ALIGNMENT_DIGITS_PATTERN.findall(next_key):
+        return False
+
+    matcher = SequenceMatcher(None, previous_key, next_key, autojunk=False)
+    if matcher.quick_ratio() < SEAM_SIMILARITY_THRESHOLD:
+        return False
+    return matcher.ratio() >= SEAM_SIMILARITY_THRESHOLD
+
+
+def find_seam_overlap(previous_keys: List[str], next_keys: List[str]) -> int:
+    """前セグメント末尾と次セグメント先頭が一致する最長の行数を返す
+
+    比較は末尾/先頭の SEAM_WINDOW_LINES 行に限定するため、継ぎ目あたりの処理量は一定で
+    全体としてテキスト長に対して線形になる。
+    """
+    max_lines = min(len(previous_keys), len(next_keys), SEAM_WINDOW_LINES)
+    for size in range(max_lines, 0, -1):
+        tail = previous_keys[-size:]
+        head = next_keys[:size]
+        if all(_alignment_keys_match(a, b) for a, b in zip(tail, head)):
+            return size
+    return 0
+
+
+def merge_segments_at_seams(segments: List[Dict[str, Any]]) -> tuple[str, List[Dict[str, Any]]]:
+    """隣接セグメントの重なり部分を継ぎ目で揃えて結合し、継ぎ目ごとの除去結果も返す
+
+    数字だけが違う行は重なりとみなさない（料金表が継ぎ目をまたいでも行を失わない）:
+
+    >>> text, seams = merge_segments_at_seams([
+    ...     {"index": 1, "clean_text": "## 月額料金\\nライト 1000円\\nスタンダード 2000円"},
+    ...     {"index": 2, "clean_text": "ライト 1500円\\nスタンダード 2500円\\n## 年額料金"},
+    ... ])
+    >>> seams[0]["removed_lines"], text.count("円")
+    (0, 4)
+    >>> text, seams = merge_segments_at_seams([
+    ...     {"index": 1, "clean_text": "ライト 1000円\\nスタンダード 2000円"},
+    ...     {"index": 2, "clean_text": "スタンダード 2,000円\\nプレミアム 3000円"},
+    ... ])
+    >>> seams[0]["removed"], text.count("円")
+    (['スタンダード 2,000円'], 3)
+    """
+    merged_lines: List[str] = []
+    merged_keys: List[str] = []
+    seams: List[Dict[str, Any]] = []
+    previous_index: Optional[int] = None
 
     for segment in segments:
         text = segment.get("clean_text", "").strip()
         if not text:
             continue
 
-        for paragraph in [p.strip() for p in text.split("\n") if p.strip()]:
-            if paragraph in seen:
-                continue
-            seen.add(paragraph)
-            combined.append(paragraph)
+        paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
+        keys = [normalize_for_alignment(p) for p in paragraphs]
+
+        overlap = 0
+        if merged_lines:
+            overlap = find_seam_overlap(merged_keys, keys)
+            for offset in range(overlap):
+                position = len(merged_lines) - overlap + offset
+                # 継ぎ目で切れていた側より完全な行が写っている方を残す
+                if len(keys[offset]) > len(merged_keys[position]):
+                    merged_lines[position] = paragraphs[offset]
+                    merged_keys[position] = keys[offset]
+            seams.append(
+                {
+                    "previous_index": previous_index,
+                    "index": segment.get("index"),
+                    "removed_lines": overlap,
+                    "removed": paragraphs[:overlap],
+                }
+            )
 
-    return "\n\n".join(combined)
+        merged_lines.extend(paragraphs[overlap:])
+        merged_keys.extend(keys[overlap:])
+        previous_index = segment.get("index")
 
+    return "\n\n".join(merged_lines), seams
 
-def save_markdown(result: Dict) -> Path:
-    md_path = result["run_dir"] / "website_transcription.md"
 
-    with open(md_path, "w", encoding="utf-8") as f:
-        f.write("# WebサイトOCR文字起こし結果\n\n")
-        f.write(f"**URL:** {result['url']}\n\n")
-        f.write(f"**抽出日時:** {result['timestamp']}\n\n")
-        f.write(f"**スクリーンショット:** {result['screenshot'].name}\n\n")
-        f.write(f"**分割数:** {len(result['segments'])} 枚\n\n")
-
-        if result.get("meta"):
-            f.write("## メタ情報\n\n")
-            f.write(f"- タイトル: {result['meta'].get('title', '')}\n")
-            if result['meta'].get('description'):
-                f.write(
-                    f"- 説明: {result['meta'].get('description', '').strip()}\n"
-                )
-            if result['meta'].get('keywords'):
-                f.write(f"- キーワード: {result['meta'].get('keywords', '').strip()}\n")
-            f.write("\n")
-
-        if result.get("combined_text"):
-            f.write("## 整理済みテキスト\n\n")
-            f.write(result["combined_text"] + "\n\n")
-
-        if result.get("visible_text"):
-            f.write("## Playwright抽出テキスト\n\n")
-            f.write("```\n")
-            f.write(result["visible_text"])
-            f.write("\n```\n\n")
-
-        f.write("## OCRセグメント詳細\n\n")
-        for segment in result["segments"]:
-            f.write(f"### セグメント {segment['index']:02d}\n\n")
-            f.write(f"- ファイル: {segment['path'].name}\n")
-            f.write(
-                f"- 位置: {segment['top']}px 〜 {segment['bottom']}px\n\n"
+def combine_clean_segments(segments: List[Dict[str, str]]) -> str:
+    combined_text, _ = merge_segments_at_seams(segments)
+    return combined_text
+
+
+def store_capture_artifacts(screenshot_path: Path, segments: List[Dict[str, Any]]) -> None:
+    """スクリーンショットと分割画像をコンテンツアドレス型ストアへ移し、ハッシュを記録する"""
+    for segment in segments:
+        try:
+            segment["image_sha256"] = blob_store.store_file(
+                ARTIFACT_STORE_DIR, segment["path"], segment.get("image_sha256")
             )
+        except OSError as error:
+            print(f"⚠️ 分割画像をストアへ保存できませんでした ({segment['path']}): {error}")
+            segment["image_sha256"] = file_sha256(segment["path"])
+    try:
+        blob_store.store_file(ARTIFACT_STORE_DIR, screenshot_path)
+    except OSError as error:
+        print(f"⚠️ スクリーンショットをストアへ保存できませんでした: {error}")
+
+
+def file_sha256(path) -> Optional[str]:
+    try:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except OSError:
+        return None
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def build_run_manifest(result: Dict) -> Dict[str, Any]:
+    """文字起こし結果を機械可読なマニフェスト(JSON)に変換する"""
+    screenshot = result.get("screenshot")
+    segments = []
+    calls: List[Dict[str, Any]] = []
+    for segment in result.get("segments", []):
+        if segment.get("usage"):
+            calls.append(segment["usage"])
+        segments.append(
+            {
+                "index": segment.get("index"),
+                "top": segment.get("top"),
+                "bottom": segment.get("bottom"),
+                "path": str(segment.get("path", "")),
+                "image_sha256": segment.get("image_sha256"),
+                "text_sha256": text_sha256(segment.get("clean_text", "")),
+                "raw_text": segment.get("raw_text", ""),
+                "clean_text": segment.get("clean_text", ""),
+                "usage": segment.get("usage"),
+                "reused_from": segment.get("reused_from"),
+                "ocr_cache_hit": bool(segment.get("ocr_cache_hit")),
+            }
+        )
+
+    return {
+        "version": MANIFEST_VERSION,
+        "url": result.get("url"),
+        "timestamp": result.get("timestamp"),
+        "keyword_slug": result.get("keyword_slug"),
+        "run_dir": str(result.get("run_dir", "")),
+        "slice_height": result.get("slice_height"),
+        "overlap": result.get("overlap"),
+        "meta": result.get("meta") or {},
+        "artifact_store": str(ARTIFACT_STORE_DIR),
+        "screenshot": {
+            "path": str(screenshot) if screenshot else None,
+            "sha256": file_sha256(screenshot) if screenshot else None,
+        },
+        "segments": segments,
+        "seams": [
+            {key: seam[key] for key in ("previous_index", "index", "removed_lines")}
+            for seam in result.get("seams", [])
+        ],
+        "combined_text": result.get("combined_text", ""),
+        "visible_text": result.get("visible_text", ""),
+        "combined_text_sha256": text_sha256(result.get("combined_text", "")),
+        "timings": result.get("timings", {}),
+        "changes": result.get("changes"),
+        "pyramid": {
+            key: value
+            for key, value in (result.get("pyramid") or {}).items()
+            if key in ("width", "height", "tile_size", "format", "max_level")
+        },
+        "usage": summarize_gemini_calls(calls),
+        "outputs": dict(result.get("outputs", {})),
+    }
 
-            if segment.get("clean_text"):
-                f.write("**整形テキスト**\n\n")
-                f.write("```\n")
-                f.write(segment["clean_text"])
-                f.write("\n```\n\n")
 
-            if segment.get("raw_text") and segment.get("raw_text") != segment.get("clean_text"):
-                f.write("**OCR生テキスト**\n\n")
-                f.write("```\n")
-                f.write(segment["raw_text"])
-                f.write("\n```\n\n")
+def save_run_manifest(result: Dict) -> Path:
+    manifest = build_run_manifest(result)
+    result["manifest"] = manifest
+    return write_run_manifest(result["run_dir"], manifest)
+
+
+def write_run_manifest(run_dir: Path, manifest: Dict[str, Any]) -> Path:
+    manifest_path = Path(run_dir) / MANIFEST_FILENAME
+    tmp_path = manifest_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+    try:
+        run_index.upsert_run(RUN_INDEX_PATH, manifest)
+    except Exception as index_error:
+        print(f"⚠️ 実行インデックスの更新に失敗しました: {index_error}")
+    return manifest_path
+
+
+def load_run_manifest(run_dir: Path) -> Optional[Dict[str, Any]]:
+    manifest_path = Path(run_dir) / MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as error:
+        print(f"⚠️ マニフェストの読み込みに失敗しました ({manifest_path}): {error}")
+        return None
+
+
+def register_output(result: Dict, key: str, path: Path) -> None:
+    """生成したファイルのパスをマニフェストの outputs に記録する"""
+    result.setdefault("outputs", {})[key] = str(path)
+    manifest = result.get("manifest")
+    if manifest is None:
+        return
+    manifest.setdefault("outputs", {})[key] = str(path)
+    write_run_manifest(result["run_dir"], manifest)
+
+
+def record_run_output(run_dir: Path, key: str, path: Path) -> None:
+    """既存の run_dir のマニフェストに後段ツールの出力パスを追記する"""
+    manifest = load_run_manifest(run_dir)
+    if manifest is None:
+        return
+    manifest.setdefault("outputs", {})[key] = str(path)
+    write_run_manifest(run_dir, manifest)
+
+
+def find_previous_run_manifest(output_root: Path, url: str) -> Optional[Dict[str, Any]]:
+    """同じURLの直近の実行マニフェストを探す（インデックス → latest → run_* 走査の順）"""
+    try:
+        indexed = run_index.latest_run(RUN_INDEX_PATH, output_root=output_root, url=url)
+    except Exception as index_error:
+        print(f"⚠️ 実行インデックスの検索に失敗しました: {index_error}")
+        indexed = None
+    if indexed:
+        manifest = load_run_manifest(Path(indexed["run_dir"]))
+        if manifest:
+            return manifest
+
+    latest_manifest = load_run_manifest(output_root / "latest")
+    if latest_manifest and latest_manifest.get("url") == url:
+        return latest_manifest
+
+    if not output_root.exists():
+        return None
+    run_dirs = sorted(
+        (p for p in output_root.iterdir() if p.is_dir() and p.name.startswith("run_")),
+        key=lambda p: p.name,
+        reverse=True,
+    )
+    for run_dir in run_dirs:
+        manifest = load_run_manifest(run_dir)
+        if manifest and manifest.get("url") == url:
+            return manifest
+    return None
+
+
+def match_previous_segments(
+    segments: List[Dict[str, Any]],
+    previous_manifest: Dict[str, Any],
+) -> Dict[int, Dict[str, Any]]:
+    """画像ハッシュが一致する前回セグメントを、縦位置が最も近いものから対応付ける"""
+    previous_by_hash: Dict[str, List[Dict[str, Any]]] = {}
+    for previous in previous_manifest.get("segments", []):
+        if previous.get("image_sha256"):
+            previous_by_hash.setdefault(previous["image_sha256"], []).append(previous)
+
+    matches: Dict[int, Dict[str, Any]] = {}
+    for segment in segments:
+        candidates = previous_by_hash.get(segment.get("image_sha256") or "")
+        if candidates:
+            matches[segment["index"]] = min(
+                candidates, key=lambda previous: abs((previous.get("top") or 0) - segment["top"])
+            )
+    return matches
+
 
+def run_incremental_ocr(
+    segments_meta: List[Dict[str, Any]],
+    previous_manifest: Dict[str, Any],
+    **ocr_kwargs,
+) -> tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """前回から変化したセグメントだけOCRし、残りは保存済みテキストを再利用する"""
+    for segment in segments_meta:
+        segment["image_sha256"] = file_sha256(segment["path"])
+
+    matches = match_previous_segments(segments_meta, previous_manifest)
+    changed = [segment for segment in segments_meta if segment["index"] not in matches]
+    print(f"♻️ 前回の実行から {len(matches)} セグメントを再利用し、{len(changed)} セグメントをOCRします")
+
+    ocr_by_index = {
+        segment["index"]: segment
+        for segment in (run_ocr_on_segments(changed, **ocr_kwargs) if changed else [])
+    }
+
+    results: List[Dict[str, Any]] = []
+    moved: List[Dict[str, int]] = []
+    for segment in segments_meta:
+        previous = matches.get(segment["index"])
+        if previous is None:
+            results.append(ocr_by_index[segment["index"]])
+            continue
+        results.append(
+            {
+                "index": segment["index"],
+                "path": Path(segment["path"]),
+                "top": segment["top"],
+                "bottom": segment["bottom"],
+                "raw_text": previous.get("raw_text", ""),
+                "clean_text": previous.get("clean_text", ""),
+                "usage": None,
+                "reused_from": previous.get("index"),
+            }
+        )
+        if previous.get("top") != segment["top"]:
+            moved.append(
+                {
+                    "index": segment["index"],
+                    "previous_index": previous.get("index"),
+                    "top": segment["top"],
+                    "previous_top": previous.get("top"),
+                }
+            )
+
+    matched_previous = {previous.get("index") for previous in matches.values()}
+    changes = {
+        "previous_run_dir": previous_manifest.get("run_dir"),
+        "previous_timestamp": previous_manifest.get("timestamp"),
+        "reused": sorted(matches),
+        "ocr": [segment["index"] for segment in changed],
+        "moved": moved,
+        "removed": [
+            previous.get("index")
+            for previous in previous_manifest.get("segments", [])
+            if previous.get("index") not in matched_previous
+        ],
+        "text_changed": text_sha256(previous_manifest.get("combined_text", ""))
+        != text_sha256(combine_clean_segments(results)),
+    }
+    return results, changes
+
+
+def render_markdown(manifest: Dict[str, Any]) -> str:
+    lines: List[str] = []
+    write = lines.append
+
+    write("# WebサイトOCR文字起こし結果\n\n")
+    write(f"**URL:** {manifest['url']}\n\n")
+    write(f"**抽出日時:** {manifest['timestamp']}\n\n")
+    screenshot_path = manifest.get("screenshot", {}).get("path")
+    write(f"**スクリーンショット:** {Path(screenshot_path).name if screenshot_path else ''}\n\n")
+    write(f"**分割数:** {len(manifest['segments'])} 枚\n\n")
+
+    meta = manifest.get("meta")
+    if meta:
+        write("## メタ情報\n\n")
+        write(f"- タイトル: {meta.get('title', '')}\n")
+        if meta.get('description'):
+            write(f"- 説明: {meta.get('description', '').strip()}\n")
+        if meta.get('keywords'):
+            write(f"- キーワード: {meta.get('keywords', '').strip()}\n")
+        write("\n")
+
+    if manifest.get("combined_text"):
+        write("## 整理済みテキスト\n\n")
+        write(manifest["combined_text"] + "\n\n")
+
+    if manifest.get("visible_text"):
+        write("## Playwright抽出テキスト\n\n")
+        write("```\n")
+        write(manifest["visible_text"])
+        write("\n```\n\n")
+
+    write("## OCRセグメント詳細\n\n")
+    for segment in manifest["segments"]:
+        write(f"### セグメント {segment['index']:02d}\n\n")
+        write(f"- ファイル: {Path(segment['path']).name}\n")
+        write(f"- 位置: {segment['top']}px 〜 {segment['bottom']}px\n\n")
+
+        if segment.get("clean_text"):
+            write("**整形テキスト**\n\n")
+            write("```\n")
+            write(segment["clean_text"])
+            write("\n```\n\n")
+
+        if segment.get("raw_text") and segment.get("raw_text") != segment.get("clean_text"):
+            write("**OCR生テキスト**\n\n")
+            write("```\n")
+            write(segment["raw_text"])
+            write("\n```\n\n")
+
+    return "".join(lines)
+
+
+def render_plain_text(manifest: Dict[str, Any]) -> str:
+    return manifest.get("combined_text") or manifest.get("visible_text", "")
+
+
+def save_markdown(result: Dict) -> Path:
+    manifest = result.get("manifest") or build_run_manifest(result)
+    md_path = result["run_dir"] / "website_transcription.md"
+
+    with open(md_path, "w", encoding="utf-8") as f:
+        f.write(render_markdown(manifest))
+
+    register_output(result, "markdown", md_path)
     return md_path
 
 
 def save_plain_text(result: Dict) -> Path:
+    manifest = result.get("manifest") or build_run_manifest(result)
     txt_path = result["run_dir"] / "website_transcription.txt"
 
     with open(txt_path, "w", encoding="utf-8") as f:
-        if result.get("combined_text"):
-            f.write(result["combined_text"])
-        else:
-            f.write(result.get("visible_text", ""))
+        f.write(render_plain_text(manifest))
 
+    register_output(result, "text", txt_path)
     return txt_path
 
 
+def build_transcription_metrics(result: Dict) -> Dict[str, Any]:
+    """セグメント単位・ジョブ単位のGemini利用量を集計する"""
+    segment_metrics = []
+    calls: List[Dict[str, Any]] = []
+    for segment in result.get("segments", []):
+        usage = segment.get("usage")
+        if usage:
+            calls.append(usage)
+        segment_metrics.append(
+            {
+                "index": segment.get("index"),
+                "top": segment.get("top"),
+                "bottom": segment.get("bottom"),
+                "usage": usage,
+            }
+        )
+
+    return {
+        "url": result.get("url"),
+        "timestamp": result.get("timestamp"),
+        "slice_height": result.get("slice_height"),
+        "overlap": result.get("overlap"),
+        "segments_count": len(segment_metrics),
+        "segments": segment_metrics,
+        "seams": [
+            {key: seam[key] for key in ("previous_index", "index", "removed_lines")}
+            for seam in result.get("seams", [])
+        ],
+        "calls": [],
+        "totals": summarize_gemini_calls(calls),
+    }
+
+
+def save_metrics(result: Dict) -> Path:
+    metrics = build_transcription_metrics(result)
+    result["metrics"] = metrics
+
+    metrics_path = result["run_dir"] / METRICS_FILENAME
+    with open(metrics_path, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+
+    register_output(result, "metrics", metrics_path)
+    return metrics_path
+
+
+def append_metrics_calls(run_dir: Path, calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """OCR以外のGemini呼び出し（分析など）を run_dir の metrics.json に追記し、合計を更新する"""
+    metrics_path = run_dir / METRICS_FILENAME
+    metrics: Dict[str, Any] = {"segments": [], "calls": []}
+    if metrics_path.exists():
+        try:
+            metrics = json.loads(metrics_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as error:
+            print(f"⚠️ metrics.json の読み込みに失敗したため作り直します: {error}")
+
+    metrics.setdefault("calls", []).extend(call for call in calls if call)
+    segment_calls = [seg["usage"] for seg in metrics.get("segments", []) if seg.get("usage")]
+    metrics["totals"] = summarize_gemini_calls(segment_calls + metrics["calls"])
+
+    with open(metrics_path, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+
+    return metrics
+
+
 def cleanup_segment_images(result: Dict) -> None:
     segments_dir = result["run_dir"] / "segments"
     if segments_dir.exists():
@@ -681,49 +1294,58 @@ def update_latest_symlink(run_dir: Path, output_root: Optional[Path] = None) ->
         print(f"⚠️ 最新出力リンクの更新に失敗しました: {link_error}")
 
 
-def transcribe_website(
+def create_run_dir(output_root: Path) -> Path:
+    """run_<日時> フォルダを作成する。並列実行で同じ秒に重なった場合は連番を付ける"""
+    output_root.mkdir(parents=True, exist_ok=True)
+    base_name = f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    run_dir = output_root / base_name
+    suffix = 1
+    while True:
+        try:
+            run_dir.mkdir()
+            return run_dir
+        except FileExistsError:
+            suffix += 1
+            run_dir = output_root / f"{base_name}_{suffix}"
+
+
+def capture_website(
     url: str,
     slice_height: int,
     overlap: int,
     keyword_slug: Optional[str] = None,
-) -> Dict:
+) -> Dict[str, Any]:
+    """ブラウザでページを開き、メタ情報・表示テキスト・スクリーンショットを取得する（OCR前の段階）"""
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     output_root = get_output_root(keyword_slug)
-    run_dir = output_root / f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    run_dir.mkdir(parents=True, exist_ok=True)
+    run_dir = create_run_dir(output_root)
 
     screenshot_path: Optional[Path] = None
-
-    with sync_playwright() as playwright:
-        clear_playwright_quarantine()
-        prepare_chromium_environment()
-        browser = launch_browser(playwright)
-
-        device_profile = playwright.devices.get("iPhone 12")
-        context_options = {
-            "locale": "ja-JP",
-            "timezone_id": "Asia/Tokyo",
-        }
-
-        if device_profile:
-            context_options.update(device_profile)
-        else:
-            context_options.update(
-                {
-                    "viewport": {"width": 390, "height": 844},
-                    "user_agent": (
-                        "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) "
-                        "AppleWebKit/605.1.15 (KHTML, like Gecko) "
-                        "Version/16.0 Mobile/15E148 Safari/604.1"
-                    ),
-                    "is_mobile": True,
-                    "device_scale_factor": 3,
-                    "has_touch": True,
-                }
-            )
-
-        context = browser.new_context(**context_options)
-
+    capture_started_at = time.perf_counter()
+
+    init_playwright_environment()
+    clear_playwright_quarantine()
+    prepare_chromium_environment()
+
+    # 共有セッションがあればそのブラウザにURLごとのコンテキストを作る（無ければこのURLだけ起動する）
+    with browser_session.stage_context(
+        headless=True,
+        launcher=launch_browser,
+        device="iPhone 12",
+        device_fallback={
+            "viewport": {"width": 390, "height": 844},
+            "user_agent": (
+                "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) "
+                "AppleWebKit/605.1.15 (KHTML, like Gecko) "
+                "Version/16.0 Mobile/15E148 Safari/604.1"
+            ),
+            "is_mobile": True,
+            "device_scale_factor": 3,
+            "has_touch": True,
+        },
+        locale="ja-JP",
+        timezone_id="Asia/Tokyo",
+    ) as context:
         page = context.new_page()
 
         meta: Dict[str, str] = {}
@@ -737,8 +1359,7 @@ def transcribe_website(
             screenshot_path, segments_meta = capture_page_screenshots(page, run_dir)
 
         finally:
-            context.close()
-            browser.close()
+            page.close()
 
     if not segments_meta:
         segments_meta = [
@@ -753,32 +1374,103 @@ def transcribe_website(
     if not screenshot_path:
         raise RuntimeError("スクリーンショットの取得に失敗しました。")
 
-    ocr_segments = run_ocr_on_segments(segments_meta)
-    combined_text = combine_clean_segments(ocr_segments)
+    return {
+        "url": url,
+        "timestamp": timestamp,
+        "run_dir": run_dir,
+        "screenshot": screenshot_path,
+        "segments_meta": segments_meta,
+        "meta": meta,
+        "visible_text": visible_text,
+        "slice_height": slice_height,
+        "overlap": overlap,
+        "keyword_slug": keyword_slug,
+        "output_root": output_root,
+        "capture_seconds": time.perf_counter() - capture_started_at,
+        "pyramid_future": image_pyramid.submit_pyramid(screenshot_path),
+    }
+
+
+def transcribe_capture(capture: Dict[str, Any], incremental: bool = False) -> Dict:
+    """capture_website の結果をOCRし、結合テキストとマニフェストを作成する"""
+    url = capture["url"]
+    run_dir = capture["run_dir"]
+    output_root = capture["output_root"]
+    screenshot_path = capture["screenshot"]
+    segments_meta = capture["segments_meta"]
+    visible_text = capture["visible_text"]
+    pyramid_future = capture["pyramid_future"]
+
+    previous_manifest = find_previous_run_manifest(output_root, url) if incremental else None
+    if incremental and previous_manifest is None:
+        print("ℹ️ 同じURLの前回実行が見つからないため、全セグメントをOCRします")
+
+    changes: Optional[Dict[str, Any]] = None
+    ocr_started_at = time.perf_counter()
+    if previous_manifest is not None:
+        ocr_segments, changes = run_incremental_ocr(segments_meta, previous_manifest)
+    else:
+        ocr_segments = run_ocr_on_segments(segments_meta)
+    ocr_seconds = time.perf_counter() - ocr_started_at
+    store_capture_artifacts(screenshot_path, ocr_segments)
+    outputs: Dict[str, str] = {}
+    pyramid_info: Optional[Dict[str, Any]] = None
+    try:
+        pyramid_info = pyramid_future.result()
+        outputs["pyramid"] = pyramid_info["dzi"]
+        outputs["thumbnail"] = pyramid_info["thumbnail"]
+    except Exception as pyramid_error:
+        print(f"⚠️ プレビュー用タイルの生成に失敗しました: {pyramid_error}")
+    combined_text, seams = merge_segments_at_seams(ocr_segments)
+    removed_lines = sum(seam["removed_lines"] for seam in seams)
+    if removed_lines:
+        print(f"🧩 セグメントの重なり部分から重複行を {removed_lines} 行除去しました")
 
     if not combined_text:
         combined_text = visible_text
 
     result = {
         "url": url,
-        "timestamp": timestamp,
+        "timestamp": capture["timestamp"],
         "run_dir": run_dir,
         "screenshot": screenshot_path,
         "segments": ocr_segments,
         "combined_text": combined_text,
         "visible_text": visible_text,
-        "meta": meta,
-        "slice_height": slice_height,
-        "overlap": overlap,
-        "keyword_slug": keyword_slug,
+        "meta": capture["meta"],
+        "slice_height": capture["slice_height"],
+        "overlap": capture["overlap"],
+        "seams": seams,
+        "timings": {
+            "capture_seconds": round(capture["capture_seconds"], 3),
+            "ocr_seconds": round(ocr_seconds, 3),
+        },
+        "changes": changes,
+        "pyramid": pyramid_info,
+        "outputs": outputs,
+        "keyword_slug": capture["keyword_slug"],
         "output_root": output_root,
     }
 
+    result["manifest_path"] = save_run_manifest(result)
+
     return result
 
 
+def transcribe_website(
+    url: str,
+    slice_height: int,
+    overlap: int,
+    keyword_slug: Optional[str] = None,
+    incremental: bool = False,
+) -> Dict:
+    capture = capture_website(url, slice_height, overlap, keyword_slug=keyword_slug)
+    return transcribe_capture(capture, incremental=incremental)
+
+
 def main() -> None:
     args = parse_args()
+    init_runtime()
     ensure_ocr_ready()
 
     url = args.url or input("文字起こし対象のURLを入力してください: ").strip()
@@ -790,10 +1482,16 @@ def main() -> None:
     print("🌐 WebサイトOCR文字起こしツール (Gemini版)")
     print("=" * 70)
 
-    result = transcribe_website(url=url, slice_height=args.slice_height, overlap=args.overlap)
+    result = transcribe_website(
+        url=url,
+        slice_height=args.slice_height,
+        overlap=args.overlap,
+        incremental=args.incremental,
+    )
 
     md_path = save_markdown(result)
     txt_path = save_plain_text(result)
+    metrics_path = save_metrics(result)
     cleanup_segment_images(result)
     update_latest_symlink(result["run_dir"], output_root=result.get("output_root"))
 
@@ -803,8 +1501,21 @@ def main() -> None:
     print(f"📁 出力フォルダ: {result['run_dir']}")
     print(f"- Markdown: {md_path.name}")
     print(f"- テキスト : {txt_path.name}")
+    print(f"- マニフェスト: {result['manifest_path'].name}")
     print(f"- スクリーンショット: {result['screenshot'].name}")
     print(f"- セグメント数: {len(result['segments'])}")
+    changes = result.get("changes")
+    if changes:
+        print(
+            f"- 差分: 再利用 {len(changes['reused'])} / 再OCR {len(changes['ocr'])}"
+            f" / 位置移動 {len(changes['moved'])} / 削除 {len(changes['removed'])}"
+            f" (本文{'変更あり' if changes['text_changed'] else '変更なし'})"
+        )
+    totals = result["metrics"]["totals"]
+    print(
+        f"- Gemini利用量: {totals['calls']} 回 / 入力 {totals['prompt_tokens']} tokens"
+        f" / 出力 {totals['output_tokens']} tokens ({metrics_path.name})"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,195 @@
+"""
+Tk用のタイル表示ビューア
+
+フルページスクリーンショットを DeepZoom タイル（image_pyramid で生成）から、
+表示幅に合うレベル・見えている範囲の分だけ読み込んでスクロール表示する。
+タイルの読み込みと縮小はワーカースレッドで行い、Tkスレッドでは貼り付けのみ行う。
+"""
+
+from __future__ import annotations
+
+import math
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image, ImageTk
+
+import image_pyramid
+
+# 表示中タイルから離れたものを破棄する上限
+MAX_CACHED_TILES = 48
+PREFETCH_RATIO = 0.5
+
+
+class TiledImageViewer(tk.Frame):
+    def __init__(self, master, width: int = 560, height: int = 560, **kwargs) -> None:
+        bg = kwargs.pop("bg", None)
+        super().__init__(master, **kwargs)
+        self.canvas = tk.Canvas(self, width=width, height=height, highlightthickness=0)
+        if bg:
+            self.canvas.configure(bg=bg)
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tiles")
+        self._info: Optional[Dict[str, Any]] = None
+        self._level = 0
+        self._scale = 1.0
+        self._generation = 0
+        self._photos: Dict[Tuple[int, int], ImageTk.PhotoImage] = {}
+        self._pending: set = set()
+        self._text_id: Optional[int] = None
+
+        self.canvas.bind("<Configure>", lambda _event: self._relayout())
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda _event: self._scroll_units(-3))
+        self.canvas.bind("<Button-5>", lambda _event: self._scroll_units(3))
+
+        self.show_message("スクリーンショットはまだありません。")
+
+    # --- 公開API -----------------------------------------------------------
+
+    def show_message(self, text: str) -> None:
+        self._generation += 1
+        self._info = None
+        self._clear_tiles()
+        self.canvas.delete("all")
+        self.canvas.configure(scrollregion=(0, 0, 0, 0))
+        self._text_id = self.canvas.create_text(
+            max(self.canvas.winfo_width(), int(self.canvas.cget("width"))) // 2,
+            40,
+            text=text,
+            fill="#6B7280",
+            width=max(200, int(self.canvas.cget("width")) - 40),
+        )
+
+    def show_image(self, image_path: Path) -> None:
+        """タイルが無ければワーカーで生成し、完成後に表示する"""
+        self.show_message("プレビューを準備中...")
+        generation = self._generation
+        future = image_pyramid.ensure_pyramid(Path(image_path))
+
+        def on_done(done_future) -> None:
+            try:
+                info = done_future.result()
+            except Exception as error:  # noqa: BLE001
+                message = f"スクリーンショットを読み込めませんでした: {error}"
+                self.after(0, lambda: self._if_current(generation, self.show_message, message))
+                return
+            self.after(0, lambda: self._if_current(generation, self._set_info, info))
+
+        future.add_done_callback(on_done)
+
+    # --- 内部処理 ------------------------------------------------------------
+
+    def _if_current(self, generation: int, callback, *args) -> None:
+        if generation == self._generation and self.winfo_exists():
+            callback(*args)
+
+    def _set_info(self, info: Dict[str, Any]) -> None:
+        self.canvas.delete("all")
+        self._text_id = None
+        self._info = info
+        self._relayout()
+
+    def _relayout(self) -> None:
+        if self._info is None:
+            return
+        display_width = max(1, self.canvas.winfo_width())
+        level = image_pyramid.choose_level(self._info, display_width)
+        level_width, level_height = image_pyramid.level_size(self._info, level)
+        scale = display_width / level_width
+        if level != self._level or abs(scale - self._scale) > 1e-3:
+            self._level = level
+            self._scale = scale
+            self._clear_tiles()
+        self.canvas.configure(scrollregion=(0, 0, display_width, math.ceil(level_height * scale)))
+        self._update_tiles()
+
+    def _clear_tiles(self) -> None:
+        self.canvas.delete("tile")
+        self._photos.clear()
+        self._pending.clear()
+
+    def _visible_range(self) -> Tuple[float, float]:
+        height = max(1, self.canvas.winfo_height())
+        top = self.canvas.canvasy(0)
+        margin = height * PREFETCH_RATIO
+        return max(0.0, top - margin) / self._scale, (top + height + margin) / self._scale
+
+    def _update_tiles(self) -> None:
+        if self._info is None:
+            return
+        top, bottom = self._visible_range()
+        wanted = image_pyramid.visible_tiles(self._info, self._level, top, bottom)
+        wanted_set = set(wanted)
+
+        if len(self._photos) > MAX_CACHED_TILES:
+            for key in [key for key in self._photos if key not in wanted_set]:
+                self.canvas.delete(f"tile_{key[0]}_{key[1]}")
+                del self._photos[key]
+
+        generation = self._generation
+        level = self._level
+        scale = self._scale
+        for key in wanted:
+            if key in self._photos or key in self._pending:
+                continue
+            self._pending.add(key)
+            future = self._executor.submit(self._load_tile, self._info, level, key, scale)
+            future.add_done_callback(
+                lambda done, key=key: self.after(
+                    0, lambda: self._if_current(generation, self._place_tile, level, scale, key, done)
+                )
+            )
+
+    @staticmethod
+    def _load_tile(info: Dict[str, Any], level: int, key: Tuple[int, int], scale: float) -> Image.Image:
+        from PIL import Image
+
+        col, row = key
+        with Image.open(image_pyramid.tile_path(info, level, col, row)) as tile:
+            tile.load()
+            if abs(scale - 1.0) > 1e-3:
+                size = (max(1, round(tile.width * scale)), max(1, round(tile.height * scale)))
+                return tile.resize(size, Image.LANCZOS)
+            return tile.copy()
+
+    def _place_tile(self, level: int, scale: float, key: Tuple[int, int], done) -> None:
+        self._pending.discard(key)
+        if level != self._level or scale != self._scale:
+            return
+        try:
+            image = done.result()
+        except Exception:  # noqa: BLE001
+            return
+        from PIL import ImageTk
+
+        photo = ImageTk.PhotoImage(image)
+        self._photos[key] = photo
+        tile_size = self._info["tile_size"]
+        col, row = key
+        self.canvas.create_image(
+            round(col * tile_size * scale),
+            round(row * tile_size * scale),
+            image=photo,
+            anchor="nw",
+            tags=("tile", f"tile_{col}_{row}"),
+        )
+
+    def _on_scrollbar(self, *args) -> None:
+        self.canvas.yview(*args)
+        self._update_tiles()
+
+    def _scroll_units(self, units: int) -> None:
+        self.canvas.yview_scroll(units, "units")
+        self._update_tiles()
+
+    def _on_mousewheel(self, event) -> None:
+        delta = event.delta if abs(event.delta) < 120 else event.delta // 120
+        self._scroll_units(-delta)
@@ -10,6 +10,7 @@ from pathlib import Path
 
 DEFAULT_SLICE_HEIGHT = 2000
 DEFAULT_MODEL_NAME = "gemini-pro-vision"
+DEFAULT_MAX_CONCURRENCY = 4
 
 
 @dataclasses.dataclass(slots=True)
@@ -22,6 +23,7 @@ class AppConfig:
     request_timeout: int = 90
     max_retries: int = 3
     retry_backoff_base: float = 2.0
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
 
     @property
     def timestamp_prefix(self) -> str:
@@ -38,6 +40,7 @@ def load_config(output_dir: str | None = None) -> AppConfig:
     request_timeout = int(os.environ.get("SITE_TRANSCRIBER_TIMEOUT", 90))
     max_retries = int(os.environ.get("SITE_TRANSCRIBER_MAX_RETRIES", 3))
     retry_backoff_base = float(os.environ.get("SITE_TRANSCRIBER_RETRY_BACKOFF", 2.0))
+    max_concurrency = int(os.environ.get("SITE_TRANSCRIBER_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
 
     return AppConfig(
         output_root=base_output,
@@ -46,4 +49,5 @@ def load_config(output_dir: str | None = None) -> AppConfig:
         request_timeout=request_timeout,
         max_retries=max_retries,
         retry_backoff_base=retry_backoff_base,
+        max_concurrency=max_concurrency,
     )
@@ -2,9 +2,12 @@
 
 from __future__ import annotations
 
+import asyncio
 import os
 import time
-from typing import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Sequence
 
 import google.generativeai as genai
 
@@ -19,6 +22,36 @@ PROMPT_TEMPLATE = (
 )
 
 
+@dataclass
+class _RetryState:
+    """並列リクエスト間で共有するバックオフ状態。
+
+    いずれかのリクエストが失敗すると全リクエストが同じ待機時間だけ送信を控える。
+    待機時間は待機期間ごとに1回だけ延ばし、同時に失敗した複数のリクエストで重ねて延ばさない。
+    """
+
+    backoff: float = 1.0
+    resume_at: float = 0.0
+
+    async def wait(self) -> None:
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def defer(self, base: float) -> None:
+        now = time.monotonic()
+        if now < self.resume_at:
+            # 待機期間中の失敗は同じ出来事（送信済みだったリクエスト）として扱う
+            return
+        self.resume_at = now + self.backoff
+        self.backoff *= base
+
+    def reset(self) -> None:
+        # 待機期間中に返ってきた成功は待機前に送ったリクエストなので、延ばした待機時間は戻さない
+        if time.monotonic() >= self.resume_at:
+            self.backoff = 1.0
+
+
 class GeminiClient:
     def __init__(self, config: AppConfig) -> None:
         api_key = os.environ.get("GOOGLE_API_KEY")
@@ -40,6 +73,50 @@ class GeminiClient:
             results.append(self._transcribe_single(path, prompt))
         return results
 
+    async def transcribe_async(self, image_paths: Iterable[str | os.PathLike[str]]) -> list[str]:
+        """画像を同時実行数の上限付きで並列に文字起こしする。結果は入力順。"""
+        batches = await self.transcribe_batches_async([list(image_paths)])
+        if isinstance(batches[0], BaseException):
+            raise batches[0]
+        return batches[0]
+
+    async def transcribe_batches_async(
+        self,
+        batches: Sequence[Iterable[str | os.PathLike[str]]],
+    ) -> list[list[str] | BaseException]:
+        """複数URL分の画像群をまとめて並列処理する。
+
+        同時実行数の上限とバックオフ状態は全バッチで共有し、結果はバッチごとに入力順で返す。
+        再試行しても失敗した画像を含むバッチは、テキストの代わりにその例外を返す（他のバッチは影響を受けない）。
+        """
+        semaphore = asyncio.Semaphore(max(1, self._config.max_concurrency))
+        state = _RetryState()
+
+        batch_tasks = []
+        for images in batches:
+            images = list(images)
+            total = len(images)
+            batch_tasks.append(
+                asyncio.gather(
+                    *(
+                        self._transcribe_single_async(
+                            path,
+                            PROMPT_TEMPLATE.format(index=index, total=total),
+                            semaphore,
+                            state,
+                        )
+                        for index, path in enumerate(images, start=1)
+                    ),
+                    return_exceptions=True,
+                )
+            )
+        results = await asyncio.gather(*batch_tasks)
+        batch_results: list[list[str] | BaseException] = []
+        for texts in results:
+            error = next((item for item in texts if isinstance(item, BaseException)), None)
+            batch_results.append(error if error is not None else list(texts))
+        return batch_results
+
     def _transcribe_single(self, image_path, prompt: str) -> str:
         attempt = 0
         backoff = 1.0
@@ -50,17 +127,7 @@ class GeminiClient:
                     parts,
                     request_options={"timeout": self._config.request_timeout},
                 )
-                text = getattr(response, "text", None)
-                if text:
-                    return text.strip()
-                # fallback
-                if response.candidates:
-                    candidate = response.candidates[0]
-                    if candidate.content.parts:
-                        collected = "\n".join(part.text for part in candidate.content.parts if hasattr(part, "text"))
-                        if collected:
-                            return collected.strip()
-                return ""
+                return self._extract_text(response)
             except Exception as exc:  # noqa: BLE001
                 attempt += 1
                 if attempt > self._config.max_retries:
@@ -68,3 +135,47 @@ class GeminiClient:
                 time.sleep(backoff)
                 backoff *= self._config.retry_backoff_base
 
+    async def _transcribe_single_async(
+        self,
+        image_path,
+        prompt: str,
+        semaphore: asyncio.Semaphore,
+        state: _RetryState,
+    ) -> str:
+        attempt = 0
+        while True:
+            await state.wait()
+            async with semaphore:
+                # エンコード済み画像を保持するのは実行中のリクエスト分（max_concurrency）だけにする
+                inline_data = await asyncio.to_thread(encode_image, Path(image_path))
+                parts = [{"text": prompt}, {"inline_data": inline_data}]
+                try:
+                    response = await self._model.generate_content_async(
+                        parts,
+                        request_options={"timeout": self._config.request_timeout},
+                    )
+                except Exception as exc:  # noqa: BLE001
+                    attempt += 1
+                    if attempt > self._config.max_retries:
+                        raise exc
+                    state.defer(self._config.retry_backoff_base)
+                    continue
+                finally:
+                    # 再試行の待機中に画像データを持ち続けない
+                    del inline_data, parts
+            state.reset()
+            return self._extract_text(response)
+
+    @staticmethod
+    def _extract_text(response) -> str:
+        text = getattr(response, "text", None)
+        if text:
+            return text.strip()
+        # fallback
+        if response.candidates:
+            candidate = response.candidates[0]
+            if candidate.content.parts:
+                collected = "\n".join(part.text for part in candidate.content.parts if hasattr(part, "text"))
+                if collected:
+                    return collected.strip()
+        return ""
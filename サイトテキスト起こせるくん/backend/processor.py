@@ -42,11 +42,33 @@ class TranscriptionProcessor:
 
         capture_results = asyncio.run(self._capture_all(jobs))
 
-        transcript_results: list[TranscriptResult] = []
-        for (url, images_dir, text_dir), capture_result in zip(jobs, capture_results, strict=False):
+        for url, _, _ in jobs[: len(capture_results)]:
             if on_progress:
                 on_progress(f"{url} のGemini処理を開始")
-            segments = self.gemini_client.transcribe(capture_result.image_paths)
+        self.logger.info(
+            "Gemini並列処理: %d URL / %d 画像 (同時実行数 %d)",
+            len(capture_results),
+            sum(len(result.image_paths) for result in capture_results),
+            self.config.max_concurrency,
+        )
+        segments_per_url = asyncio.run(
+            self.gemini_client.transcribe_batches_async(
+                [capture_result.image_paths for capture_result in capture_results]
+            )
+        )
+
+        transcript_results: list[TranscriptResult] = []
+        errors: list[BaseException] = []
+        for (url, images_dir, text_dir), capture_result, segments in zip(
+            jobs, capture_results, segments_per_url, strict=False
+        ):
+            if isinstance(segments, BaseException):
+                # 失敗したURLだけを飛ばし、他のURLの結果は書き出す
+                errors.append(segments)
+                self.logger.error("Gemini処理に失敗しました: %s (%s)", url, segments)
+                if on_progress:
+                    on_progress(f"{url} の処理に失敗しました: {segments}")
+                continue
             combined_text = self._combine_segments(segments)
             text_path = text_dir / "transcript.md"
             json_path = text_dir / "transcript.json"
@@ -77,6 +99,8 @@ class TranscriptionProcessor:
             if on_progress:
                 on_progress(f"{url} の処理が完了しました")
 
+        if errors and not transcript_results:
+            raise errors[0]
         return transcript_results
 
     async def _capture_all(self, jobs: list[tuple[str, Path, Path]]):